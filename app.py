@@ -1,24 +1,47 @@
 import streamlit as st
-import google.generativeai as genai
-from pypdf import PdfReader, PdfWriter, PageObject
-from docx import Document
 from io import BytesIO
-from duckduckgo_search import DDGS
 from datetime import datetime, timedelta, date
 import time
 import pandas as pd
+import numpy as np
 import base64
 import os
 import random 
-
-# --- IMPORTAÇÕES SEGURAS PARA GERAÇÃO DE PDF ---
-try:
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.utils import simpleSplit
-    HAS_REPORTLAB = True
-except ImportError:
-    HAS_REPORTLAB = False
+import uuid
+import importlib.util
+from extracao_pdf import extrair_faixa_pdf
+from leitor_dje import LeitorDJE, blocos_pdf, blocos_texto, padroes_cnj, padroes_oab, padroes_nome
+from prazos import CalendarioForense, classificar, feriados_forenses
+from calculos import (COLUNAS_LOTE, GRAUS_INSALUBRIDADE, JUROS_MORA, MOTIVOS_RESCISAO, SERIES_SGS, TIPOS_AVISO, atualizar_debitos,
+                      calcular_rescisoes_lote, carregar_series, debito_federal, ler_serie_sgs, verbas_da_linha,
+                      PROGRESSAO_REGIME, memoria_debito, memoria_debito_federal, memoria_pena_base, memoria_progressao, memoria_rescisao,
+                      memorias_rescisao_lote)
+from medicoes import MEDIDOR, contar, cronometrado, medir
+from jurisprudencia import AREAS, BaseJurisprudencia, citacao, registros
+from memorias import (documento_docx, exportar_documentos_zip, exportar_memorias_zip, memoria_docx, memoria_pdf, modelo_timbrado, nome_arquivo,
+                      pdfs_com_timbrado)
+import hashlib
+import shutil
+import tempfile
+import asyncio
+import sqlite3
+import unicodedata
+import math
+import re
+import gzip
+import zlib
+import threading
+import queue
+import atexit
+from contextlib import contextmanager
+from functools import partial
+from collections import OrderedDict, deque, namedtuple
+
+# --- IMPORTAÇÕES SOB DEMANDA ---
+# google.generativeai (~1 s), pypdf, python-docx e reportlab só são importados pela função que os usa: o Dashboard e as
+# telas sem IA/PDF não pagam por eles (benchmarks/bench_startup.py mede e confere). pandas/numpy ficam no topo: a
+# carteira (casos_db) já é um DataFrame desde a primeira tela.
+HAS_REPORTLAB = importlib.util.find_spec("reportlab") is not None
 
 # ==========================================================
 # 1. CONFIGURAÇÃO VISUAL
@@ -30,6 +53,21 @@ st.set_page_config(
     initial_sidebar_state="collapsed" 
 )
 
+# --- MEDIÇÕES DE DESEMPENHO (tela Admin) ---
+MEDICOES_JSONL = os.environ.get("MEDICOES_JSONL")                    # ex.: medicoes.jsonl -> uma linha por medição
+MEDICOES_PROMETHEUS_PORTA = os.environ.get("MEDICOES_PROMETHEUS_PORTA")  # ex.: 9464 -> http://127.0.0.1:9464/metrics
+
+@st.cache_resource
+def iniciar_medicoes():
+    """Liga as exportações configuradas uma vez por processo (os histogramas vivem em medicoes.MEDIDOR)."""
+    if MEDICOES_JSONL: MEDIDOR.exportar_jsonl(MEDICOES_JSONL)
+    if MEDICOES_PROMETHEUS_PORTA:
+        try: MEDIDOR.servir_prometheus(int(MEDICOES_PROMETHEUS_PORTA))
+        except OSError: pass  # porta ocupada (outro processo do app já exporta)
+    return MEDIDOR
+
+iniciar_medicoes()
+
 # ==========================================================
 # 2. AUTOMAÇÃO DE ACESSO
 # ==========================================================
@@ -45,47 +83,1562 @@ except Exception as e:
 # ==========================================================
 # 3. IA DEDICADA: GEMINI 2.5 (CORE)
 # ==========================================================
-def tentar_gerar_conteudo(prompt, ignored_param=None):
-    if not API_KEY_FINAL: return "⚠️ Chave Inválida"
-    genai.configure(api_key=API_KEY_FINAL)
-
-    modelos_elite = ["gemini-2.5-flash", "gemini-2.5-pro", "gemini-2.0-flash"]
-    
-    log_erros = []
-    for modelo in modelos_elite:
+MODELOS_ELITE = ["gemini-2.5-flash", "gemini-2.5-pro", "gemini-2.0-flash"]
+GEMINI_TIMEOUT = 120          # segundos por chamada
+GEMINI_TENTATIVAS = 2         # tentativas por modelo (só para erros transitórios)
+GEMINI_BACKOFF_BASE = 0.5     # segundos; dobra a cada tentativa, com jitter
+GEMINI_BACKOFF_MAX = 8.0
+GEMINI_HEDGE_APOS = None      # ex.: 20 -> dispara o modelo seguinte após 20s sem resposta
+
+class BaldeTokens:
+    """Token bucket thread-safe: repõe `taxa` fichas por segundo até `capacidade`."""
+
+    def __init__(self, taxa, capacidade=None):
+        self.taxa = taxa
+        self.capacidade = capacidade or max(1.0, taxa)
+        self._fichas = self.capacidade
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self._fichas = min(self.capacidade, self._fichas + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    def tentar(self, n=1):
+        """Retira n fichas se houver e devolve 0; senão devolve os segundos até haver fichas suficientes."""
+        n = min(n, self.capacidade)
+        with self._lock:
+            self._repor()
+            if self._fichas >= n:
+                self._fichas -= n
+                return 0.0
+            return (n - self._fichas) / self.taxa
+
+    def espera(self, n=1):
+        """Segundos até haver n fichas (0 se já há), sem retirá-las."""
+        n = min(n, self.capacidade)
+        with self._lock:
+            self._repor()
+            return max(0.0, (n - self._fichas) / self.taxa)
+
+    def esvaziar(self):
+        """Zera as fichas (ex.: o servidor respondeu 429 antes do previsto)."""
+        with self._lock:
+            self._repor()
+            self._fichas = 0.0
+
+    def disponivel(self):
+        with self._lock:
+            self._repor()
+            return self._fichas / self.capacidade
+
+    def adquirir(self, n=1, timeout=None):
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            espera = self.tentar(n)
+            if espera == 0: return True
+            if limite is not None and time.monotonic() + espera > limite: return False
+            time.sleep(espera)
+
+# Cota por modelo (requisições/min, tokens/min) dividida por todas as sessões do processo: ajuste ao plano da chave
+GEMINI_LIMITES = {"gemini-2.5-flash": (1000, 1_000_000), "gemini-2.5-pro": (150, 2_000_000), "gemini-2.0-flash": (2000, 4_000_000)}
+GEMINI_ESPERA_MAX = 20.0       # segundos aguardando cota antes de passar ao modelo seguinte
+GEMINI_TOKENS_RESPOSTA = 2000  # reserva para a resposta na estimativa de tokens feita antes da chamada
+LIMITADOR_INTERVALO = 0.05     # segundos entre conferências da vez para quem espera cota no loop asyncio
+
+class SemCapacidade(Exception):
+    pass
+
+class LimitadorGemini:
+    """Cota por modelo compartilhada pelo processo: um BaldeTokens de requisições/min e outro de tokens/min (estimados
+    antes da chamada). Sem cota, a chamada espera até `timeout` em vez de cair no modelo seguinte; quem espera entra numa
+    fila por usuário e a vez alterna entre usuários, então quem dispara muitos pedidos não segura os dos outros."""
+
+    def __init__(self, limites):
+        self.limites = dict(limites)
+        self._baldes = {m: (BaldeTokens(rpm / 60, rpm), BaldeTokens(tpm / 60, tpm)) for m, (rpm, tpm) in self.limites.items()}
+        self._filas = {m: OrderedDict() for m in self.limites}  # usuário -> pedidos aguardando, na ordem da vez
+        self._metricas = {m: dict.fromkeys(("chamadas", "tokens", "esperaram", "segundos_espera", "negadas", "respostas_429"), 0)
+                          for m in self.limites}
+        self._cond = threading.Condition()
+
+    def adquirir(self, modelo, tokens, usuario=None, timeout=GEMINI_ESPERA_MAX):
+        """True quando a chamada pode seguir (cota já descontada); False se não houve cota dentro do timeout."""
+        if modelo not in self._baldes: return True
+        usuario = usuario or "-"
+        inicio = time.monotonic()
+        with self._cond:
+            pedido = self._entrar(modelo, usuario)
+            try:
+                while True:
+                    espera = self._vez(modelo, usuario, pedido, tokens, inicio)
+                    if espera == 0: return True
+                    restante = self._restante(modelo, espera, inicio, timeout)
+                    if restante is None: return False
+                    self._cond.wait(restante if espera is None else espera)
+            finally: self._sair(modelo, usuario, pedido)
+
+    async def adquirir_async(self, modelo, tokens, usuario=None, timeout=GEMINI_ESPERA_MAX):
+        """Como adquirir, mas a espera é um asyncio.sleep no loop do cliente: uma rajada (ex.: digesto de muitos
+        documentos) não prende as threads do executor padrão e os pedidos dos outros usuários chegam à fila na hora."""
+        if modelo not in self._baldes: return True
+        usuario = usuario or "-"
+        inicio = time.monotonic()
+        with self._cond: pedido = self._entrar(modelo, usuario)
         try:
-            model_instance = genai.GenerativeModel(modelo)
-            response = model_instance.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            log_erros.append(f"{modelo}: {str(e)[:50]}")
-            time.sleep(1)
-            continue
-    return f"❌ FALHA GERAL. Detalhes: {'; '.join(log_erros)}"
+            while True:
+                with self._cond:
+                    espera = self._vez(modelo, usuario, pedido, tokens, inicio)
+                    if espera == 0: return True
+                    restante = self._restante(modelo, espera, inicio, timeout)
+                    if restante is None: return False
+                # Fora da vez não há notificação no loop: confere de novo a cada LIMITADOR_INTERVALO
+                await asyncio.sleep(min(restante, LIMITADOR_INTERVALO if espera is None else espera))
+        finally:
+            with self._cond: self._sair(modelo, usuario, pedido)
+
+    def _entrar(self, modelo, usuario):
+        pedido = object()
+        self._filas[modelo].setdefault(usuario, deque()).append(pedido)
+        return pedido
+
+    def _vez(self, modelo, usuario, pedido, tokens, inicio):
+        """Sob self._cond. None se não é a vez do pedido (o mais antigo do primeiro usuário da rodada); sendo a vez, 0 se
+        a cota foi descontada ou os segundos até haver cota."""
+        fila = self._filas[modelo]
+        if fila[next(iter(fila))][0] is not pedido: return None
+        requisicoes, fichas = self._baldes[modelo]
+        espera = max(requisicoes.espera(1), fichas.espera(tokens))
+        if espera: return espera
+        requisicoes.tentar(1)
+        fichas.tentar(tokens)
+        fila.move_to_end(usuario)
+        esperou = time.monotonic() - inicio
+        metricas = self._metricas[modelo]
+        metricas["chamadas"] += 1
+        metricas["tokens"] += tokens
+        metricas["segundos_espera"] += esperou
+        if esperou > 0.05: metricas["esperaram"] += 1
+        return 0
+
+    def _restante(self, modelo, espera, inicio, timeout):
+        """Sob self._cond: segundos que ainda dá para esperar, ou None (e conta a negativa) se a cota não vem a tempo."""
+        restante = inicio + timeout - time.monotonic()
+        if restante <= 0 or (espera is not None and espera > restante):
+            self._metricas[modelo]["negadas"] += 1
+            return None
+        return restante
+
+    def _sair(self, modelo, usuario, pedido):
+        fila = self._filas[modelo]
+        pedidos = fila.get(usuario)
+        if pedidos is not None:
+            if pedido in pedidos: pedidos.remove(pedido)
+            if not pedidos: del fila[usuario]
+        self._cond.notify_all()
+
+    def penalizar(self, modelo):
+        """O servidor respondeu 429: zera a cota local do modelo para as próximas chamadas esperarem a reposição."""
+        if modelo not in self._baldes: return
+        for balde in self._baldes[modelo]: balde.esvaziar()
+        with self._cond: self._metricas[modelo]["respostas_429"] += 1
+
+    def estatisticas(self):
+        with self._cond:
+            linhas = []
+            for modelo, (rpm, tpm) in self.limites.items():
+                m = self._metricas[modelo]
+                requisicoes, fichas = self._baldes[modelo]
+                linhas.append({"Modelo": modelo, "Limite (req/min)": rpm, "Limite (tokens/min)": tpm, "Chamadas": m["chamadas"],
+                               "Tokens (est.)": m["tokens"], "Esperaram": m["esperaram"],
+                               "Espera média (s)": round(m["segundos_espera"] / m["chamadas"], 2) if m["chamadas"] else 0.0,
+                               "Sem cota": m["negadas"], "429": m["respostas_429"], "Aguardando": sum(len(p) for p in self._filas[modelo].values()),
+                               "Cota livre": f"{min(requisicoes.disponivel(), fichas.disponivel()):.0%}"})
+        return linhas
+
+ERROS_TRANSITORIOS = ("ResourceExhausted", "ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "TooManyRequests", "TimeoutError")
+
+class FalhaGeracao(Exception):
+    def __init__(self, erros):
+        super().__init__("; ".join(erros))
+        self.erros = erros
+
+class ClienteGemini:
+    """Cliente de longa duração: modelos reaproveitados, loop asyncio próprio, timeout, backoff e modo 'hedged'.
+
+    `fabrica_modelo(nome)` permite trocar o Gemini por um modelo local (stub) que exponha
+    generate_content(prompt, **kw) e, opcionalmente, generate_content_async(prompt, **kw). Toda chamada passa antes
+    pelo `limitador` (cota por modelo do processo), identificando o usuário para a fila justa."""
+
+    def __init__(self, api_key=None, modelos=None, fabrica_modelo=None, timeout=GEMINI_TIMEOUT, tentativas=GEMINI_TENTATIVAS,
+                 backoff_base=GEMINI_BACKOFF_BASE, backoff_max=GEMINI_BACKOFF_MAX, hedge_apos=GEMINI_HEDGE_APOS, limitador=None):
+        self.api_key = api_key
+        self.modelos = list(modelos or MODELOS_ELITE)
+        self.timeout = timeout
+        self.tentativas = max(1, tentativas)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_apos = hedge_apos
+        self.limitador = limitador or LimitadorGemini(GEMINI_LIMITES)
+        self._fabrica = fabrica_modelo
+        self._instancias = {}
+        self._lock = threading.Lock()
+        # O cliente assíncrono do Gemini fica preso ao loop em que foi criado: um loop fixo evita recriá-lo a cada chamada.
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="gemini-loop", daemon=True).start()
+
+    def modelo(self, nome):
+        with self._lock:
+            if self._fabrica is None:  # google.generativeai só na 1ª chamada: criar o cliente (fila, Dashboard) é barato
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._fabrica = genai.GenerativeModel
+            if nome not in self._instancias: self._instancias[nome] = self._fabrica(nome)
+            return self._instancias[nome]
+
+    def _espera_backoff(self, tentativa):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** tentativa)))
+
+    @staticmethod
+    def _transitorio(erro):
+        if isinstance(erro, asyncio.TimeoutError): return True
+        return type(erro).__name__ in ERROS_TRANSITORIOS or "429" in str(erro) or "503" in str(erro)
+
+    def _reservar(self, nome, prompt, usuario):
+        if not self.limitador.adquirir(nome, estimar_tokens(prompt) + GEMINI_TOKENS_RESPOSTA, usuario):
+            raise SemCapacidade(f"sem cota em {GEMINI_ESPERA_MAX:.0f}s")
+
+    async def _reservar_async(self, nome, prompt, usuario):
+        if not await self.limitador.adquirir_async(nome, estimar_tokens(prompt) + GEMINI_TOKENS_RESPOSTA, usuario):
+            raise SemCapacidade(f"sem cota em {GEMINI_ESPERA_MAX:.0f}s")
+
+    def _reprovado(self, nome, erro):
+        """Erro vindo do servidor; 429/cota esgotada também zera a cota local do modelo."""
+        if type(erro).__name__ in ("ResourceExhausted", "TooManyRequests") or "429" in str(erro): self.limitador.penalizar(nome)
+        return self._transitorio(erro)
+
+    async def _chamar(self, nome, prompt, usuario=None):
+        with medir("gemini.cota", modelo=nome): await self._reservar_async(nome, prompt, usuario)
+        modelo = self.modelo(nome)
+        opcoes = {"timeout": self.timeout}
+        if hasattr(modelo, "generate_content_async"): chamada = modelo.generate_content_async(prompt, request_options=opcoes)
+        else: chamada = asyncio.to_thread(modelo.generate_content, prompt, request_options=opcoes)
+        with medir("gemini.chamada", modelo=nome): resposta = await asyncio.wait_for(chamada, self.timeout)
+        return resposta.text
+
+    async def _tentar_modelo(self, nome, prompt, erros, usuario=None):
+        for tentativa in range(self.tentativas):
+            try: return await self._chamar(nome, prompt, usuario)
+            except asyncio.CancelledError: raise
+            except Exception as e:
+                erros.append(f"{nome}: {str(e)[:50] or type(e).__name__}")
+                if not self._reprovado(nome, e) or tentativa + 1 == self.tentativas: raise
+                await asyncio.sleep(self._espera_backoff(tentativa))
+
+    async def gerar_async(self, prompt, hedge_apos=None, usuario=None):
+        """Devolve (texto, modelo). Sem hedge, percorre os modelos em ordem; com hedge, o próximo modelo
+        é disparado quando o atual passa do limiar (ou falha) e vence quem responder primeiro."""
+        hedge_apos = self.hedge_apos if hedge_apos is None else hedge_apos
+        erros = []
+        if not hedge_apos:
+            for nome in self.modelos:
+                try: return await self._tentar_modelo(nome, prompt, erros, usuario), nome
+                except Exception: contar("gemini.fallback", modelo=nome)
+            raise FalhaGeracao(erros)
+
+        fila = list(self.modelos)
+        tarefas = {}
+        pendentes = set()
+        try:
+            while fila or pendentes:
+                if fila:  # 1ª chamada, limiar estourado ou falha: aciona o próximo modelo
+                    if tarefas: contar("gemini.fallback", modelo=tarefas[next(reversed(tarefas))])
+                    nome = fila.pop(0)
+                    tarefa = asyncio.ensure_future(self._tentar_modelo(nome, prompt, erros, usuario))
+                    tarefas[tarefa] = nome
+                    pendentes.add(tarefa)
+                feitos, pendentes = await asyncio.wait(pendentes, timeout=hedge_apos if fila else None, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in feitos:
+                    if not tarefa.cancelled() and tarefa.exception() is None: return tarefa.result(), tarefas[tarefa]
+            raise FalhaGeracao(erros)
+        finally:
+            for tarefa in pendentes: tarefa.cancel()
+
+    def gerar_stream(self, prompt, usuario=None):
+        """Gera os pedaços do texto conforme chegam (stream=True). O fallback entre modelos só
+        acontece antes do primeiro pedaço; depois disso uma falha interrompe o stream."""
+        erros = []
+        for nome in self.modelos:
+            for tentativa in range(self.tentativas):
+                emitiu = False
+                try:
+                    with medir("gemini.cota", modelo=nome): self._reservar(nome, prompt, usuario)
+                    with medir("gemini.stream", modelo=nome):
+                        for pedaco in self.modelo(nome).generate_content(prompt, stream=True, request_options={"timeout": self.timeout}):
+                            try: texto = pedaco.text
+                            except ValueError: continue  # pedaço sem partes de texto (ex.: só finish_reason)
+                            if texto:
+                                emitiu = True
+                                yield texto
+                    return
+                except Exception as e:
+                    erros.append(f"{nome}: {str(e)[:50] or type(e).__name__}")
+                    if emitiu: raise FalhaGeracao(erros)
+                    if not self._reprovado(nome, e) or tentativa + 1 == self.tentativas: break
+                    time.sleep(self._espera_backoff(tentativa))
+            contar("gemini.fallback", modelo=nome)
+        raise FalhaGeracao(erros)
+
+    def executar(self, corrotina):
+        """Roda uma corrotina no loop dedicado do cliente e espera o resultado (uso a partir do script do Streamlit)."""
+        return asyncio.run_coroutine_threadsafe(corrotina, self._loop).result()
+
+    def gerar(self, prompt, hedge_apos=None, usuario=None):
+        return self.executar(self.gerar_async(prompt, hedge_apos, usuario))
+
+    def embeddings(self, textos, tarefa="retrieval_document", modelo="models/text-embedding-004", lote=100):
+        """Vetores de embedding (float32, uma linha por texto), em lotes aceitos pela API."""
+        import google.generativeai as genai
+        if self.api_key: genai.configure(api_key=self.api_key)
+        vetores = []
+        for i in range(0, len(textos), lote):
+            resposta = genai.embed_content(model=modelo, content=textos[i:i + lote], task_type=tarefa)
+            vetores.extend(resposta["embedding"])
+        return np.asarray(vetores, dtype=np.float32)
+
+@st.cache_resource
+def obter_cliente_gemini():
+    return ClienteGemini(API_KEY_FINAL)
+
+def estimar_tokens(texto):
+    """Estimativa local (~4 caracteres por token), suficiente para orçamento e métricas."""
+    return len(texto) // 4 + 1
+
+# --- CACHE DE RESPOSTAS DA IA (SQLITE) ---
+LLM_CACHE_TTL_HORAS = 72
+LLM_CACHE_MAX_ITENS = 2000
+
+class CacheRespostasLLM:
+    """Cache persistente de respostas: chave = SHA-256(modelos + prompt normalizado), com TTL e descarte LRU."""
+
+    def __init__(self, caminho, ttl_segundos, max_itens):
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self.ttl_segundos = ttl_segundos
+        self.max_itens = max_itens
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS respostas (
+            chave TEXT PRIMARY KEY, modelos TEXT, resposta TEXT, criado_em REAL, acessado_em REAL, latencia REAL, tokens INTEGER)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_respostas_acesso ON respostas(acessado_em)")
+        self._conn.commit()
+        self.acertos = 0
+        self.faltas = 0
+        self.segundos_economizados = 0.0
+        self.tokens_economizados = 0
+
+    @staticmethod
+    def normalizar(prompt):
+        return " ".join(unicodedata.normalize("NFC", prompt).split())
+
+    def chave(self, prompt, modelos):
+        return hashlib.sha256(f"{'|'.join(modelos)}\n{self.normalizar(prompt)}".encode("utf-8")).hexdigest()
+
+    def obter(self, chave):
+        agora = time.time()
+        with self._lock:
+            linha = self._conn.execute("SELECT resposta, criado_em, latencia, tokens FROM respostas WHERE chave = ?", (chave,)).fetchone()
+            if linha and agora - linha[1] > self.ttl_segundos:
+                self._conn.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+                self._conn.commit()
+                linha = None
+            if linha is None:
+                self.faltas += 1
+                return None
+            self._conn.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (agora, chave))
+            self._conn.commit()
+            self.acertos += 1
+            self.segundos_economizados += linha[2] or 0.0
+            self.tokens_economizados += linha[3] or 0
+            return linha[0]
+
+    def guardar(self, chave, modelos, prompt, resposta, latencia):
+        agora = time.time()
+        tokens = estimar_tokens(prompt) + estimar_tokens(resposta)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (chave, "|".join(modelos), resposta, agora, agora, latencia, tokens))
+            self._conn.execute("DELETE FROM respostas WHERE criado_em < ?", (agora - self.ttl_segundos,))
+            self._conn.execute("""DELETE FROM respostas WHERE chave IN (
+                SELECT chave FROM respostas ORDER BY acessado_em DESC LIMIT -1 OFFSET ?)""", (self.max_itens,))
+            self._conn.commit()
+
+    def estatisticas(self):
+        with self._lock: itens = self._conn.execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+        consultas = self.acertos + self.faltas
+        return {"acertos": self.acertos, "faltas": self.faltas, "taxa": self.acertos / consultas if consultas else 0.0,
+                "segundos_economizados": self.segundos_economizados, "tokens_economizados": self.tokens_economizados, "itens": itens}
+
+@st.cache_resource
+def obter_cache_respostas():
+    return CacheRespostasLLM(os.path.join(CACHE_DIR, "respostas_llm.sqlite"), LLM_CACHE_TTL_HORAS * 3600, LLM_CACHE_MAX_ITENS)
+
+@cronometrado("llm.gerar")
+def tentar_gerar_conteudo(prompt, ignored_param=None, usar_cache=True, usuario=None):
+    """usar_cache=False força nova geração (botão "regenerar"); o resultado novo substitui o do cache."""
+    if not API_KEY_FINAL: return "⚠️ Chave Inválida"
+    cliente = obter_cliente_gemini()
+    cache = obter_cache_respostas()
+    chave = cache.chave(prompt, cliente.modelos)
+    if usar_cache:
+        texto = cache.obter(chave)
+        if texto is not None: return texto
+    inicio = time.time()
+    try: texto, _ = cliente.gerar(prompt, usuario=usuario)
+    except FalhaGeracao as e:
+        return f"❌ FALHA GERAL. Detalhes: {'; '.join(e.erros)}"
+    cache.guardar(chave, cliente.modelos, prompt, texto, time.time() - inicio)
+    return texto
+
+@cronometrado("llm.gerar_stream")
+def tentar_gerar_conteudo_stream(prompt, usar_cache=True, cliente=None, cache=None, usuario=None):
+    """Igual a tentar_gerar_conteudo, mas em pedaços: use com st.write_stream para exibir enquanto chega.
+    `cliente`/`cache` explícitos permitem rodar fora do script (threads da fila de gerações)."""
+    if not API_KEY_FINAL:
+        yield "⚠️ Chave Inválida"
+        return
+    cliente = cliente or obter_cliente_gemini()
+    cache = cache or obter_cache_respostas()
+    chave = cache.chave(prompt, cliente.modelos)
+    if usar_cache:
+        texto = cache.obter(chave)
+        if texto is not None:
+            yield texto
+            return
+    inicio = time.time()
+    pedacos = []
+    try:
+        for pedaco in cliente.gerar_stream(prompt, usuario):
+            pedacos.append(pedaco)
+            yield pedaco
+    except FalhaGeracao as e:
+        yield f"\n\n❌ FALHA GERAL. Detalhes: {'; '.join(e.erros)}"
+        return
+    cache.guardar(chave, cliente.modelos, prompt, "".join(pedacos), time.time() - inicio)
+
+# --- DIGESTO DE DOCUMENTOS (MAP-REDUCE) ---
+DIGESTO_TOKENS_BLOCO = 6000    # tamanho de cada bloco enviado para resumo
+DIGESTO_CONCORRENCIA = 4       # resumos de bloco simultâneos por pedido (somando todos os documentos)
+DIGESTO_MAX_RODADAS = 3        # rodadas de redução antes de cortar o texto
+ORCAMENTO_INVESTIGADOR = 8000  # tokens de documentos por prompt
+ORCAMENTO_PETICAO = 16000
+ORCAMENTO_AUDIENCIA = 4000
+
+PROMPT_RESUMO_BLOCO = """Resuma o trecho {i}/{n} de documentos jurídicos abaixo em no máximo {palavras} palavras.
+Preserve fatos, datas, valores, nomes das partes, números de processo, pedidos, decisões e fundamentos legais.
+Não invente nada que não esteja no trecho.
+
+TRECHO:
+{bloco}"""
+
+def dividir_em_blocos(texto, max_tokens):
+    """Quebra o texto por parágrafos em blocos de até ~max_tokens (parágrafos gigantes são cortados)."""
+    max_chars = max_tokens * 4
+    blocos, atual, tamanho = [], [], 0
+    for paragrafo in texto.split("\n"):
+        while len(paragrafo) > max_chars:
+            if atual: blocos.append("\n".join(atual)); atual, tamanho = [], 0
+            blocos.append(paragrafo[:max_chars])
+            paragrafo = paragrafo[max_chars:]
+        if atual and tamanho + len(paragrafo) + 1 > max_chars:
+            blocos.append("\n".join(atual)); atual, tamanho = [], 0
+        atual.append(paragrafo)
+        tamanho += len(paragrafo) + 1
+    if atual: blocos.append("\n".join(atual))
+    return [b for b in blocos if b.strip()]
+
+async def _digerir_async(cliente, texto, orcamento_tokens, semaforo, usuario=None):
+    """Devolve (digesto, completo). completo=False se algum bloco caiu no corte de emergência.
+
+    `semaforo` limita os resumos simultâneos de todos os documentos do pedido, não só deste."""
+    cache = obter_cache_respostas()
+    completo = True
+    for _ in range(DIGESTO_MAX_RODADAS):
+        if estimar_tokens(texto) <= orcamento_tokens: return texto, completo
+        blocos = dividir_em_blocos(texto, DIGESTO_TOKENS_BLOCO)
+        palavras = max(60, (orcamento_tokens * 3 // 4) // len(blocos))
+
+        async def resumir(i, bloco):
+            nonlocal completo
+            prompt = PROMPT_RESUMO_BLOCO.format(i=i + 1, n=len(blocos), palavras=palavras, bloco=bloco)
+            chave = cache.chave(prompt, cliente.modelos)
+            resumo = cache.obter(chave)
+            if resumo is not None: return resumo
+            async with semaforo:
+                inicio = time.time()
+                try: resumo, _ = await cliente.gerar_async(prompt, usuario=usuario)
+                except FalhaGeracao:
+                    completo = False
+                    return bloco[:palavras * 6]
+            cache.guardar(chave, cliente.modelos, prompt, resumo, time.time() - inicio)
+            return resumo
+
+        resumos = await asyncio.gather(*[resumir(i, b) for i, b in enumerate(blocos)])
+        texto = "\n\n".join(resumos)
+    return texto[:orcamento_tokens * 4], False
+
+def digerir_documentos(textos, orcamento_tokens):
+    """Reduz cada documento a uma fração do orçamento (resumos por bloco em paralelo) e guarda o digesto no cache.
+
+    Documentos que já cabem voltam intactos; a mesma combinação texto + orçamento não chama a IA de novo."""
+    if not textos: return []
+    orcamento_doc = max(500, orcamento_tokens // len(textos))
+    if not API_KEY_FINAL: return [t[:orcamento_doc * 4] for t in textos]  # sem chave todo bloco falharia: corta direto
+    cliente = obter_cliente_gemini()
+    cache = obter_cache_respostas()
+    usuario = usuario_atual()
+
+    async def digerir(texto, semaforo):
+        if estimar_tokens(texto) <= orcamento_doc: return texto
+        chave = cache.chave(f"DIGESTO {orcamento_doc}\n{texto}", ["digesto"])
+        digesto = cache.obter(chave)
+        if digesto is not None: return digesto
+        inicio = time.time()
+        digesto, completo = await _digerir_async(cliente, texto, orcamento_doc, semaforo, usuario)
+        if completo: cache.guardar(chave, ["digesto"], texto, digesto, time.time() - inicio)
+        return digesto
+
+    async def todos():
+        semaforo = asyncio.Semaphore(DIGESTO_CONCORRENCIA)
+        return await asyncio.gather(*[digerir(t, semaforo) for t in textos])
+    return cliente.executar(todos())
 
 # ==========================================================
 # 4. FUNÇÕES UTILITÁRIAS & BANCO DE DADOS
 # ==========================================================
-DB_FILE = "processos_db.csv"
-
-def carregar_dados():
-    """Carrega os dados e corrige colunas faltantes automaticamente."""
-    cols_padrao = ["Cliente", "Processo", "Tribunal", "Status", "Última Mov.", "Ultima_Verificacao"]
-    if os.path.exists(DB_FILE):
+DB_FILE = "processos_db.csv"   # legado: importado para o banco na 1ª execução
+CACHE_DIR = "cache_legalhub"
+
+# --- CACHE DE TEXTO DE PDF (MEMÓRIA + DISCO) ---
+PDF_CACHE_MEMORIA_MB = 64    # teto do LRU em RAM (compartilhado entre sessões)
+PDF_CACHE_DISCO_MB = 512     # teto do cache em disco (compartilhado entre processos)
+
+class CacheTextoPDF:
+    """Texto extraído endereçado pelo SHA-256 do arquivo: LRU em memória + arquivos .gz em disco."""
+
+    def __init__(self, pasta, max_bytes_memoria, max_bytes_disco):
+        self.pasta = pasta
+        self.max_bytes_memoria = max_bytes_memoria
+        self.max_bytes_disco = max_bytes_disco
+        self._memoria = OrderedDict()
+        self._bytes_memoria = 0
+        self._lock = threading.Lock()
+        os.makedirs(pasta, exist_ok=True)
+
+    def _caminho(self, chave):
+        return os.path.join(self.pasta, f"{chave}.txt.gz")
+
+    def _lembrar(self, chave, texto):
+        with self._lock:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                return
+            self._memoria[chave] = texto
+            self._bytes_memoria += len(texto)
+            while self._bytes_memoria > self.max_bytes_memoria and len(self._memoria) > 1:
+                _, antigo = self._memoria.popitem(last=False)
+                self._bytes_memoria -= len(antigo)
+
+    def obter(self, chave):
+        with self._lock:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                return self._memoria[chave]
+        caminho = self._caminho(chave)
         try:
-            df = pd.read_csv(DB_FILE)
-            for col in cols_padrao:
-                if col not in df.columns: df[col] = "-"
-            return df
-        except: pass
-    return pd.DataFrame([
-        {"Cliente": "Maria Silva", "Processo": "1002345-88.2024.8.26.0100", "Tribunal": "TJSP", "Status": "Ativo", "Última Mov.": "20/01 - Concluso", "Ultima_Verificacao": "2024-01-20 10:00"},
-        {"Cliente": "Construtora X", "Processo": "0054321-11.2023.5.02.0000", "Tribunal": "TRT-2", "Status": "Execução", "Última Mov.": "15/01 - Penhora", "Ultima_Verificacao": "2024-01-20 10:00"},
-        {"Cliente": "João Souza", "Processo": "", "Tribunal": "-", "Status": "Consultivo", "Última Mov.": "-", "Ultima_Verificacao": "-"}
-    ])
+            with gzip.open(caminho, "rt", encoding="utf-8") as f: texto = f.read()
+            os.utime(caminho)  # mtime = último uso, base do descarte LRU em disco
+        except (OSError, EOFError): return None
+        self._lembrar(chave, texto)
+        return texto
+
+    def guardar(self, chave, texto):
+        self._lembrar(chave, texto)
+        caminho = self._caminho(chave)
+        tmp = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f: f.write(texto)
+            os.replace(tmp, caminho)
+        except OSError:
+            try: os.remove(tmp)
+            except OSError: pass
+            return
+        self._descartar_excesso()
+
+    def _descartar_excesso(self):
+        arquivos, total = [], 0
+        for entrada in os.scandir(self.pasta):
+            if not entrada.name.endswith(".txt.gz"): continue
+            try: info = entrada.stat()
+            except OSError: continue
+            arquivos.append((info.st_mtime, info.st_size, entrada.path))
+            total += info.st_size
+        if total <= self.max_bytes_disco: return
+        for _, tamanho, caminho in sorted(arquivos):
+            try: os.remove(caminho)
+            except OSError: continue
+            total -= tamanho
+            if total <= self.max_bytes_disco: break
+
+@st.cache_resource
+def obter_cache_pdf():
+    return CacheTextoPDF(os.path.join(CACHE_DIR, "pdf_texto"), PDF_CACHE_MEMORIA_MB * 1024 * 1024, PDF_CACHE_DISCO_MB * 1024 * 1024)
+
+# --- BANCO DE PROCESSOS (SQLITE PADRÃO / POSTGRES OPCIONAL) ---
+DB_SQLITE = "processos.sqlite"
+try: DATABASE_URL = os.environ.get("DATABASE_URL") or st.secrets.get("DATABASE_URL")  # postgresql://... ativa o Postgres
+except Exception: DATABASE_URL = os.environ.get("DATABASE_URL")
+
+# Coluna da tela -> coluna do banco
+COLUNAS_PROCESSOS = {"Cliente": "cliente", "Processo": "processo", "Tribunal": "tribunal", "Status": "status",
+                     "Última Mov.": "ultima_mov", "Ultima_Verificacao": "ultima_verificacao"}
+
+PROCESSOS_EXEMPLO = [
+    {"Cliente": "Maria Silva", "Processo": "1002345-88.2024.8.26.0100", "Tribunal": "TJSP", "Status": "Ativo", "Última Mov.": "20/01 - Concluso", "Ultima_Verificacao": "2024-01-20 10:00"},
+    {"Cliente": "Construtora X", "Processo": "0054321-11.2023.5.02.0000", "Tribunal": "TRT-2", "Status": "Execução", "Última Mov.": "15/01 - Penhora", "Ultima_Verificacao": "2024-01-20 10:00"},
+    {"Cliente": "João Souza", "Processo": "", "Tribunal": "-", "Status": "Consultivo", "Última Mov.": "-", "Ultima_Verificacao": "-"}
+]
+
+class PoolSQLite:
+    def __init__(self, caminho, tamanho=4):
+        self._fila = queue.Queue()
+        for _ in range(tamanho):
+            conn = sqlite3.connect(caminho, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._fila.put(conn)
+
+    @contextmanager
+    def conexao(self):
+        conn = self._fila.get()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally: self._fila.put(conn)
+
+class PoolPostgres:
+    def __init__(self, dsn, minimo=1, maximo=8):
+        from psycopg2.pool import ThreadedConnectionPool
+        self._pool = ThreadedConnectionPool(minimo, maximo, dsn)
+        # getconn() levanta PoolError com as `maximo` conexões em uso: quem chega espera a vez aqui, como no PoolSQLite
+        self._vagas = threading.BoundedSemaphore(maximo)
+
+    @contextmanager
+    def conexao(self):
+        self._vagas.acquire()
+        try:
+            conn = self._pool.getconn()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally: self._pool.putconn(conn)
+        finally: self._vagas.release()
+
+def _valor_db(valor):
+    if valor is None: return None
+    if isinstance(valor, float) and math.isnan(valor): return None
+    if isinstance(valor, np.generic): return valor.item()
+    return valor
+
+class RepositorioProcessos:
+    """Carteira de processos com gravação por linha (upsert) sobre SQLite ou Postgres, com pool de conexões."""
+
+    def __init__(self, pool, postgres=False):
+        self.pool = pool
+        self.postgres = postgres
+        self.ph = "%s" if postgres else "?"
+        self.colunas = list(COLUNAS_PROCESSOS.values())
+        pk = "BIGSERIAL PRIMARY KEY" if postgres else "INTEGER PRIMARY KEY"
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute(f"CREATE TABLE IF NOT EXISTS processos (id {pk}, {', '.join(c + ' TEXT' for c in self.colunas)})")
+            for coluna in ("processo", "cliente", "tribunal"):
+                cur.execute(f"CREATE INDEX IF NOT EXISTS idx_processos_{coluna} ON processos({coluna})")
+            cur.execute("SELECT COUNT(*) FROM processos")
+            vazio = cur.fetchone()[0] == 0
+        # mov_nao_vista: há evento não visto (índice do radar); marca_dagua: data do último evento recebido
+        flag_nova = self._adicionar_coluna("mov_nao_vista", "INTEGER DEFAULT 0")
+        self._adicionar_coluna("marca_dagua", "TEXT")
+        eventos_novos = self._criar_tabela_movimentacoes(pk)
+        with self.pool.conexao() as conn:
+            conn.cursor().execute("CREATE INDEX IF NOT EXISTS idx_processos_nao_vista ON processos(mov_nao_vista)")
+        if vazio: self._popular_inicial()
+        if vazio or flag_nova: self._marcar_legado()
+        if eventos_novos: self._importar_eventos_legados()
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute(f"""CREATE TABLE IF NOT EXISTS intimacoes (id {pk}, diario TEXT, data_diario TEXT, pagina INTEGER, tipo TEXT,
+                            identificador TEXT, processo_id INTEGER, trecho TEXT, lida INTEGER DEFAULT 0, registrado_em TEXT)""")
+        self._migrar_intimacoes(pk)
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            # Uma intimação por processo: o mesmo cliente/OAB pode estar em vários processos da carteira
+            cur.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_intimacoes_unica
+                           ON intimacoes(diario, pagina, tipo, identificador, COALESCE(processo_id, 0))""")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_intimacoes_lida ON intimacoes(lida, data_diario)")
+            # prazos: um por ato de origem (intimação ou movimentação); feriados: '*' vale para todos os tribunais
+            cur.execute(f"""CREATE TABLE IF NOT EXISTS prazos (id {pk}, origem TEXT, origem_id INTEGER, processo_id INTEGER, tribunal TEXT,
+                            data_origem TEXT, ato TEXT, dias INTEGER, corridos INTEGER DEFAULT 0, inicio TEXT, vencimento TEXT,
+                            cumprido INTEGER DEFAULT 0, UNIQUE (origem, origem_id))""")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_prazos_abertos ON prazos(cumprido, vencimento)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_prazos_janela ON prazos(tribunal, data_origem, vencimento)")
+            cur.execute("CREATE TABLE IF NOT EXISTS feriados (tribunal TEXT, data TEXT, descricao TEXT, PRIMARY KEY (tribunal, data))")
+            cur.execute("CREATE TABLE IF NOT EXISTS controle (chave TEXT PRIMARY KEY, valor TEXT)")
+
+    def _adicionar_coluna(self, coluna, tipo):
+        """Migração de bancos antigos: cria a coluna se faltar. Devolve True se criou."""
+        try:
+            with self.pool.conexao() as conn: conn.cursor().execute(f"SELECT {coluna} FROM processos LIMIT 1")
+            return False
+        except Exception:
+            with self.pool.conexao() as conn: conn.cursor().execute(f"ALTER TABLE processos ADD COLUMN {coluna} {tipo}")
+            return True
+
+    def _migrar_intimacoes(self, pk):
+        """Bancos antigos: a unicidade da intimação não incluía o processo (só o primeiro processo de um cliente/OAB era avisado)."""
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            if self.postgres:
+                cur.execute("ALTER TABLE intimacoes DROP CONSTRAINT IF EXISTS intimacoes_diario_pagina_tipo_identificador_key")
+                return
+            cur.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'intimacoes'")
+            if "UNIQUE" not in cur.fetchone()[0]: return
+            cur.execute("ALTER TABLE intimacoes RENAME TO intimacoes_antiga")
+            cur.execute(f"""CREATE TABLE intimacoes (id {pk}, diario TEXT, data_diario TEXT, pagina INTEGER, tipo TEXT,
+                            identificador TEXT, processo_id INTEGER, trecho TEXT, lida INTEGER DEFAULT 0, registrado_em TEXT)""")
+            cur.execute("INSERT INTO intimacoes SELECT * FROM intimacoes_antiga")
+            cur.execute("DROP TABLE intimacoes_antiga")
+
+    def _criar_tabela_movimentacoes(self, pk):
+        """Eventos só são acrescentados (um por movimentação); o par (processo, data, descrição) evita duplicatas."""
+        try:
+            with self.pool.conexao() as conn: conn.cursor().execute("SELECT 1 FROM movimentacoes LIMIT 1")
+            return False
+        except Exception: pass
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute(f"""CREATE TABLE IF NOT EXISTS movimentacoes (id {pk}, processo_id INTEGER, data TEXT, descricao TEXT,
+                            registrado_em TEXT, vista INTEGER DEFAULT 0, UNIQUE (processo_id, data, descricao))""")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_movimentacoes_nao_vistas ON movimentacoes(vista, data)")
+        return True
+
+    def _marcar_legado(self):
+        with self.pool.conexao() as conn:
+            conn.cursor().execute("UPDATE processos SET mov_nao_vista = 1 WHERE ultima_mov LIKE '%Nova movimentação%' OR ultima_mov LIKE '%Concluso%'")
+
+    def _importar_eventos_legados(self):
+        """Processos já marcados viram um evento com a última movimentação conhecida, para seguirem no radar."""
+        agora = datetime.now().strftime("%Y-%m-%d %H:%M")
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id, ultima_mov, ultima_verificacao FROM processos WHERE mov_nao_vista = 1")
+            for id_processo, descricao, verificacao in cur.fetchall():
+                data = verificacao if verificacao and verificacao[:1].isdigit() else agora
+                cur.execute(f"INSERT INTO movimentacoes (processo_id, data, descricao, registrado_em) VALUES ({self.ph}, {self.ph}, {self.ph}, {self.ph}) ON CONFLICT DO NOTHING",
+                            (id_processo, data, descricao, agora))
+
+    def _popular_inicial(self):
+        """Importa o CSV legado (processos_db.csv) na primeira execução; sem ele, grava os exemplos."""
+        linhas = PROCESSOS_EXEMPLO
+        if os.path.exists(DB_FILE):
+            try: linhas = pd.read_csv(DB_FILE, dtype=str).fillna("-").to_dict("records")
+            except Exception: pass
+        self.salvar_linhas(linhas)
+
+    def listar(self):
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT id, {', '.join(self.colunas)} FROM processos ORDER BY id")
+            linhas = cur.fetchall()
+        return pd.DataFrame(linhas, columns=["id"] + list(COLUNAS_PROCESSOS))
+
+    def salvar_linhas(self, linhas):
+        """Upsert por linha: com 'id' atualiza, sem 'id' insere. Devolve os ids das linhas inseridas."""
+        existentes, novas = [], []
+        for linha in linhas:
+            valores = [_valor_db(linha.get(col, "-")) for col in COLUNAS_PROCESSOS]
+            id_linha = _valor_db(linha.get("id"))
+            if id_linha is None: novas.append(valores)
+            else: existentes.append([int(id_linha)] + valores)
+        marcas = ", ".join([self.ph] * len(self.colunas))
+        ids = []
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            if existentes:
+                atualizacao = ", ".join(f"{c} = excluded.{c}" for c in self.colunas)
+                cur.executemany(f"INSERT INTO processos (id, {', '.join(self.colunas)}) VALUES ({self.ph}, {marcas}) ON CONFLICT (id) DO UPDATE SET {atualizacao}", existentes)
+            for valores in novas:
+                sql = f"INSERT INTO processos ({', '.join(self.colunas)}) VALUES ({marcas})"
+                if self.postgres:
+                    cur.execute(sql + " RETURNING id", valores)
+                    ids.append(cur.fetchone()[0])
+                else:
+                    cur.execute(sql, valores)
+                    ids.append(cur.lastrowid)
+        return ids
+
+    def atualizar(self, id_processo, campos):
+        """Atualiza só as colunas informadas de uma linha (sem reescrever o restante)."""
+        self.atualizar_varios({id_processo: campos})
+
+    def atualizar_varios(self, alteracoes):
+        """{id: {coluna: valor}} numa única transação."""
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            for id_processo, campos in alteracoes.items():
+                sets = ", ".join(f"{COLUNAS_PROCESSOS[c]} = {self.ph}" for c in campos)
+                cur.execute(f"UPDATE processos SET {sets} WHERE id = {self.ph}", [_valor_db(v) for v in campos.values()] + [int(id_processo)])
+
+    def registrar_movimentacoes(self, id_processo, eventos, quando=None):
+        """Acrescenta eventos [{"data", "descricao"}] e avança a marca d'água do processo. Devolve quantos eram inéditos."""
+        quando = (quando or datetime.now()).strftime("%Y-%m-%d %H:%M")
+        if not eventos: return 0
+        recente = max(eventos, key=lambda e: e["data"])
+        inseridos = 0
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            for evento in eventos:
+                cur.execute(f"INSERT INTO movimentacoes (processo_id, data, descricao, registrado_em) VALUES ({self.ph}, {self.ph}, {self.ph}, {self.ph}) ON CONFLICT DO NOTHING",
+                            (int(id_processo), evento["data"], evento["descricao"], quando))
+                inseridos += max(cur.rowcount, 0)
+            if inseridos:
+                cur.execute(f"""UPDATE processos SET ultima_mov = {self.ph}, marca_dagua = {self.ph}, ultima_verificacao = {self.ph}, mov_nao_vista = 1
+                                WHERE id = {self.ph} AND (marca_dagua IS NULL OR marca_dagua < {self.ph})""",
+                            (recente["descricao"], recente["data"], quando, int(id_processo), recente["data"]))
+        return inseridos
+
+    def registrar_movimentacao(self, id_processo, descricao, quando=None):
+        quando = quando or datetime.now()
+        return self.registrar_movimentacoes(id_processo, [{"data": quando.strftime("%Y-%m-%d %H:%M:%S"), "descricao": descricao}], quando)
+
+    def marcar_verificados(self, ids, quando=None):
+        if not ids: return
+        quando = (quando or datetime.now()).strftime("%Y-%m-%d %H:%M")
+        with self.pool.conexao() as conn:
+            conn.cursor().executemany(f"UPDATE processos SET ultima_verificacao = {self.ph} WHERE id = {self.ph}", [(quando, int(i)) for i in ids])
+
+    def listar_nao_vistas(self, limite, deslocamento=0):
+        """Página do radar: (DataFrame de eventos não vistos, total de eventos não vistos)."""
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT COUNT(*) FROM movimentacoes WHERE vista = 0")
+            total = cur.fetchone()[0]
+            cur.execute(f"""SELECT m.id, p.cliente, p.processo, p.tribunal, m.data, m.descricao
+                            FROM movimentacoes m JOIN processos p ON p.id = m.processo_id
+                            WHERE m.vista = 0 ORDER BY m.data DESC, m.id LIMIT {self.ph} OFFSET {self.ph}""", (int(limite), int(deslocamento)))
+            linhas = cur.fetchall()
+        return pd.DataFrame(linhas, columns=["id", "Cliente", "Processo", "Tribunal", "Data", "Movimentação"]), total
+
+    def marcar_vistas(self, ids_eventos):
+        """Marca eventos como vistos e recalcula o flag dos processos afetados."""
+        if not ids_eventos: return
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.executemany(f"UPDATE movimentacoes SET vista = 1 WHERE id = {self.ph}", [(int(i),) for i in ids_eventos])
+            cur.execute("""UPDATE processos SET mov_nao_vista = 0 WHERE mov_nao_vista = 1
+                           AND NOT EXISTS (SELECT 1 FROM movimentacoes m WHERE m.processo_id = processos.id AND m.vista = 0)""")
+
+    def alvos_dje(self):
+        """(id, processo, cliente) de toda a carteira, para montar o autômato do leitor de diários."""
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id, processo, cliente FROM processos")
+            return cur.fetchall()
+
+    def registrar_intimacoes(self, diario, data_diario, ocorrencias):
+        """Grava as ocorrências achadas no diário (reprocessar o mesmo diário não duplica). Devolve quantas eram novas."""
+        agora = datetime.now().strftime("%Y-%m-%d %H:%M")
+        inseridas = 0
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            for oc in ocorrencias:
+                cur.execute(f"""INSERT INTO intimacoes (diario, data_diario, pagina, tipo, identificador, processo_id, trecho, registrado_em)
+                                VALUES ({', '.join([self.ph] * 8)}) ON CONFLICT DO NOTHING""",
+                            (diario, data_diario, oc.pagina, oc.tipo, oc.identificador, oc.processo_id, oc.trecho, agora))
+                inseridas += max(cur.rowcount, 0)
+        return inseridas
+
+    def listar_intimacoes(self, limite, deslocamento=0, apenas_nao_lidas=True):
+        filtro = "WHERE i.lida = 0" if apenas_nao_lidas else ""
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT COUNT(*) FROM intimacoes i {filtro}")
+            total = cur.fetchone()[0]
+            cur.execute(f"""SELECT i.id, i.data_diario, i.diario, i.pagina, i.tipo, i.identificador, p.cliente, p.processo, i.trecho
+                            FROM intimacoes i LEFT JOIN processos p ON p.id = i.processo_id {filtro}
+                            ORDER BY i.data_diario DESC, i.id LIMIT {self.ph} OFFSET {self.ph}""", (int(limite), int(deslocamento)))
+            linhas = cur.fetchall()
+        return pd.DataFrame(linhas, columns=["id", "Data", "Diário", "Página", "Tipo", "Identificador", "Cliente", "Processo", "Trecho"]), total
+
+    def marcar_intimacoes_lidas(self, ids):
+        if not ids: return
+        with self.pool.conexao() as conn:
+            conn.cursor().executemany(f"UPDATE intimacoes SET lida = 1 WHERE id = {self.ph}", [(int(i),) for i in ids])
+
+    def pendentes_de_prazo(self):
+        """Intimações e movimentações ainda não avaliadas pelo motor de prazos (id acima da marca de cada origem):
+        ([(origem, origem_id, processo_id, tribunal, data, texto)], {origem: maior id})."""
+        consultas = {"DJE": """SELECT 'DJE', i.id, i.processo_id, COALESCE(p.tribunal, '-'), i.data_diario, i.trecho
+                               FROM intimacoes i LEFT JOIN processos p ON p.id = i.processo_id WHERE i.id > {ph} ORDER BY i.id""",
+                     "MOV": """SELECT 'MOV', m.id, m.processo_id, COALESCE(p.tribunal, '-'), m.data, m.descricao
+                               FROM movimentacoes m LEFT JOIN processos p ON p.id = m.processo_id WHERE m.id > {ph} ORDER BY m.id"""}
+        linhas, marcas = [], {}
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            for origem, sql in consultas.items():
+                cur.execute(f"SELECT valor FROM controle WHERE chave = {self.ph}", (f"prazos_{origem}",))
+                marca = cur.fetchone()
+                cur.execute(sql.format(ph=self.ph), (int(marca[0]) if marca else 0,))
+                novas = cur.fetchall()
+                if novas: marcas[origem] = novas[-1][1]
+                linhas += novas
+        return linhas, marcas
+
+    def registrar_prazos(self, prazos, marcas):
+        """Grava os prazos calculados e avança as marcas na mesma transação."""
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.executemany(f"""INSERT INTO prazos (origem, origem_id, processo_id, tribunal, data_origem, ato, dias, corridos, inicio, vencimento)
+                                VALUES ({', '.join([self.ph] * 10)}) ON CONFLICT DO NOTHING""", [tuple(_valor_db(v) for v in p) for p in prazos])
+            cur.executemany(f"INSERT INTO controle (chave, valor) VALUES ({self.ph}, {self.ph}) ON CONFLICT (chave) DO UPDATE SET valor = excluded.valor",
+                            [(f"prazos_{origem}", str(marca)) for origem, marca in marcas.items()])
+
+    def prazos_na_janela(self, tribunais, de, ate):
+        """Prazos cuja contagem pode passar por algum dia de [de, ate] (os únicos afetados por mudança de feriado nesse período).
+        tribunais=None: todos."""
+        sql = f"SELECT id, tribunal, origem, data_origem, dias, corridos, inicio, vencimento FROM prazos WHERE data_origem <= {self.ph} AND vencimento >= {self.ph}"
+        params = [ate, de]
+        if tribunais is not None:
+            sql += f" AND tribunal IN ({', '.join([self.ph] * len(tribunais))})"
+            params += list(tribunais)
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            return cur.fetchall()
+
+    def atualizar_prazos(self, datas):
+        """[(id, inicio, vencimento)]"""
+        if not datas: return
+        with self.pool.conexao() as conn:
+            conn.cursor().executemany(f"UPDATE prazos SET inicio = {self.ph}, vencimento = {self.ph} WHERE id = {self.ph}", [(i, v, int(p)) for p, i, v in datas])
+
+    def listar_prazos(self, ate, limite, deslocamento=0):
+        """Prazos em aberto vencendo até `ate` (os vencidos inclusive): (DataFrame, total)."""
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT COUNT(*) FROM prazos WHERE cumprido = 0 AND vencimento <= {self.ph}", (ate,))
+            total = cur.fetchone()[0]
+            cur.execute(f"""SELECT z.id, z.vencimento, z.ato, p.cliente, p.processo, z.tribunal, z.origem, z.data_origem, z.dias, z.corridos
+                            FROM prazos z LEFT JOIN processos p ON p.id = z.processo_id
+                            WHERE z.cumprido = 0 AND z.vencimento <= {self.ph} ORDER BY z.vencimento, z.id LIMIT {self.ph} OFFSET {self.ph}""",
+                        (ate, int(limite), int(deslocamento)))
+            linhas = cur.fetchall()
+        return pd.DataFrame(linhas, columns=["id", "Vencimento", "Ato", "Cliente", "Processo", "Tribunal", "Origem", "Data do ato", "Dias", "Corridos"]), total
+
+    def marcar_prazos_cumpridos(self, ids):
+        if not ids: return
+        with self.pool.conexao() as conn:
+            conn.cursor().executemany(f"UPDATE prazos SET cumprido = 1 WHERE id = {self.ph}", [(int(i),) for i in ids])
+
+    def feriados(self, tribunal=None):
+        """[(tribunal, data, descrição)] cadastrados; com `tribunal`, só os dele e os de todos ('*')."""
+        sql, params = "SELECT tribunal, data, descricao FROM feriados", ()
+        if tribunal is not None: sql, params = sql + f" WHERE tribunal IN ({self.ph}, '*')", (tribunal,)
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute(sql + " ORDER BY data", params)
+            return cur.fetchall()
+
+    def salvar_feriado(self, tribunal, data, descricao):
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute(f"INSERT INTO feriados (tribunal, data, descricao) VALUES ({self.ph}, {self.ph}, {self.ph}) ON CONFLICT (tribunal, data) DO UPDATE SET descricao = excluded.descricao",
+                        (tribunal, data, descricao))
+            self._marcar_feriados(cur)
+
+    def remover_feriado(self, tribunal, data):
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute(f"DELETE FROM feriados WHERE tribunal = {self.ph} AND data = {self.ph}", (tribunal, data))
+            self._marcar_feriados(cur)
+
+    def _marcar_feriados(self, cur):
+        """Nova versão dos feriados na mesma transação: os calendários em memória dos outros processos se recalculam."""
+        cur.execute(f"INSERT INTO controle (chave, valor) VALUES ('feriados', {self.ph}) ON CONFLICT (chave) DO UPDATE SET valor = excluded.valor",
+                    (uuid.uuid4().hex,))
+
+    def versao_feriados(self):
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT valor FROM controle WHERE chave = 'feriados'")
+            linha = cur.fetchone()
+            return linha[0] if linha else None
+
+    def listar_para_sincronizar(self, verificados_antes=None):
+        """(id, processo, tribunal, marca_dagua) dos processos com número CNJ, opcionalmente só os não verificados desde `verificados_antes`."""
+        sql = "SELECT id, processo, tribunal, marca_dagua FROM processos WHERE processo IS NOT NULL AND processo NOT IN ('', '-')"
+        params = ()
+        if verificados_antes:
+            sql += f" AND (ultima_verificacao IS NULL OR ultima_verificacao < {self.ph})"
+            params = (verificados_antes.strftime("%Y-%m-%d %H:%M"),)
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            return cur.fetchall()
+
+    def excluir(self, ids):
+        if not ids: return
+        with self.pool.conexao() as conn:
+            cur = conn.cursor()
+            cur.executemany(f"DELETE FROM movimentacoes WHERE processo_id = {self.ph}", [(int(i),) for i in ids])
+            cur.executemany(f"DELETE FROM prazos WHERE processo_id = {self.ph}", [(int(i),) for i in ids])
+            cur.executemany(f"DELETE FROM processos WHERE id = {self.ph}", [(int(i),) for i in ids])
+
+@st.cache_resource
+def obter_repositorio():
+    if DATABASE_URL and DATABASE_URL.startswith(("postgres://", "postgresql://")):
+        return RepositorioProcessos(PoolPostgres(DATABASE_URL), postgres=True)
+    return RepositorioProcessos(PoolSQLite(DB_SQLITE))
+
+# --- GRAVAÇÃO ADIADA (DEBOUNCE) DAS EDIÇÕES DA CARTEIRA ---
+GRAVACAO_ESPERA_SEG = 2.0   # grava depois deste intervalo sem novas edições
+
+class GravadorAdiado:
+    """Acumula alterações de células por id e grava em lote numa thread, após um intervalo sem novas edições."""
+
+    def __init__(self, repositorio, espera):
+        self.repositorio = repositorio
+        self.espera = espera
+        self._pendentes = {}
+        self._ultima_edicao = 0.0
+        self._cond = threading.Condition()
+        threading.Thread(target=self._laco, name="gravador-carteira", daemon=True).start()
+        atexit.register(self.descarregar)
+
+    def enfileirar(self, alteracoes):
+        with self._cond:
+            for id_processo, campos in alteracoes.items():
+                self._pendentes.setdefault(int(id_processo), {}).update(campos)
+            self._ultima_edicao = time.monotonic()
+            self._cond.notify()
+
+    def descarregar(self):
+        with self._cond:
+            lote, self._pendentes = self._pendentes, {}
+        if not lote: return
+        try: self.repositorio.atualizar_varios(lote)
+        except Exception:
+            with self._cond:  # devolve à fila sem sobrescrever edições mais novas
+                for id_processo, campos in lote.items():
+                    self._pendentes[id_processo] = {**campos, **self._pendentes.get(id_processo, {})}
+            raise
+
+    def _laco(self):
+        while True:
+            with self._cond:
+                while not self._pendentes: self._cond.wait()
+                restante = self._ultima_edicao + self.espera - time.monotonic()
+                if restante > 0:
+                    self._cond.wait(restante)
+                    continue
+            try: self.descarregar()
+            except Exception: time.sleep(self.espera)
+
+@st.cache_resource
+def obter_gravador_carteira():
+    return GravadorAdiado(obter_repositorio(), GRAVACAO_ESPERA_SEG)
+
+# --- SINCRONIZAÇÃO COM TRIBUNAIS (SEGUNDO PLANO) ---
+SYNC_INTERVALO_MIN = 60
+SYNC_WORKERS = 8                  # consultas simultâneas
+SYNC_REQ_POR_SEG_TRIBUNAL = 2.0   # limite de requisições por tribunal
+try: TRIBUNAIS_URL = os.environ.get("TRIBUNAIS_URL") or st.secrets.get("TRIBUNAIS_URL")  # ex.: ferramentas/tribunal_fake.py
+except Exception: TRIBUNAIS_URL = os.environ.get("TRIBUNAIS_URL")
+
+class FonteSimulada:
+    """Fonte sem rede (antigo 'robô' da tela): às vezes devolve uma movimentação nova."""
+
+    def __init__(self, probabilidade=0.2):
+        self.probabilidade = probabilidade
+
+    def consultar(self, processo, tribunal, desde=None):
+        time.sleep(0.05)  # simula a latência da consulta
+        if random.random() >= self.probabilidade: return []
+        agora = datetime.now()
+        return [{"data": agora.strftime("%Y-%m-%d %H:%M:%S"), "descricao": f"{agora.strftime('%d/%m')} - Nova movimentação detectada"}]
+
+class FonteHTTP:
+    """Serviço HTTP de andamentos: GET {base}/processos/{numero}/movimentacoes?tribunal=XX&desde=AAAA-MM-DD HH:MM:SS
+    -> [{"data", "descricao"}] só com eventos posteriores a `desde`."""
+
+    def __init__(self, base_url, timeout=15):
+        import requests
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._sessao = requests.Session()
+
+    def consultar(self, processo, tribunal, desde=None):
+        parametros = {"tribunal": tribunal}
+        if desde: parametros["desde"] = desde
+        resposta = self._sessao.get(f"{self.base_url}/processos/{processo}/movimentacoes", params=parametros, timeout=self.timeout)
+        resposta.raise_for_status()
+        return resposta.json()
+
+class SincronizadorTribunais:
+    """Thread única por servidor que consulta a fonte em paralelo (pool limitado, taxa por tribunal) e grava no banco."""
+
+    def __init__(self, repositorio, fonte, intervalo_seg, max_workers, taxa_por_tribunal):
+        from concurrent.futures import ThreadPoolExecutor
+        self.repositorio = repositorio
+        self.fonte = fonte
+        self.intervalo_seg = intervalo_seg
+        self.taxa_por_tribunal = taxa_por_tribunal
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sync-tribunal")
+        self._baldes = {}
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._forcado = True
+        self.rodadas = 0
+        self.em_execucao = False
+        self.ultima_sincronizacao = None
+        self.novas_ultima_rodada = 0
+        self.erros_ultima_rodada = []
+        threading.Thread(target=self._laco, name="sync-tribunais", daemon=True).start()
+
+    def forcar(self):
+        """Próxima rodada imediata e completa (sem pular processos verificados há pouco)."""
+        self._forcado = True
+        self._acordar.set()
+
+    def _balde(self, tribunal):
+        with self._lock:
+            if tribunal not in self._baldes: self._baldes[tribunal] = BaldeTokens(self.taxa_por_tribunal)
+            return self._baldes[tribunal]
+
+    def _laco(self):
+        while True:
+            try: self.sincronizar()
+            except Exception as e: self.erros_ultima_rodada = [f"rodada: {str(e)[:80]}"]
+            self._acordar.wait(self.intervalo_seg)
+            self._acordar.clear()
+
+    def _consultar(self, id_processo, numero, tribunal, marca_dagua):
+        """Busca só eventos posteriores à marca d'água do processo: custo proporcional ao que é novo."""
+        self._balde(tribunal).adquirir()
+        eventos = [e for e in self.fonte.consultar(numero, tribunal, desde=marca_dagua) if not marca_dagua or e["data"] > marca_dagua]
+        return self.repositorio.registrar_movimentacoes(id_processo, eventos)
+
+    def sincronizar(self):
+        from concurrent.futures import as_completed
+        self.em_execucao = True
+        try:
+            forcado, self._forcado = self._forcado, False
+            inicio = datetime.now()
+            alvos = self.repositorio.listar_para_sincronizar(None if forcado else inicio - timedelta(seconds=self.intervalo_seg * 0.9))
+            futuros = {self._pool.submit(self._consultar, *linha): linha for linha in alvos}
+            novas, erros, verificados = 0, [], []
+            for futuro in as_completed(futuros):
+                try:
+                    novas += futuro.result()
+                    verificados.append(futuros[futuro][0])
+                except Exception as e: erros.append(f"{futuros[futuro][1]}: {str(e)[:80]}")
+            self.repositorio.marcar_verificados(verificados, inicio)
+            self.novas_ultima_rodada = novas
+            self.erros_ultima_rodada = erros
+            self.ultima_sincronizacao = datetime.now()
+            self.rodadas += 1
+        finally:
+            self.em_execucao = False
+
+@st.cache_resource
+def obter_sincronizador():
+    fonte = FonteHTTP(TRIBUNAIS_URL) if TRIBUNAIS_URL else FonteSimulada()
+    return SincronizadorTribunais(obter_repositorio(), fonte, SYNC_INTERVALO_MIN * 60, SYNC_WORKERS, SYNC_REQ_POR_SEG_TRIBUNAL)
+
+# --- LEITOR DE DIÁRIOS OFICIAIS (DJE) ---
+try: OAB_ESCRITORIO = [o.strip() for o in (os.environ.get("OAB_ESCRITORIO") or st.secrets.get("OAB_ESCRITORIO") or "").split(",") if o.strip()]
+except Exception: OAB_ESCRITORIO = [o.strip() for o in os.environ.get("OAB_ESCRITORIO", "").split(",") if o.strip()]
+DJE_LOTE_GRAVACAO = 500
+DJE_DIR = os.environ.get("DJE_DIR")  # pasta no servidor com diários grandes demais para upload (só nomes dessa pasta são aceitos)
+
+def diarios_servidor():
+    if not DJE_DIR or not os.path.isdir(DJE_DIR): return []
+    return sorted(n for n in os.listdir(DJE_DIR) if n.lower().endswith((".pdf", ".txt")) and os.path.isfile(os.path.join(DJE_DIR, n)))
+
+def caminho_diario_servidor(nome):
+    """Caminho do diário `nome` dentro de DJE_DIR, ou None se não for um arquivo dessa pasta."""
+    if not DJE_DIR or not nome or os.path.basename(nome) != nome: return None
+    pasta = os.path.realpath(DJE_DIR)
+    caminho = os.path.realpath(os.path.join(pasta, nome))
+    if os.path.dirname(caminho) != pasta or not os.path.isfile(caminho): return None
+    return caminho
+
+def varrer_diario(arquivo, nome, data_diario, oabs, ao_progredir=None):
+    """Varre o diário (PDF página a página ou texto em blocos) contra CNJ, clientes e OABs numa passada só.
+
+    As ocorrências vão para a tabela de intimações em lotes, sem acumular o diário em memória."""
+    repo = obter_repositorio()
+    alvos = [("OAB", oab, padroes_oab(oab), None) for oab in oabs]
+    for id_processo, numero, cliente in repo.alvos_dje():
+        alvos.append(("CNJ", numero, padroes_cnj(numero), id_processo))
+        alvos.append(("CLIENTE", cliente, padroes_nome(cliente or ""), id_processo))
+    leitor = LeitorDJE(alvos)
+    blocos = blocos_pdf(arquivo) if nome.lower().endswith(".pdf") else blocos_texto(arquivo)
+    if ao_progredir: blocos = _avisando(blocos, ao_progredir)
+    novas, lote = 0, []
+    for ocorrencia in leitor.varrer(blocos):
+        lote.append(ocorrencia)
+        if len(lote) >= DJE_LOTE_GRAVACAO:
+            novas += repo.registrar_intimacoes(nome, data_diario, lote)
+            lote = []
+    return novas + repo.registrar_intimacoes(nome, data_diario, lote)
+
+def _avisando(blocos, ao_progredir):
+    for pagina, texto in blocos:
+        ao_progredir(pagina)
+        yield pagina, texto
+
+# --- MOTOR DE PRAZOS ---
+PRAZOS_ANOS = (date.today().year - 10, date.today().year + 3)  # período coberto pelos calendários em memória
+
+def _texto_data(valores):
+    return [None if v == "NaT" else v for v in np.datetime_as_string(valores, unit="D")]
+
+class AgendaPrazos:
+    """Calendário forense por tribunal (arrays pré-calculados) e prazos derivados das intimações e movimentações.
+
+    Ao cadastrar ou remover um feriado, o calendário em memória é atualizado a partir do dia alterado e só os prazos
+    cuja contagem passa por esse dia são recalculados. Feriados alterados por outro processo (outra réplica do app)
+    são percebidos pela versão gravada em `controle` e atualizam os calendários na consulta seguinte."""
+
+    def __init__(self, repositorio, primeiro_ano, ultimo_ano):
+        self.repo = repositorio
+        self.anos = (primeiro_ano, ultimo_ano)
+        self._calendarios = {}
+        self._versao = None
+        self._trava = threading.Lock()
+        self._trava_derivar = threading.Lock()
+
+    def _feriados(self, tribunal):
+        return [d for d, _ in feriados_forenses(tribunal, *self.anos)] + [date.fromisoformat(d) for _, d, _ in self.repo.feriados(tribunal)]
+
+    def _sincronizar(self):
+        """Com a trava: recalcula os calendários em memória se a versão dos feriados no banco mudou. A versão é lida
+        antes dos feriados, então uma alteração concorrente no meio fica para a próxima consulta."""
+        versao = self.repo.versao_feriados()
+        if versao == self._versao: return
+        for nome, calendario in self._calendarios.items(): calendario.atualizar_feriados(self._feriados(nome))
+        self._versao = versao
+
+    def calendario(self, tribunal):
+        with self._trava:
+            self._sincronizar()
+            if tribunal not in self._calendarios:
+                self._calendarios[tribunal] = CalendarioForense(self._feriados(tribunal), *self.anos)
+            return self._calendarios[tribunal]
+
+    def calcular(self, tribunal, datas, dias, publicacao_dje=False, corridos=False):
+        """Vetorizado: ([início], [vencimento]) como 'AAAA-MM-DD' (None fora do período do calendário)."""
+        inicio, vencimento = self.calendario(tribunal).vencimentos(np.array(datas, dtype="datetime64[D]"), dias, publicacao_dje, corridos)
+        return _texto_data(inicio), _texto_data(vencimento)
+
+    def uteis_restantes(self, tribunais, vencimentos, hoje=None):
+        """Dias úteis de hoje até cada vencimento (negativo: vencido; NaN fora do calendário), agrupando por tribunal."""
+        hoje = np.datetime64(hoje or date.today(), "D")
+        restantes = np.full(len(vencimentos), np.nan)
+        tribunais, vencimentos = np.asarray(tribunais, dtype=object), np.array(vencimentos, dtype="datetime64[D]")
+        for tribunal in set(tribunais):
+            grupo = tribunais == tribunal
+            restantes[grupo] = self.calendario(tribunal).uteis_entre(hoje, vencimentos[grupo])
+        return restantes
+
+    def derivar(self):
+        """Avalia as intimações e movimentações novas e grava os prazos que elas abrem. Devolve quantos prazos foram criados."""
+        with self._trava_derivar:
+            pendentes, marcas = self.repo.pendentes_de_prazo()
+            if not marcas: return 0
+            por_tribunal = {}
+            for origem, origem_id, processo_id, tribunal, data, texto in pendentes:
+                regra = classificar(texto, tribunal, padrao=origem == "DJE")
+                data = (data or "")[:10]
+                if regra is None or not re.fullmatch(r"\d{4}-\d{2}-\d{2}", data): continue
+                ato, dias, corridos = regra
+                por_tribunal.setdefault(tribunal, []).append((origem, origem_id, processo_id, tribunal, data, ato, dias, int(corridos)))
+            prazos = []
+            for tribunal, linhas in por_tribunal.items():
+                inicio, vencimento = self.calcular(tribunal, [l[4] for l in linhas], [l[6] for l in linhas],
+                                                   [l[0] == "DJE" for l in linhas], [bool(l[7]) for l in linhas])
+                prazos += [l + (i, v) for l, i, v in zip(linhas, inicio, vencimento) if v]
+            self.repo.registrar_prazos(prazos, marcas)
+            return len(prazos)
+
+    def alterar_feriado(self, tribunal, dia, descricao=None):
+        """Cadastra (ou, sem descrição, remove) um feriado do tribunal ('*': todos) e recalcula o que ele afeta.
+        Devolve quantos prazos mudaram de data."""
+        dia = dia.isoformat()
+        if descricao: self.repo.salvar_feriado(tribunal, dia, descricao)
+        else: self.repo.remover_feriado(tribunal, dia)
+        with self._trava: self._sincronizar()
+        # Um feriado só muda o próprio dia: basta recalcular os prazos cuja contagem passa por ele
+        afetados = self.repo.prazos_na_janela(None if tribunal == "*" else [tribunal], dia, dia)
+        por_tribunal = {}
+        for linha in afetados: por_tribunal.setdefault(linha[1], []).append(linha)
+        mudancas = []
+        for nome, grupo in por_tribunal.items():
+            inicio, vencimento = self.calcular(nome, [g[3] for g in grupo], [g[4] for g in grupo],
+                                               [g[2] == "DJE" for g in grupo], [bool(g[5]) for g in grupo])
+            mudancas += [(g[0], i, v) for g, i, v in zip(grupo, inicio, vencimento) if v and (i, v) != (g[6], g[7])]
+        self.repo.atualizar_prazos(mudancas)
+        return len(mudancas)
+
+@st.cache_resource
+def obter_agenda_prazos():
+    return AgendaPrazos(obter_repositorio(), *PRAZOS_ANOS)
+
+# --- GED: DOCUMENTOS GERADOS (SQLITE + FTS5) ---
+GED_SQLITE = "ged.sqlite"
+GED_POR_PAGINA = 20
+GED_RESUMO_CHARS = 200
+
+class ArquivoDocumentos:
+    """Documentos gerados persistidos em disco: metadados + corpo comprimido (zlib) e um índice FTS5 sem conteúdo
+    (só os termos; o texto fica uma vez, comprimido). Listagem e busca leem só metadados; o corpo é descomprimido
+    apenas quando o documento é aberto ou exportado."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        with self.pool.conexao() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS documentos (id INTEGER PRIMARY KEY, criado_em TEXT, tipo TEXT, cliente TEXT,
+                    resumo TEXT, tamanho INTEGER, hash TEXT, conteudo BLOB, UNIQUE (tipo, cliente, hash));
+                CREATE INDEX IF NOT EXISTS idx_documentos_cliente ON documentos(cliente, criado_em);
+                CREATE INDEX IF NOT EXISTS idx_documentos_tipo ON documentos(tipo, criado_em);
+                CREATE INDEX IF NOT EXISTS idx_documentos_data ON documentos(criado_em);
+                CREATE VIRTUAL TABLE IF NOT EXISTS documentos_fts USING fts5(tipo, cliente, texto, content='',
+                    tokenize='unicode61 remove_diacritics 2');
+            """)
+
+    def salvar(self, tipo, cliente, conteudo, quando=None):
+        """Grava o documento (o mesmo texto para o mesmo cliente/tipo não é duplicado). Devolve o id."""
+        dados = conteudo.encode("utf-8")
+        chave = hashlib.sha256(dados).hexdigest()
+        with self.pool.conexao() as conn:
+            existente = conn.execute("SELECT id FROM documentos WHERE tipo = ? AND cliente = ? AND hash = ?", (tipo, cliente, chave)).fetchone()
+            if existente: return existente[0]
+            cur = conn.execute("INSERT INTO documentos (criado_em, tipo, cliente, resumo, tamanho, hash, conteudo) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               ((quando or datetime.now()).strftime("%Y-%m-%d %H:%M:%S"), tipo, cliente, conteudo[:GED_RESUMO_CHARS],
+                                len(dados), chave, zlib.compress(dados, 6)))
+            conn.execute("INSERT INTO documentos_fts (rowid, tipo, cliente, texto) VALUES (?, ?, ?, ?)", (cur.lastrowid, tipo, cliente, conteudo))
+            return cur.lastrowid
+
+    @staticmethod
+    def _consulta_fts(busca):
+        """Termos do usuário como frases entre aspas (sem operadores do FTS5); o último casa por prefixo."""
+        termos = re.findall(r"\w+", busca or "")
+        return " ".join(f'"{t}"' for t in termos) + ("*" if termos else "")
+
+    def _filtros(self, cliente, tipo, de, ate, busca):
+        condicoes, valores = [], []
+        if cliente: condicoes.append("d.cliente = ?"); valores.append(cliente)
+        if tipo: condicoes.append("d.tipo = ?"); valores.append(tipo)
+        if de: condicoes.append("d.criado_em >= ?"); valores.append(str(de))
+        if ate: condicoes.append("d.criado_em < ?"); valores.append(str(ate + timedelta(days=1)))
+        consulta = self._consulta_fts(busca)
+        origem = "documentos d"
+        if consulta:
+            origem = "documentos_fts f JOIN documentos d ON d.id = f.rowid"
+            condicoes.append("documentos_fts MATCH ?"); valores.append(consulta)
+        return origem, (" WHERE " + " AND ".join(condicoes) if condicoes else ""), valores, bool(consulta)
+
+    def listar(self, cliente=None, tipo=None, de=None, ate=None, busca=None, limite=GED_POR_PAGINA, deslocamento=0):
+        """(página de metadados, total): mais recentes primeiro ou, com busca, por relevância (bm25)."""
+        origem, onde, valores, com_busca = self._filtros(cliente, tipo, de, ate, busca)
+        ordem = "bm25(documentos_fts), d.id DESC" if com_busca else "d.criado_em DESC, d.id DESC"
+        with self.pool.conexao() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM {origem}{onde}", valores).fetchone()[0]
+            linhas = conn.execute(f"SELECT d.id, d.criado_em, d.tipo, d.cliente, d.tamanho, d.resumo FROM {origem}{onde} ORDER BY {ordem} LIMIT ? OFFSET ?",
+                                  valores + [limite, deslocamento]).fetchall()
+        return pd.DataFrame(linhas, columns=["id", "Data", "Tipo", "Cliente", "Tamanho", "Resumo"]), total
+
+    def ids(self, cliente=None, tipo=None, de=None, ate=None, busca=None):
+        origem, onde, valores, _ = self._filtros(cliente, tipo, de, ate, busca)
+        with self.pool.conexao() as conn: return [r[0] for r in conn.execute(f"SELECT d.id FROM {origem}{onde} ORDER BY d.id", valores)]
+
+    def conteudo(self, id_documento):
+        with self.pool.conexao() as conn: linha = conn.execute("SELECT conteudo FROM documentos WHERE id = ?", (id_documento,)).fetchone()
+        return zlib.decompress(linha[0]).decode("utf-8") if linha else None
+
+    def iterar(self, ids):
+        """(tipo, cliente, texto) documento a documento, para exportações que não cabem inteiras na memória."""
+        for id_documento in ids:
+            with self.pool.conexao() as conn:
+                linha = conn.execute("SELECT tipo, cliente, conteudo FROM documentos WHERE id = ?", (id_documento,)).fetchone()
+            if linha: yield linha[0], linha[1], zlib.decompress(linha[2]).decode("utf-8")
+
+    def valores(self, coluna):
+        """Clientes ou tipos distintos, para os filtros da tela."""
+        with self.pool.conexao() as conn: return [r[0] for r in conn.execute(f"SELECT DISTINCT {coluna} FROM documentos ORDER BY {coluna}")]
+
+    def excluir(self, ids):
+        if not ids: return
+        with self.pool.conexao() as conn:
+            for id_documento, tipo, cliente, conteudo in conn.execute(f"SELECT id, tipo, cliente, conteudo FROM documentos WHERE id IN ({','.join('?' * len(ids))})", list(ids)).fetchall():
+                conn.execute("INSERT INTO documentos_fts (documentos_fts, rowid, tipo, cliente, texto) VALUES ('delete', ?, ?, ?, ?)",
+                             (id_documento, tipo, cliente, zlib.decompress(conteudo).decode("utf-8")))
+                conn.execute("DELETE FROM documentos WHERE id = ?", (id_documento,))
+
+@st.cache_resource
+def obter_arquivo_documentos():
+    return ArquivoDocumentos(PoolSQLite(GED_SQLITE))
+
+# --- FILA DE GERAÇÕES (SEGUNDO PLANO) ---
+FILA_WORKERS = 4               # gerações simultâneas no servidor (todas as sessões)
+FILA_POR_USUARIO = 2           # trabalhos na fila ou rodando por usuário
+FILA_RETENCAO_HORAS = 24       # resultados consultáveis por este tempo (o documento também vai para o GED)
+FILA_CONSULTA_SEG = 2          # intervalo com que a tela consulta o andamento
+PENDENTES = ("fila", "rodando")
+
+Trabalho = namedtuple("Trabalho", "id usuario rotulo tipo cliente estado criado_em iniciado_em concluido_em resultado")
+
+class LimiteTrabalhos(Exception):
+    pass
+
+class FilaGeracoes:
+    """Gerações do Gemini fora do script do Streamlit: pool limitado de threads, trabalho e resultado gravados em SQLite
+    (a tela guarda só o id e consulta nos reruns), limite de trabalhos simultâneos por usuário e deduplicação (o mesmo
+    prompt, com o mesmo rótulo e documento, ainda na fila ou rodando devolve o id existente em vez de chamar o modelo
+    de novo; pedidos com usar_cache=False sempre geram um trabalho próprio).
+
+    O texto parcial fica em memória para a tela acompanhar a geração; trabalhos interrompidos por um reinício do
+    servidor voltam para a fila ao subir. `arquivar(tipo, cliente, texto)` recebe os resultados com documento."""
+
+    def __init__(self, caminho, cliente, cache, arquivar=None, workers=FILA_WORKERS, por_usuario=FILA_POR_USUARIO,
+                 retencao_seg=FILA_RETENCAO_HORAS * 3600):
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self.cliente = cliente
+        self.cache = cache
+        self.arquivar = arquivar
+        self.por_usuario = por_usuario
+        self.retencao_seg = retencao_seg
+        self.deduplicados = 0
+        self._parciais = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False, timeout=30)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS trabalhos (id TEXT PRIMARY KEY, chave TEXT, usuario TEXT, rotulo TEXT, tipo TEXT, cliente TEXT,
+                usar_cache INTEGER, prompt BLOB, estado TEXT, criado_em REAL, iniciado_em REAL, concluido_em REAL, resultado TEXT);
+            CREATE INDEX IF NOT EXISTS idx_trabalhos_chave ON trabalhos(chave, estado);
+            CREATE INDEX IF NOT EXISTS idx_trabalhos_usuario ON trabalhos(usuario, estado);
+            CREATE INDEX IF NOT EXISTS idx_trabalhos_criado ON trabalhos(criado_em);
+        """)
+        # Threads daemon (e não um ThreadPoolExecutor, que segura a saída do processo até a chamada em curso terminar):
+        # o que estiver rodando num desligamento volta para a fila na próxima subida.
+        self._pendentes = queue.Queue()
+        with self._lock, self._conn:
+            for (id_trabalho,) in self._conn.execute("SELECT id FROM trabalhos WHERE estado IN ('fila', 'rodando') ORDER BY criado_em"):
+                self._pendentes.put(id_trabalho)
+            self._conn.execute("UPDATE trabalhos SET estado = 'fila', iniciado_em = NULL WHERE estado = 'rodando'")
+        for i in range(workers): threading.Thread(target=self._laco, name=f"fila-geracoes-{i}", daemon=True).start()
+
+    def submeter(self, usuario, prompt, rotulo, usar_cache=True, documento=None):
+        """Enfileira e devolve o id. `documento` = (tipo, cliente) arquiva o resultado no GED. LimiteTrabalhos se o
+        usuário já tem `por_usuario` trabalhos pendentes."""
+        chave = self.cache.chave(prompt, self.cliente.modelos)
+        tipo, cliente = documento or (None, None)
+        agora = time.time()
+        with self._lock:
+            existente = usar_cache and self._conn.execute(
+                "SELECT id FROM trabalhos WHERE chave = ? AND estado IN ('fila', 'rodando') AND usar_cache = 1 AND rotulo = ? AND tipo IS ? AND cliente IS ?",
+                (chave, rotulo, tipo, cliente)).fetchone()
+            if existente:
+                self.deduplicados += 1
+                return existente[0]
+            ativos = self._conn.execute("SELECT COUNT(*) FROM trabalhos WHERE usuario = ? AND estado IN ('fila', 'rodando')", (usuario,)).fetchone()[0]
+            if ativos >= self.por_usuario:
+                raise LimiteTrabalhos(f"Você já tem {ativos} geração(ões) em andamento; aguarde uma terminar para pedir outra.")
+            id_trabalho = uuid.uuid4().hex
+            with self._conn:
+                self._conn.execute("INSERT INTO trabalhos VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'fila', ?, NULL, NULL, NULL)",
+                                   (id_trabalho, chave, usuario, rotulo, tipo, cliente, int(usar_cache), zlib.compress(prompt.encode("utf-8"), 6), agora))
+                self._conn.execute("DELETE FROM trabalhos WHERE criado_em < ? AND estado NOT IN ('fila', 'rodando')", (agora - self.retencao_seg,))
+        self._pendentes.put(id_trabalho)
+        return id_trabalho
+
+    def _laco(self):
+        while True: self._rodar(self._pendentes.get())
+
+    def _rodar(self, id_trabalho):
+        with self._lock, self._conn:
+            linha = self._conn.execute("SELECT prompt, usar_cache, tipo, cliente, usuario, criado_em FROM trabalhos WHERE id = ?", (id_trabalho,)).fetchone()
+            if linha is None: return
+            agora = time.time()
+            self._conn.execute("UPDATE trabalhos SET estado = 'rodando', iniciado_em = ? WHERE id = ?", (agora, id_trabalho))
+            pedacos = self._parciais[id_trabalho] = []
+        prompt, usar_cache, tipo, cliente, usuario = zlib.decompress(linha[0]).decode("utf-8"), bool(linha[1]), *linha[2:5]
+        MEDIDOR.registrar("fila.espera", agora - linha[5])
+        try:
+            for pedaco in tentar_gerar_conteudo_stream(prompt, usar_cache, self.cliente, self.cache, usuario): pedacos.append(pedaco)
+            texto = "".join(pedacos)
+            estado = "erro" if "❌ FALHA GERAL" in texto or texto.startswith("⚠️") else "pronto"
+            if estado == "pronto" and tipo and self.arquivar: self.arquivar(tipo, cliente or "-", texto)
+        except Exception as e:
+            texto, estado = f"❌ Falha na geração: {str(e)[:200]}", "erro"
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE trabalhos SET estado = ?, concluido_em = ?, resultado = ? WHERE id = ?", (estado, time.time(), texto, id_trabalho))
+            self._parciais.pop(id_trabalho, None)
+
+    def consultar(self, id_trabalho):
+        with self._lock:
+            linha = self._conn.execute("""SELECT id, usuario, rotulo, tipo, cliente, estado, criado_em, iniciado_em, concluido_em, resultado
+                                          FROM trabalhos WHERE id = ?""", (id_trabalho,)).fetchone()
+        return Trabalho(*linha) if linha else None
+
+    def parcial(self, id_trabalho):
+        """Texto recebido até agora de um trabalho rodando ("" se não começou ou já terminou)."""
+        return "".join(self._parciais.get(id_trabalho, ()))
+
+    def estatisticas(self):
+        with self._lock:
+            contagem = dict(self._conn.execute("SELECT estado, COUNT(*) FROM trabalhos GROUP BY estado").fetchall())
+            espera = self._conn.execute("SELECT AVG(iniciado_em - criado_em) FROM trabalhos WHERE iniciado_em IS NOT NULL").fetchone()[0]
+        return {"fila": contagem.get("fila", 0), "rodando": contagem.get("rodando", 0), "prontos": contagem.get("pronto", 0),
+                "erros": contagem.get("erro", 0), "deduplicados": self.deduplicados, "espera_media": espera or 0.0}
+
+@st.cache_resource
+def obter_fila_geracoes():
+    return FilaGeracoes(os.path.join(CACHE_DIR, "trabalhos.sqlite"), obter_cliente_gemini(), obter_cache_respostas(), obter_arquivo_documentos().salvar)
+
+@cronometrado("carteira.carregar")
+def carregar_dados():
+    """Carrega a carteira do banco (a coluna 'id' identifica a linha para gravações parciais)."""
+    obter_gravador_carteira().descarregar()
+    return obter_repositorio().listar()
 
+@cronometrado("carteira.salvar")
 def salvar_dados(df):
-    df.to_csv(DB_FILE, index=False)
+    """Grava o DataFrame por upsert de linha e remove do banco as linhas que saíram dele."""
+    repo = obter_repositorio()
+    atuais = set(repo.listar()["id"].tolist())
+    mantidos = {int(i) for i in df["id"].dropna()} if "id" in df.columns else set()
+    repo.excluir(sorted(atuais - mantidos))
+    repo.salvar_linhas(df.to_dict("records"))
 
 def get_base64_of_bin_file(bin_file):
     try:
@@ -93,243 +1646,449 @@ def get_base64_of_bin_file(bin_file):
         return base64.b64encode(data).decode()
     except: return None
 
+@cronometrado("docx.gerar")
 def gerar_word(texto):
-    doc = Document()
-    for p in texto.split('\n'):
-        if p.strip(): doc.add_paragraph(p)
-    buf = BytesIO()
-    doc.save(buf)
-    buf.seek(0)
-    return buf
-
+    """Bytes do DOCX (títulos, listas e negrito do Markdown preservados). Nos botões, vai como partial(gerar_word, texto):
+    o arquivo só é montado quando o usuário clica."""
+    return documento_docx(texto)
+
+@cronometrado("ged.zip")
+def gerar_zip_documentos(ids):
+    """Zip com um DOCX por documento do GED. A montagem passa por arquivo temporário (um documento por vez em memória),
+    mas o zip pronto volta inteiro em bytes: o download_button do Streamlit guarda o conteúdo em memória de qualquer jeito."""
+    documentos = obter_arquivo_documentos().iterar(ids)
+    with tempfile.TemporaryFile() as arquivo:
+        exportar_documentos_zip(((f"{i:04d}_{nome_arquivo(f'{tipo} {cliente}')}.docx", texto) for i, (tipo, cliente, texto) in enumerate(documentos, 1)), arquivo)
+        arquivo.seek(0)
+        return arquivo.read()
+
+def ler_bytes_arquivo(arquivo):
+    """Lê o conteúdo de um upload/arquivo sem alterar a posição do ponteiro."""
+    if isinstance(arquivo, (bytes, bytearray)): return bytes(arquivo)
+    if hasattr(arquivo, "getvalue"): return arquivo.getvalue()
+    if isinstance(arquivo, str):
+        with open(arquivo, "rb") as f: return f.read()
+    pos = arquivo.tell()
+    arquivo.seek(0)
+    dados = arquivo.read()
+    arquivo.seek(pos)
+    return dados
+
+@cronometrado("pdf.extrair")
 def extrair_texto_pdf(arquivo):
-    try: return "".join([p.extract_text() for p in PdfReader(arquivo).pages])
+    try: dados = ler_bytes_arquivo(arquivo)
+    except: return ""
+    chave = hashlib.sha256(dados).hexdigest()
+    cache = obter_cache_pdf()
+    texto = cache.obter(chave)
+    if texto is not None: return texto
+    from pypdf import PdfReader
+    try: texto = "".join([p.extract_text() for p in PdfReader(BytesIO(dados)).pages])
     except: return ""
+    cache.guardar(chave, texto)
+    return texto
+
+# --- EXTRAÇÃO EM LOTE (POOL DE PROCESSOS) ---
+PDF_PAGINAS_POR_TAREFA = 8   # páginas enviadas por tarefa ao pool
+
+EventoPagina = namedtuple("EventoPagina", "arquivo chave pagina paginas_arquivo texto prontas total")
+
+@st.cache_resource
+def obter_pool_pdf():
+    """Pool compartilhado entre sessões. Nada de 'fork': a essa altura o processo já tem as threads do loop do Gemini,
+    da sincronização, do gravador e da fila (e o gRPC), e um filho copiado com uma trava presa pode travar para sempre."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1), mp_context=multiprocessing.get_context(metodo))
+
+def extrair_lote_pdfs(arquivos):
+    """Distribui as páginas de todos os arquivos pelo pool e gera um EventoPagina por página concluída.
+
+    Cada PDF vai para um arquivo temporário uma vez só: as tarefas levam o caminho e a faixa de páginas, não os bytes.
+    Arquivos já em cache (ou ilegíveis) geram um único evento com pagina=None e o texto completo."""
+    from concurrent.futures import as_completed
+    from pypdf import PdfReader
+    cache = obter_cache_pdf()
+    pool = obter_pool_pdf()
+    planos, resolvidos = [], []
+    for i, arquivo in enumerate(arquivos):
+        try: dados = ler_bytes_arquivo(arquivo)
+        except Exception:
+            resolvidos.append((i, None, ""))
+            continue
+        chave = hashlib.sha256(dados).hexdigest()
+        texto = cache.obter(chave)
+        if texto is not None:
+            resolvidos.append((i, chave, texto))
+            continue
+        try: n_paginas = len(PdfReader(BytesIO(dados)).pages)
+        except Exception:
+            resolvidos.append((i, chave, ""))
+            continue
+        if n_paginas == 0:
+            resolvidos.append((i, chave, ""))
+            continue
+        planos.append((i, chave, dados, n_paginas))
 
-def buscar_contexto_juridico(tema, area):
-    return "" 
+    total = len(resolvidos) + sum(p[3] for p in planos)
+    prontas = 0
+    for i, chave, texto in resolvidos:
+        prontas += 1
+        yield EventoPagina(i, chave, None, 1, texto, prontas, total)
 
-def gerar_pdf_com_timbrado(texto_contrato, arquivo_timbrado):
-    if not HAS_REPORTLAB: return None
+    if not planos: return
+    pasta = tempfile.mkdtemp(prefix="legalhub_pdf_")
+    futuros = {}
     try:
-        packet = BytesIO()
-        can = canvas.Canvas(packet, pagesize=A4)
-        width, height = A4
-        can.setFont("Helvetica", 10)
-        y_position = height - 130
-        margin_left = 50
-        max_width = width - 100
-        
-        linhas = texto_contrato.split('\n')
-        for linha in linhas:
-            wrapped_lines = simpleSplit(linha, "Helvetica", 10, max_width)
-            for wrapped in wrapped_lines:
-                if y_position < 100:
-                    can.showPage()
-                    can.setFont("Helvetica", 10)
-                    y_position = height - 130
-                can.drawString(margin_left, y_position, wrapped)
-                y_position -= 12
-            y_position -= 5
-        can.save()
-        packet.seek(0)
-        
-        new_pdf = PdfReader(packet)
-        existing_pdf = PdfReader(arquivo_timbrado)
-        output = PdfWriter()
-        page_timbrado = existing_pdf.pages[0] 
-
-        for i in range(len(new_pdf.pages)):
-            page_texto = new_pdf.pages[i]
-            page_fundo = PageObject.create_blank_page(width=width, height=height)
-            page_fundo.merge_page(page_timbrado)
-            page_fundo.merge_page(page_texto)
-            output.add_page(page_fundo)
-            
-        output_stream = BytesIO()
-        output.write(output_stream)
-        output_stream.seek(0)
-        return output_stream
+        faixas = []
+        for i, chave, dados, n in planos:
+            caminho = os.path.join(pasta, f"{i}.pdf")
+            with open(caminho, "wb") as f: f.write(dados)
+            faixas += [(i, chave, caminho, n, ini, min(ini + PDF_PAGINAS_POR_TAREFA, n)) for ini in range(0, n, PDF_PAGINAS_POR_TAREFA)]
+        futuros = {pool.submit(extrair_faixa_pdf, f[2], f[1], f[4], f[5]): f for f in faixas}
+        for fut in as_completed(futuros):
+            i, chave, caminho, n, ini, fim = futuros[fut]
+            try: textos = fut.result()
+            except Exception: textos = extrair_faixa_pdf(caminho, chave, ini, fim)  # pool quebrado: segue localmente
+            for deslocamento, texto in enumerate(textos):
+                prontas += 1
+                yield EventoPagina(i, chave, ini + deslocamento, n, texto, prontas, total)
+    finally:
+        for fut in futuros: fut.cancel()  # gerador abandonado no meio: não deixa o pool lendo arquivos apagados
+        shutil.rmtree(pasta, ignore_errors=True)
+
+@cronometrado("pdf.extrair_lote")
+def extrair_textos_pdfs(arquivos, ao_progredir=None):
+    """Versão em lote de extrair_texto_pdf: devolve os textos na ordem dos arquivos.
+
+    Página que falhou entra como "" e o resto do arquivo é aproveitado; só o texto sem falhas vai para o cache."""
+    cache = obter_cache_pdf()
+    textos = [""] * len(arquivos)
+    paginas = [{} for _ in arquivos]
+    falhas = set()
+    for ev in extrair_lote_pdfs(arquivos):
+        if ev.pagina is None:
+            textos[ev.arquivo] = ev.texto
+        else:
+            if ev.texto is None: falhas.add(ev.arquivo)
+            paginas[ev.arquivo][ev.pagina] = ev.texto or ""
+            if len(paginas[ev.arquivo]) == ev.paginas_arquivo:
+                textos[ev.arquivo] = "".join([paginas[ev.arquivo][p] for p in range(ev.paginas_arquivo)])
+                paginas[ev.arquivo] = {}
+                if ev.arquivo not in falhas: cache.guardar(ev.chave, textos[ev.arquivo])
+        if ao_progredir: ao_progredir(ev.prontas, ev.total)
+    return textos
+
+def extrair_textos_com_progresso(arquivos):
+    barra = st.progress(0.0, text="Lendo páginas...")
+    textos = extrair_textos_pdfs(arquivos, lambda feitas, total: barra.progress(min(1.0, feitas / max(total, 1)), text=f"Páginas lidas: {feitas}/{total}"))
+    barra.empty()
+    return textos
+
+# --- ÍNDICE DE BUSCA POR CASO (BM25 + EMBEDDINGS OPCIONAIS) ---
+INDICE_TOKENS_TRECHO = 250      # tamanho de cada trecho indexado
+INDICE_EMBEDDINGS = False       # True -> combina BM25 com similaridade de embeddings (chama a API ao indexar)
+BM25_K1, BM25_B = 1.2, 0.75
+
+STOPWORDS_PT = set("""a o as os um uma uns umas de da do das dos em na no nas nos por pela pelo pelas pelos para com sem
+e ou que se ao aos à às é foi ser são sua seu suas seus lhe como mais mas não nao já ja este esta isso isto esse essa
+ele ela eles elas the of""".split())
+
+def normalizar_texto(texto):
+    """Minúsculas e sem acentos: base comum para indexação e casamento de termos."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join([c for c in texto if not unicodedata.combining(c)])
+
+def tokenizar(texto):
+    return [t for t in re.findall(r"\w+", normalizar_texto(texto)) if len(t) > 1 and t not in STOPWORDS_PT]
+
+class IndiceCasos:
+    """Índice invertido BM25 persistido em SQLite, um espaço por caso, atualizado incrementalmente por documento.
+
+    Com embeddings ligados, os vetores de cada caso ficam numa matriz float32 em disco lida via np.memmap."""
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        os.makedirs(pasta, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(pasta, "indice.sqlite"), check_same_thread=False, timeout=30)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS documentos (caso TEXT, chave TEXT, nome TEXT, PRIMARY KEY (caso, chave));
+            CREATE TABLE IF NOT EXISTS trechos (id INTEGER PRIMARY KEY, caso TEXT, chave_doc TEXT, nome TEXT, texto TEXT, n_termos INTEGER, linha_vetor INTEGER);
+            CREATE INDEX IF NOT EXISTS idx_trechos_caso ON trechos(caso);
+            CREATE TABLE IF NOT EXISTS postings (caso TEXT, termo TEXT, trecho_id INTEGER, tf INTEGER);
+            CREATE INDEX IF NOT EXISTS idx_postings_termo ON postings(caso, termo);
+        """)
+
+    def _arquivo_vetores(self, caso):
+        return os.path.join(self.pasta, hashlib.sha256(caso.encode("utf-8")).hexdigest()[:24] + ".f32")
+
+    def _vetores(self, caso, dim):
+        caminho = self._arquivo_vetores(caso)
+        if not os.path.exists(caminho) or os.path.getsize(caminho) == 0: return None
+        return np.memmap(caminho, dtype=np.float32, mode="r", shape=(os.path.getsize(caminho) // (4 * dim), dim))
+
+    def adicionar(self, caso, nome, texto):
+        """Indexa o documento se ainda não estiver no caso (chave = hash do texto). Devolve True se indexou."""
+        chave = hashlib.sha256(texto.encode("utf-8")).hexdigest()
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM documentos WHERE caso = ? AND chave = ?", (caso, chave)).fetchone(): return False
+        trechos = dividir_em_blocos(texto, INDICE_TOKENS_TRECHO)
+        vetores = obter_cliente_gemini().embeddings(trechos) if INDICE_EMBEDDINGS and trechos else None
+        with self._lock:
+            # Outra sessão pode ter indexado o mesmo documento enquanto os trechos/embeddings eram preparados
+            if self._conn.execute("SELECT 1 FROM documentos WHERE caso = ? AND chave = ?", (caso, chave)).fetchone(): return False
+            try:
+                linha_vetor = None
+                if vetores is not None:
+                    caminho = self._arquivo_vetores(caso)
+                    linha_vetor = os.path.getsize(caminho) // (4 * vetores.shape[1]) if os.path.exists(caminho) else 0
+                self._conn.execute("INSERT INTO documentos VALUES (?, ?, ?)", (caso, chave, nome))
+                for i, trecho in enumerate(trechos):
+                    termos = tokenizar(trecho)
+                    cur = self._conn.execute("INSERT INTO trechos (caso, chave_doc, nome, texto, n_termos, linha_vetor) VALUES (?, ?, ?, ?, ?, ?)",
+                                             (caso, chave, nome, trecho, len(termos), None if linha_vetor is None else linha_vetor + i))
+                    contagem = {}
+                    for t in termos: contagem[t] = contagem.get(t, 0) + 1
+                    self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", [(caso, t, cur.lastrowid, n) for t, n in contagem.items()])
+                if vetores is not None:  # por último: se falhar, o rollback não deixa trechos apontando para linhas que não existem
+                    with open(caminho, "ab") as f: f.write(vetores.tobytes())
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return True
+
+    def buscar(self, caso, consulta, k=10):
+        """Top-k trechos do caso: [(score, nome_documento, texto)]."""
+        termos = set(tokenizar(consulta))
+        with self._lock:
+            n, media = self._conn.execute("SELECT COUNT(*), AVG(n_termos) FROM trechos WHERE caso = ?", (caso,)).fetchone()
+            if not n: return []
+            scores = {}
+            for termo in termos:
+                postings = self._conn.execute("SELECT p.trecho_id, p.tf, t.n_termos FROM postings p JOIN trechos t ON t.id = p.trecho_id WHERE p.caso = ? AND p.termo = ?", (caso, termo)).fetchall()
+                if not postings: continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for trecho_id, tf, dl in postings:
+                    scores[trecho_id] = scores.get(trecho_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / (media or 1)))
+            if INDICE_EMBEDDINGS:
+                linhas = self._conn.execute("SELECT id, linha_vetor FROM trechos WHERE caso = ? AND linha_vetor IS NOT NULL", (caso,)).fetchall()
+        if INDICE_EMBEDDINGS and linhas:
+            q = obter_cliente_gemini().embeddings([consulta], tarefa="retrieval_query")[0]
+            matriz = self._vetores(caso, q.shape[0])
+            if matriz is not None:
+                ids = np.array([l[0] for l in linhas])
+                idx = np.array([l[1] for l in linhas])
+                sim = (matriz[idx] @ q) / (np.linalg.norm(matriz[idx], axis=1) * np.linalg.norm(q) + 1e-9)
+                maximo = max(scores.values()) if scores else 1.0
+                for trecho_id, valor in zip(ids.tolist(), sim.tolist()):  # híbrido: BM25 normalizado + cosseno
+                    scores[trecho_id] = scores.get(trecho_id, 0.0) / maximo + max(0.0, valor)
+        melhores = sorted(scores.items(), key=lambda x: -x[1])[:k]
+        if not melhores: return []
+        with self._lock:
+            marcas = ",".join("?" * len(melhores))
+            textos = {r[0]: (r[1], r[2]) for r in self._conn.execute(f"SELECT id, nome, texto FROM trechos WHERE id IN ({marcas})", [m[0] for m in melhores])}
+        return [(score, *textos[i]) for i, score in melhores]
+
+@st.cache_resource
+def obter_indice_casos():
+    return IndiceCasos(os.path.join(CACHE_DIR, "indices"))
+
+@cronometrado("prompt.contexto_caso")
+def montar_contexto_caso(caso, nomes, textos, consulta, orcamento_tokens):
+    """Contexto de documentos para o prompt dentro do orçamento.
+
+    Se tudo cabe, vai o texto integral. Senão, metade vira digesto (visão geral) e a outra metade
+    recebe os trechos do índice do caso mais relevantes para a consulta (redação literal)."""
+    if not textos: return ""
+    if sum(estimar_tokens(t) for t in textos) <= orcamento_tokens:
+        return "".join([f"\n--- CONTEÚDO DO ARQUIVO: {n} ---\n{t}\n" for n, t in zip(nomes, textos)])
+    indice = obter_indice_casos()
+    for nome, texto in zip(nomes, textos): indice.adicionar(caso, nome, texto)
+    digestos = digerir_documentos(textos, orcamento_tokens // 2)
+    partes = [f"\n--- RESUMO DO ARQUIVO: {n} ---\n{d}\n" for n, d in zip(nomes, digestos)]
+    restante = orcamento_tokens // 2
+    partes.append("\n--- TRECHOS RELEVANTES DOS AUTOS ---\n")
+    for _, nome, trecho in indice.buscar(caso, consulta, k=max(1, restante // INDICE_TOKENS_TRECHO) * 2):
+        restante -= estimar_tokens(trecho)
+        if restante < 0: break
+        partes.append(f"[{nome}] {trecho}\n")
+    return "".join(partes)
+
+def identificar_caso(rotulo, arquivos):
+    """Nome do caso informado pelo usuário; sem nome, os próprios arquivos identificam o caso."""
+    if rotulo and rotulo.strip(): return rotulo.strip().upper()
+    return "ARQ-" + hashlib.sha256("|".join(sorted(a.name for a in arquivos or [])).encode("utf-8")).hexdigest()[:12]
+
+# --- JURISPRUDÊNCIA LOCAL ---
+JURISPRUDENCIA_DB = os.environ.get("JURISPRUDENCIA_DB", "jurisprudencia.sqlite")  # carga: ferramentas/importar_jurisprudencia.py
+JURISPRUDENCIA_K = 5
+JURISPRUDENCIA_EMENTA_CHARS = 700
+
+@st.cache_resource
+def obter_jurisprudencia():
+    return BaseJurisprudencia(JURISPRUDENCIA_DB)
+
+@cronometrado("prompt.jurisprudencia")
+def buscar_contexto_juridico(tema, area):
+    """Bloco de precedentes da base local para o prompt; sem decisões da área, busca em todas. "" com a base vazia."""
+    base = obter_jurisprudencia()
+    if not base.total(): return ""
+    decisoes = base.buscar(tema, area=area, k=JURISPRUDENCIA_K) or base.buscar(tema, k=JURISPRUDENCIA_K)
+    if not decisoes: return ""
+    blocos = [f"[{i}] {citacao(d)}\n{d.ementa[:JURISPRUDENCIA_EMENTA_CHARS]}{'...' if len(d.ementa) > JURISPRUDENCIA_EMENTA_CHARS else ''}"
+              for i, d in enumerate(decisoes, 1)]
+    return "JURISPRUDÊNCIA DA BASE LOCAL (cite apenas estes precedentes, com a referência indicada):\n" + "\n\n".join(blocos)
+
+@cronometrado("pdf.timbrado")
+def gerar_pdfs_com_timbrado(textos, arquivo_timbrado, juntar=False):
+    """PDFs (bytes) dos textos sobre o timbrado enviado, numa passada só; None sem reportlab ou com timbrado inválido."""
+    if not HAS_REPORTLAB: return None
+    try: return pdfs_com_timbrado(textos, ler_bytes_arquivo(arquivo_timbrado), juntar)
     except Exception: return None
 
+def pdf_com_timbrado(texto, arquivo_timbrado):
+    """Um PDF sobre o timbrado, para download_button(data=partial(...)): só é gerado quando o botão é clicado."""
+    return (gerar_pdfs_com_timbrado([texto], arquivo_timbrado) or [b""])[0]
+
+def timbrado_valido(arquivo_timbrado):
+    """Abre o modelo do timbrado (fica em cache pelo hash); False se o PDF enviado não serve de fundo."""
+    try: modelo_timbrado(ler_bytes_arquivo(arquivo_timbrado))
+    except Exception: return False
+    return True
+
 # --- LÓGICA DE CÁLCULO TRABALHISTA ---
-def calcular_rescisao_clt(admissao, demissao, salario_base, motivo, saldo_fgts_banco, ferias_vencidas, aviso_tipo, grau_insalubridade, tem_periculosidade):
-    if isinstance(admissao, str): admissao = datetime.strptime(admissao, "%Y-%m-%d").date()
-    if isinstance(demissao, str): demissao = datetime.strptime(demissao, "%Y-%m-%d").date()
-    
-    verbas = {}
-    salario_minimo = 1509.00
-    adic_insal = 0.0
-    if grau_insalubridade == "Mínimo (10%)": adic_insal = salario_minimo * 0.10
-    elif grau_insalubridade == "Médio (20%)": adic_insal = salario_minimo * 0.20
-    elif grau_insalubridade == "Máximo (40%)": adic_insal = salario_minimo * 0.40
-    adic_peric = salario_base * 0.30 if tem_periculosidade else 0.0
-    remuneracao = salario_base + adic_insal + adic_peric
-    
-    if adic_insal > 0: verbas["(+) Adicional Insalubridade"] = adic_insal
-    if adic_peric > 0: verbas["(+) Adicional Periculosidade"] = adic_peric
-
-    tempo_casa = demissao - admissao
-    anos_completos = int(tempo_casa.days / 365.25)
-    dias_aviso = 30
-    if motivo == "Demissão sem Justa Causa":
-        dias_aviso = min(90, 30 + (3 * anos_completos))
-
-    data_projetada = demissao
-    if motivo == "Demissão sem Justa Causa" and aviso_tipo == "Indenizado":
-        data_projetada = demissao + timedelta(days=dias_aviso)
-        verbas[f"(+) Aviso Prévio Indenizado ({dias_aviso} dias)"] = (remuneracao / 30) * dias_aviso
-
-    dias_trabalhados = demissao.day
-    val_saldo_salario = (remuneracao / 30) * dias_trabalhados
-    verbas[f"(+) Saldo de Salário ({dias_trabalhados} dias)"] = val_saldo_salario
-
-    meses_13 = 0
-    curr = date(data_projetada.year, 1, 1)
-    while curr <= data_projetada:
-        if curr.month == data_projetada.month:
-            if data_projetada.day >= 15: months_to_add = 1
-            else: months_to_add = 0
-        else:
-            if curr >= admissao: months_to_add = 1
-            elif curr.month > admissao.month: months_to_add = 1
-            elif curr.month == admissao.month and admissao.day <= 15: months_to_add = 1
-            else: months_to_add = 0
-        if months_to_add: meses_13 += 1
-        if curr.month == 12: break
-        curr = curr.replace(month=curr.month+1)
-    
-    if motivo != "Justa Causa": verbas[f"(+) 13º Salário Proporcional ({meses_13}/12)"] = (remuneracao / 12) * meses_13
-
-    if motivo != "Justa Causa":
-        if ferias_vencidas: verbas["(+) Férias Vencidas + 1/3"] = remuneracao * 1.3333
-        aniversario_ano = date(data_projetada.year, admissao.month, admissao.day)
-        if aniversario_ano > data_projetada: aniversario_ano = date(data_projetada.year - 1, admissao.month, admissao.day)
-        delta_ferias = (data_projetada.year - aniversario_ano.year) * 12 + (data_projetada.month - aniversario_ano.month)
-        if data_projetada.day >= 15: delta_ferias += 1
-        meses_ferias = min(12, delta_ferias)
-        val_ferias = (remuneracao / 12) * meses_ferias
-        verbas[f"(+) Férias Proporcionais ({meses_ferias}/12)"] = val_ferias
-        verbas["(+) 1/3 Sobre Férias Prop."] = val_ferias / 3
-
-    if motivo == "Demissão sem Justa Causa" or motivo == "Acordo (Culpa Recíproca)":
-        fgts_mes = val_saldo_salario * 0.08
-        fgts_13 = ((remuneracao / 12) * meses_13) * 0.08 if motivo != "Justa Causa" else 0
-        fgts_aviso = ((remuneracao / 30) * dias_aviso) * 0.08 if (motivo == "Demissão sem Justa Causa" and aviso_tipo == "Indenizado") else 0
-        base_total_fgts = saldo_fgts_banco + fgts_mes + fgts_13 + fgts_aviso
-        multa = 0.40 if motivo == "Demissão sem Justa Causa" else 0.20
-        verbas[f"(+) Multa FGTS {int(multa*100)}% (Base Est.: R$ {base_total_fgts:,.2f})"] = base_total_fgts * multa
-
-    return verbas
+# --- SÉRIES OFICIAIS DE ÍNDICES (CORREÇÃO MONETÁRIA) ---
+INDICES_DIR = os.environ.get("INDICES_DIR", "indices")  # CSVs do SGS/BCB: ferramentas/baixar_indices.py
+
+@st.cache_resource
+def _series_indices(assinatura):
+    return carregar_series(INDICES_DIR)
+
+def obter_series_indices():
+    """Séries carregadas uma vez por servidor; a assinatura (arquivos + mtime) recarrega quando algum CSV muda."""
+    if not os.path.isdir(INDICES_DIR): return {}
+    assinatura = tuple(sorted((a, os.path.getmtime(os.path.join(INDICES_DIR, a))) for a in os.listdir(INDICES_DIR)))
+    return _series_indices(assinatura)
+
+def ler_planilha(arquivo):
+    """CSV (separador detectado) ou XLSX enviado pelo usuário, com os nomes de coluna limpos."""
+    if arquivo.name.lower().endswith(".xlsx"): df = pd.read_excel(arquivo, dtype=object)
+    else: df = pd.read_csv(arquivo, sep=None, engine="python", dtype=str, encoding="utf-8-sig")
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+def planilha_xlsx(df):
+    """Bytes do XLSX do DataFrame; nos botões vai como partial(planilha_xlsx, df), montado só no clique."""
+    saida = BytesIO()
+    df.to_excel(saida, index=False)
+    return saida.getvalue()
 
 # ==========================================================
 # 5. CSS VISUAL (DARK NETWORK EDITION) - CORRIGIDO
 # ==========================================================
+ESTILO_CSS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "estilo.css")
+
+@st.cache_resource
+def css_app():
+    """Folha de estilo lida do disco uma vez por servidor (e não remontada a cada rerun)."""
+    with open(ESTILO_CSS, encoding="utf-8") as f: return f"<style>\n{f.read()}</style>"
+
 def local_css():
-    st.markdown(f"""
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Rajdhani:wght@300;500;700&family=Inter:wght@300;400;600&display=swap');
-        
-        :root {{
-            --bg-dark: #020617; 
-            --neon-blue: #00F3FF; 
-            --neon-red: #FF0055; 
-            --text-main: #FFFFFF; 
-            --bg-card: rgba(15, 23, 42, 0.7);
-        }}
-
-        .stApp {{
-            background-color: var(--bg-dark);
-            background-image: 
-                linear-gradient(rgba(2, 6, 23, 0.92), rgba(2, 6, 23, 0.95)), 
-                url("https://img.freepik.com/free-vector/abstract-technology-particle-background_52683-25766.jpg");
-            background-size: cover;
-            background-attachment: fixed;
-            background-position: center;
-            color: var(--text-main);
-            font-family: 'Inter', sans-serif;
-        }}
-
-        h1, h2, h3, h4, h5, h6 {{
-            font-family: 'Rajdhani', sans-serif;
-            color: #FFF !important;
-            letter-spacing: 1px;
-        }}
-
-        .tech-header {{
-            background: linear-gradient(90deg, #FFF, var(--neon-blue));
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            font-weight: 700;
-        }}
-
-        [data-testid="stVerticalBlockBorderWrapper"] {{
-            background-color: var(--bg-card);
-            border: 1px solid rgba(0, 243, 255, 0.1);
-            border-radius: 12px;
-            backdrop-filter: blur(5px);
-            transition: all 0.3s ease;
-        }}
-
-        [data-testid="stVerticalBlockBorderWrapper"]:hover {{
-            transform: translateY(-5px);
-            border-color: var(--neon-blue);
-            box-shadow: 0 0 20px rgba(0, 243, 255, 0.2);
-        }}
-
-        [data-testid="stVerticalBlockBorderWrapper"] p {{
-            color: #94a3b8;
-        }}
-
-        .stButton>button {{
-            border: 1px solid var(--neon-blue);
-            color: var(--neon-blue);
-            background: rgba(0, 243, 255, 0.05);
-            width: 100%;
-            font-family: 'Rajdhani', sans-serif;
-            letter-spacing: 1px;
-            transition: 0.3s;
-            border-radius: 6px;
-        }}
-
-        .stButton>button:hover {{
-            background: var(--neon-blue);
-            color: #000;
-            box-shadow: 0 0 15px var(--neon-blue);
-        }}
-        
-        .stTextInput>div>div>input, .stTextArea>div>div>textarea, .stSelectbox>div>div>div {{
-            background-color: rgba(30, 41, 59, 0.6);
-            color: white;
-            border: 1px solid #334155;
-        }}
-        
-        /* CORREÇÃO AQUI: Chaves duplas para o f-string */
-        .stProgress > div > div > div > div {{
-            background-color: #00F3FF;
-        }}
-    </style>
-    """, unsafe_allow_html=True)
+    st.markdown(css_app(), unsafe_allow_html=True)
 local_css()
 
 # ==========================================================
 # 6. MEMÓRIA & GESTÃO DE ESTADO
 # ==========================================================
-if "meus_docs" not in st.session_state:
-    st.session_state.meus_docs = []
-
 if "casos_db" not in st.session_state:
     st.session_state.casos_db = carregar_dados()
 
 def salvar_documento_memoria(tipo, cliente, conteudo):
-    doc = {
-        "id": len(st.session_state.meus_docs) + 1,
-        "data": datetime.now().strftime("%d/%m/%Y"),
-        "tipo": tipo,
-        "cliente": cliente,
-        "conteudo": conteudo
-    }
-    st.session_state.meus_docs.append(doc)
+    """Arquiva o documento gerado no GED (disco), em vez de mantê-lo na sessão."""
+    return obter_arquivo_documentos().salvar(tipo, cliente or "-", conteudo)
+
+def usuario_atual():
+    """Usuário para os limites da fila: sem login no app, cada sessão do navegador conta como um usuário."""
+    if "usuario_id" not in st.session_state: st.session_state.usuario_id = uuid.uuid4().hex[:12]
+    return st.session_state.usuario_id
+
+def enviar_geracao(chave, prompt, rotulo, usar_cache=True, documento=None):
+    """Manda o prompt para a fila e guarda o id do trabalho na sessão (uma chave por tela)."""
+    try: st.session_state[chave] = obter_fila_geracoes().submeter(usuario_atual(), prompt, rotulo, usar_cache, documento)
+    except LimiteTrabalhos as e: st.warning(f"⚠️ {e}")
+
+def resultado_geracao(chave):
+    """Trabalho concluído da tela, ou None: enquanto roda mostra o andamento (atualizado sozinho); com erro, avisa."""
+    id_trabalho = st.session_state.get(chave)
+    trabalho = obter_fila_geracoes().consultar(id_trabalho) if id_trabalho else None
+    if trabalho is None:
+        st.session_state.pop(chave, None)
+        return None
+    if trabalho.estado in PENDENTES:
+        acompanhar_geracao(id_trabalho)
+        return None
+    if trabalho.estado == "erro":
+        st.error(trabalho.resultado)
+        return None
+    return trabalho
+
+@st.fragment(run_every=FILA_CONSULTA_SEG)
+def acompanhar_geracao(id_trabalho):
+    fila = obter_fila_geracoes()
+    trabalho = fila.consultar(id_trabalho)
+    if trabalho is None or trabalho.estado not in PENDENTES: st.rerun()
+    situacao = "na fila" if trabalho.estado == "fila" else "em redação"
+    st.info(f"⏳ {trabalho.rotulo}: {situacao} há {time.time() - trabalho.criado_em:.0f}s. Pode trocar de tela ou editar os campos: "
+            "o resultado fica guardado e aparece aqui quando terminar.")
+    parcial = fila.parcial(id_trabalho)
+    if parcial: st.markdown(parcial)
+
+if "editor_versao" not in st.session_state: st.session_state.editor_versao = 0
+
+def aplicar_edicoes_carteira():
+    """on_change do editor: aplica só o delta (editadas/inseridas/excluídas) na memória e no banco."""
+    delta = st.session_state[f"editor_casos_{st.session_state.editor_versao}"]
+    df = st.session_state.casos_db
+    alteracoes = {}
+    for pos, campos in delta.get("edited_rows", {}).items():
+        rotulo = df.index[int(pos)]
+        for coluna, valor in campos.items(): df.at[rotulo, coluna] = valor
+        if pd.notna(df.at[rotulo, "id"]): alteracoes[df.at[rotulo, "id"]] = campos
+    if alteracoes: obter_gravador_carteira().enfileirar(alteracoes)
+
+    repo = obter_repositorio()
+    excluidas = [df.index[int(pos)] for pos in delta.get("deleted_rows", [])]
+    if excluidas:
+        repo.excluir([i for i in df.loc[excluidas, "id"].dropna()])
+        df = df.drop(index=excluidas)
+    novas = [{col: linha.get(col, "-") for col in COLUNAS_PROCESSOS} for linha in delta.get("added_rows", [])]
+    if novas:  # inserção é imediata: a linha precisa do id antes de novas edições
+        for linha, id_novo in zip(novas, repo.salvar_linhas(novas)): linha["id"] = id_novo
+        df = pd.concat([df, pd.DataFrame(novas)], ignore_index=True)
+    st.session_state.casos_db = df.reset_index(drop=True)
+    st.session_state.editor_versao += 1  # nova chave = editor remontado sobre os dados já atualizados
+
+def botoes_memoria(memoria, chave):
+    """Downloads da memória de cálculo (DOCX e, com reportlab, PDF) de um resultado estruturado."""
+    c_docx, c_pdf = st.columns(2)
+    nome = f"Memoria_{nome_arquivo(memoria.titulo)}"
+    c_docx.download_button("📄 Memória de Cálculo (DOCX)", memoria_docx(memoria), f"{nome}.docx", use_container_width=True, key=f"mem_docx_{chave}")
+    if HAS_REPORTLAB: c_pdf.download_button("📄 Memória de Cálculo (PDF)", memoria_pdf(memoria), f"{nome}.pdf", "application/pdf", use_container_width=True, key=f"mem_pdf_{chave}")
+
+def botao_zip_memorias(gerar_memorias, nome, chave):
+    """Gera sob demanda o zip com as memórias de um lote (modelos DOCX/PDF reaproveitados) e oferece o download."""
+    c_fmt, c_gerar = st.columns([2, 1])
+    formatos = c_fmt.multiselect("Formato das memórias", ["docx", "pdf"] if HAS_REPORTLAB else ["docx"], default=["docx"], key=f"{chave}_formatos")
+    if c_gerar.button("🗜️ Gerar memórias (ZIP)", use_container_width=True, key=f"{chave}_gerar") and formatos:
+        t0 = time.time()
+        st.session_state[chave] = exportar_memorias_zip(gerar_memorias(), BytesIO(), formatos).getvalue()
+        st.caption(f"Memórias geradas em {time.time() - t0:.1f}s.")
+    if st.session_state.get(chave):
+        st.download_button("⬇️ Baixar memórias (ZIP)", st.session_state[chave], nome, "application/zip", use_container_width=True, key=f"{chave}_baixar")
 
 if "navegacao_override" not in st.session_state: st.session_state.navegacao_override = None
 
@@ -352,7 +2111,8 @@ with col_menu:
         "Contratos": "📜 Contratos", 
         "Calculos": "🧮 Cálculos Jurídicos", 
         "Audiência": "🏛️ Simulador Audiência", 
-        "Gestão Casos": "💼 Gestão de Escritório"
+        "Gestão Casos": "💼 Gestão de Escritório",
+        "Admin": "🛠️ Admin"
     }
     opcoes_menu = list(mapa_nav.keys())
     idx_radio = 0
@@ -405,6 +2165,26 @@ if menu_opcao == "📊 Dashboard":
             st.markdown("#### 📜 Fábrica de Contratos")
             st.caption("Elaboração automática de documentos com papel timbrado.")
 
+    st.write("")
+    st.markdown("### ⚡ CACHE DE RESPOSTAS DA IA")
+    est_cache = obter_cache_respostas().estatisticas()
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Acertos / Faltas", f"{est_cache['acertos']} / {est_cache['faltas']}", f"{est_cache['taxa']:.0%} de acerto")
+    m2.metric("Tempo Economizado", f"{est_cache['segundos_economizados']:.0f} s")
+    m3.metric("Tokens Economizados (est.)", f"{est_cache['tokens_economizados']:,}".replace(",", "."))
+    m4.metric("Respostas Armazenadas", est_cache["itens"])
+
+    st.markdown("### ⏳ FILA DE GERAÇÕES")
+    est_fila = obter_fila_geracoes().estatisticas()
+    f1, f2, f3, f4 = st.columns(4)
+    f1.metric("Na Fila / Rodando", f"{est_fila['fila']} / {est_fila['rodando']}", f"espera média {est_fila['espera_media']:.1f} s", delta_color="off")
+    f2.metric("Concluídas", est_fila["prontos"])
+    f3.metric("Com Erro", est_fila["erros"])
+    f4.metric("Pedidos Repetidos Aproveitados", est_fila["deduplicados"])
+
+    st.markdown("### 🚦 COTA DO GEMINI (TODAS AS SESSÕES)")
+    st.dataframe(pd.DataFrame(obter_cliente_gemini().limitador.estatisticas()), hide_index=True, use_container_width=True)
+
 # --- NOVA ABA: INVESTIGADOR JURÍDICO (FEATURE ADICIONADA) ---
 elif menu_opcao == "🕵️ Investigador Jurídico":
     st.markdown("<h2 class='tech-header'>🕵️ INVESTIGADOR DE CASOS (IA 2.5)</h2>", unsafe_allow_html=True)
@@ -413,21 +2193,25 @@ elif menu_opcao == "🕵️ Investigador Jurídico":
     with st.container(border=True):
         st.subheader("📁 1. Arquivo do Caso")
         uploaded_files = st.file_uploader("Carregue provas (PDFs, BOs, Inquéritos, Contratos)", type="pdf", accept_multiple_files=True)
+        pasta_caso = st.text_input("Pasta do Caso (opcional)", placeholder="Ex: Maria Silva x Empresa Y — novos PDFs são somados ao índice desta pasta", key="pasta_investigador")
         
         texto_investigacao = ""
+        textos_pdfs = []
         if uploaded_files:
             with st.spinner("Lendo evidências..."):
-                for pdf in uploaded_files:
-                    texto_investigacao += extrair_texto_pdf(pdf) + "\n\n"
+                textos_pdfs = extrair_textos_com_progresso(uploaded_files)
+            texto_investigacao = "".join([t + "\n\n" for t in textos_pdfs])
             st.success(f"✅ {len(uploaded_files)} documentos analisados.")
 
         col_i1, col_i2 = st.columns(2)
         narrativa = col_i1.text_area("Narrativa dos Fatos (O que o cliente contou?)", height=150, placeholder="Ex: O cliente foi demitido após sofrer acidente de trabalho, mas a empresa alega...")
         objetivo_inv = col_i2.text_area("Qual o objetivo final?", height=150, placeholder="Ex: Reverter justa causa, Absolvição, Indenização por Danos Morais...")
 
+    regenerar = st.checkbox("🔄 Regenerar (ignorar respostas em cache)", key="regen_investigador")
     if st.button("RODAR INVESTIGAÇÃO PROFUNDA", use_container_width=True):
         if narrativa or texto_investigacao:
-            with st.spinner("🔍 O Investigador está cruzando dados, buscando jurisprudência e montando a estratégia..."):
+            with st.spinner("🔍 O Investigador está cruzando os dados do caso..."):
+                conteudo_docs = montar_contexto_caso(identificar_caso(pasta_caso, uploaded_files), [f.name for f in uploaded_files or []], textos_pdfs, f"{narrativa} {objetivo_inv}", ORCAMENTO_INVESTIGADOR)
                 
                 # Prompt Especialista em Investigação
                 prompt = f"""
@@ -435,7 +2219,7 @@ elif menu_opcao == "🕵️ Investigador Jurídico":
                 
                 DADOS DO CASO:
                 - Fatos Narrados: {narrativa}
-                - Conteúdo dos Documentos (PDFs): {texto_investigacao[:20000]}
+                - Conteúdo dos Documentos (PDFs): {conteudo_docs}
                 - Objetivo do Cliente: {objetivo_inv}
                 
                 SUA MISSÃO É CRIAR UM RELATÓRIO DE INTELIGÊNCIA JURÍDICA COM OS SEGUINTES TÓPICOS:
@@ -459,41 +2243,42 @@ elif menu_opcao == "🕵️ Investigador Jurídico":
                 FORMATO: Markdown, profissional, direto e estratégico. Use negrito para destaques.
                 """
                 
-                res = tentar_gerar_conteudo(prompt)
-                
-                # Exibição dos Resultados em Abas para Organização
-                t_fato, t_prova, t_tese, t_acao = st.tabs(["🕵️ Fatos & Lacunas", "🔍 Caça às Provas", "🧪 Teses & Chances", "🗺️ Plano de Ação"])
-                
-                # Processamento simples para "fatiar" a resposta da IA (Simulado visualmente, o texto vem inteiro)
-                with t_fato:
-                    st.markdown("### Reconstrução do Caso")
-                    st.write(res) # A IA já vai formatar em tópicos
-                    
-                with t_tese:
-                    st.info("📊 Probabilidades estimadas com base em tendências jurisprudenciais (IA Generativa)")
-                    # Extração simulada de probabilidade do texto gerado (apenas visual)
-                    col_p1, col_p2, col_p3 = st.columns(3)
-                    with col_p1:
-                        st.metric("Tese Principal", "Alta Probabilidade", "75%+")
-                        st.progress(0.75)
-                    with col_p2:
-                        st.metric("Tese Subsidiária", "Média Probabilidade", "50%")
-                        st.progress(0.50)
-                    with col_p3:
-                        st.metric("Tese de Risco", "Baixa Probabilidade", "20%")
-                        st.progress(0.20)
-                    
-                    st.markdown("---")
-                    st.caption("O detalhamento das teses está no relatório completo na aba 'Fatos & Lacunas'.")
-
-                with t_acao:
-                    st.success("✅ Siga este roteiro para aumentar suas chances.")
-                    st.download_button("📥 Baixar Relatório de Investigação (.docx)", gerar_word(res), "Investigacao_Caso.docx", use_container_width=True)
-
-                salvar_documento_memoria("Relatório Investigação", "Cliente", res)
+                enviar_geracao("trabalho_investigador", prompt, "Relatório de investigação", not regenerar, ("Relatório Investigação", "Cliente"))
         else:
             st.warning("⚠️ Forneça uma narrativa ou carregue documentos para iniciar a investigação.")
 
+    trabalho = resultado_geracao("trabalho_investigador")
+    if trabalho:
+        res = trabalho.resultado
+        # Exibição dos Resultados em Abas para Organização
+        t_fato, t_prova, t_tese, t_acao = st.tabs(["🕵️ Fatos & Lacunas", "🔍 Caça às Provas", "🧪 Teses & Chances", "🗺️ Plano de Ação"])
+
+        # Processamento simples para "fatiar" a resposta da IA (Simulado visualmente, o texto vem inteiro)
+        with t_fato:
+            st.markdown("### Reconstrução do Caso")
+            st.markdown(res) # A IA já vai formatar em tópicos
+
+        with t_tese:
+            st.info("📊 Probabilidades estimadas com base em tendências jurisprudenciais (IA Generativa)")
+            # Extração simulada de probabilidade do texto gerado (apenas visual)
+            col_p1, col_p2, col_p3 = st.columns(3)
+            with col_p1:
+                st.metric("Tese Principal", "Alta Probabilidade", "75%+")
+                st.progress(0.75)
+            with col_p2:
+                st.metric("Tese Subsidiária", "Média Probabilidade", "50%")
+                st.progress(0.50)
+            with col_p3:
+                st.metric("Tese de Risco", "Baixa Probabilidade", "20%")
+                st.progress(0.20)
+
+            st.markdown("---")
+            st.caption("O detalhamento das teses está no relatório completo na aba 'Fatos & Lacunas'.")
+
+        with t_acao:
+            st.success("✅ Siga este roteiro para aumentar suas chances.")
+            st.download_button("📥 Baixar Relatório de Investigação (.docx)", partial(gerar_word, res), "Investigacao_Caso.docx", use_container_width=True)
+
 # --- PETIÇÕES INTELIGENTES ---
 elif menu_opcao == "✍️ Petições Inteligentes":
     st.markdown("<h2 class='tech-header'>✍️ PETIÇÕES INTELIGENTES (IA 2.5)</h2>", unsafe_allow_html=True)
@@ -520,30 +2305,55 @@ elif menu_opcao == "✍️ Petições Inteligentes":
     
     uploaded_files = st.file_uploader("📂 Carregar PDFs (Autos, Provas, Documentos)", type="pdf", accept_multiple_files=True)
     texto_do_pdf = ""
+    textos_pdfs = []
     if uploaded_files:
         with st.spinner("Anexando conteúdo aos autos..."):
-            for pdf_file in uploaded_files:
-                texto_extraido = extrair_texto_pdf(pdf_file)
-                texto_do_pdf += f"\n--- CONTEÚDO DO ARQUIVO: {pdf_file.name} ---\n{texto_extraido}\n"
+            textos_pdfs = extrair_textos_com_progresso(uploaded_files)
+            texto_do_pdf = "".join([f"\n--- CONTEÚDO DO ARQUIVO: {pdf_file.name} ---\n{texto_extraido}\n" for pdf_file, texto_extraido in zip(uploaded_files, textos_pdfs)])
             st.success(f"✅ {len(uploaded_files)} arquivos processados e anexados à memória da IA!")
 
     fatos_manuais = st.text_area("Fatos / Observações Adicionais", height=150, placeholder="Digite os fatos aqui OU deixe em branco se já carregou o PDF com a narrativa completa...")
     busca_real = st.checkbox("🔍 Buscar Jurisprudência Real (STF/STJ/TST)", value=True)
+    with st.expander("📚 Base de jurisprudência local"):
+        base_juris = obter_jurisprudencia()
+        st.caption(f"{base_juris.total():,} decisões indexadas".replace(",", "."))
+        dumps = st.file_uploader("Dumps de ementas (JSONL/CSV, aceita .gz)", type=["jsonl", "csv", "gz"], accept_multiple_files=True, key="dumps_juris")
+        j1, j2 = st.columns(2)
+        tribunal_padrao = j1.selectbox("Tribunal (se o dump não informar)", ["", "STF", "STJ", "TST"], key="juris_tribunal")
+        area_padrao = j2.selectbox("Área (se o dump não informar)", [""] + list(AREAS), key="juris_area")
+        if dumps and st.button("Importar ementas"):
+            progresso = st.empty()
+            inseridas = ignoradas = 0
+            for dump in dumps:
+                novas, repetidas = base_juris.importar(registros(dump), tribunal_padrao or None, area_padrao or None,
+                                                       ao_progredir=lambda n, i, nome=dump.name: progresso.caption(f"{nome}: {n:,} importadas, {i:,} ignoradas"))
+                inseridas, ignoradas = inseridas + novas, ignoradas + repetidas
+            base_juris.otimizar()
+            st.success(f"✅ {inseridas} decisões importadas ({ignoradas} repetidas ou sem ementa).")
+        if base_juris.total():
+            j3, j4 = st.columns([3, 1])
+            teste = j3.text_input("Testar busca", key="juris_teste")
+            filtro_tribunais = j4.multiselect("Tribunais", base_juris.tribunais(), key="juris_filtro")
+            if teste:
+                for d in base_juris.buscar(teste, tribunais=filtro_tribunais, k=JURISPRUDENCIA_K):
+                    st.markdown(f"**{citacao(d)}**  \n{d.ementa[:JURISPRUDENCIA_EMENTA_CHARS]}")
+    regenerar = st.checkbox("🔄 Regenerar (ignorar respostas em cache)", key="regen_peticao")
     
     if st.button("GERAR PEÇA (MODO 2.5)", use_container_width=True):
-        fatos_completos = f"CONTEÚDO DOS ANEXOS (PDF):\n{texto_do_pdf}\n\nOBSERVAÇÕES/FATOS DIGITADOS:\n{fatos_manuais}".strip()
         if (texto_do_pdf or fatos_manuais) and cli:
-            with st.spinner("Pesquisando e Redigindo com Gemini 2.5..."):
+            with st.spinner("Reunindo autos e jurisprudência..."):
+                anexos = montar_contexto_caso(identificar_caso(cli, uploaded_files), [f.name for f in uploaded_files or []], textos_pdfs, f"{tipo} {area} {fatos_manuais}", ORCAMENTO_PETICAO)
+                fatos_completos = f"CONTEÚDO DOS ANEXOS (PDF):\n{anexos}\n\nOBSERVAÇÕES/FATOS DIGITADOS:\n{fatos_manuais}".strip()
                 ctx = ""
                 if busca_real: ctx = buscar_contexto_juridico(f"{tipo} {fatos_completos}", area)
                 prompt = f"Advogado {area}. Redija {tipo}. Cliente: {cli} vs {adv}. Fatos: {fatos_completos}. {ctx}. Cite leis e jurisprudência se houver."
-                res = tentar_gerar_conteudo(prompt)
-                st.markdown(res)
-                if "❌" not in res:
-                    salvar_documento_memoria(tipo, cli, res)
-                    st.download_button("Baixar DOCX", gerar_word(res), f"{tipo}.docx")
+            enviar_geracao("trabalho_peticao", prompt, f"{tipo} ({cli})", not regenerar, (tipo, cli))
         else:
             st.warning("⚠️ Atenção: Informe o **Cliente** e forneça os fatos (PDF ou Digitado).")
+    trabalho = resultado_geracao("trabalho_peticao")
+    if trabalho:
+        st.markdown(trabalho.resultado)
+        st.download_button("Baixar DOCX", partial(gerar_word, trabalho.resultado), f"{trabalho.tipo}.docx")
 
 # --- CONTRATOS ---
 elif menu_opcao == "📜 Contratos":
@@ -574,59 +2384,61 @@ elif menu_opcao == "📜 Contratos":
         st.markdown("##### 📄 Papel Timbrado (Opcional)")
         uploaded_timbrado = st.file_uploader("Carregue seu papel timbrado (PDF) para aplicar nos documentos.", type="pdf")
 
+    regenerar = st.checkbox("🔄 Regenerar (ignorar respostas em cache)", key="regen_contrato")
     if st.button("GERAR CONTRATO E PROCURAÇÃO", use_container_width=True):
         if nome and cpf and obj:
-            with st.spinner("Redigindo Contrato e Procuração..."):
-                qualificacao = f"{nome}, {nacionalidade}, {est_civil}, {prof}, portador do RG nº {rg} e CPF nº {cpf}, residente e domiciliado em {end}, CEP {cep}, e-mail {email}"
-                prompt = f"""
-                Atue como advogado. Redija dois documentos formais e distintos.
-                DOCUMENTO 1: CONTRATO DE HONORÁRIOS ADVOCATÍCIOS
-                CONTRATANTE: {qualificacao}.
-                CONTRATADO: LBA Advocacia.
-                OBJETO: {obj}.
-                VALOR: R$ {val} ({forma_pag}).
-                CLÁUSULAS: Padrão da OAB, foro da comarca do cliente.
-                IMPORTANTE: Ao final do contrato, pule 3 linhas e escreva EXATAMENTE: "###SEPARADOR###"
-                DOCUMENTO 2: PROCURAÇÃO AD JUDICIA
-                OUTORGANTE: {qualificacao}.
-                OUTORGADO: LBA Advocacia.
-                PODERES: Gerais para o foro (Cláusula Ad Judicia) e Especiais para transigir, firmar acordos, receber e dar quitação, especificamente para atuar no caso: {obj}.
-                """
-                res = tentar_gerar_conteudo(prompt)
-                try:
-                    partes = res.split("###SEPARADOR###")
-                    texto_contrato = partes[0].strip()
-                    texto_procuracao = partes[1].strip() if len(partes) > 1 else "Erro: A IA não separou os documentos corretamente. Tente gerar novamente."
-                except:
-                    texto_contrato = res
-                    texto_procuracao = "Erro no processamento do texto."
-                salvar_documento_memoria("Kit Contratação", nome, res)
-                st.success("✅ Documentos Gerados! Baixe abaixo:")
-                st.markdown("---")
-                col_down_con, col_down_proc = st.columns(2)
-                with col_down_con:
-                    with st.container(border=True):
-                        st.markdown("### 📄 1. Contrato")
-                        with st.expander("👁️ Ver Texto"): st.write(texto_contrato)
-                        st.download_button("📥 Baixar Contrato (.docx)", gerar_word(texto_contrato), f"Contrato_{nome}.docx", use_container_width=True)
-                        if uploaded_timbrado:
-                            if HAS_REPORTLAB:
-                                uploaded_timbrado.seek(0)
-                                pdf_con = gerar_pdf_com_timbrado(texto_contrato, uploaded_timbrado)
-                                if pdf_con and pdf_con != "MISSING_LIB": st.download_button("📄 Baixar PDF Timbrado", pdf_con, f"Contrato_{nome}.pdf", mime="application/pdf", use_container_width=True)
-                            else: st.warning("Instale 'reportlab' para PDF.")
-                with col_down_proc:
-                    with st.container(border=True):
-                        st.markdown("### ⚖️ 2. Procuração")
-                        with st.expander("👁️ Ver Texto"): st.write(texto_procuracao)
-                        st.download_button("📥 Baixar Procuração (.docx)", gerar_word(texto_procuracao), f"Procuracao_{nome}.docx", use_container_width=True)
-                        if uploaded_timbrado:
-                            if HAS_REPORTLAB:
-                                uploaded_timbrado.seek(0)
-                                pdf_proc = gerar_pdf_com_timbrado(texto_procuracao, uploaded_timbrado)
-                                if pdf_proc and pdf_proc != "MISSING_LIB": st.download_button("📄 Baixar PDF Timbrado", pdf_proc, f"Procuracao_{nome}.pdf", mime="application/pdf", use_container_width=True)
+            qualificacao = f"{nome}, {nacionalidade}, {est_civil}, {prof}, portador do RG nº {rg} e CPF nº {cpf}, residente e domiciliado em {end}, CEP {cep}, e-mail {email}"
+            prompt = f"""
+            Atue como advogado. Redija dois documentos formais e distintos.
+            DOCUMENTO 1: CONTRATO DE HONORÁRIOS ADVOCATÍCIOS
+            CONTRATANTE: {qualificacao}.
+            CONTRATADO: LBA Advocacia.
+            OBJETO: {obj}.
+            VALOR: R$ {val} ({forma_pag}).
+            CLÁUSULAS: Padrão da OAB, foro da comarca do cliente.
+            IMPORTANTE: Ao final do contrato, pule 3 linhas e escreva EXATAMENTE: "###SEPARADOR###"
+            DOCUMENTO 2: PROCURAÇÃO AD JUDICIA
+            OUTORGANTE: {qualificacao}.
+            OUTORGADO: LBA Advocacia.
+            PODERES: Gerais para o foro (Cláusula Ad Judicia) e Especiais para transigir, firmar acordos, receber e dar quitação, especificamente para atuar no caso: {obj}.
+            """
+            enviar_geracao("trabalho_contrato", prompt, f"Contrato e procuração ({nome})", not regenerar, ("Kit Contratação", nome))
         else:
             st.warning("⚠️ Preencha Nome, CPF e Objeto para gerar.")
+    trabalho = resultado_geracao("trabalho_contrato")
+    if trabalho:
+        res, nome = trabalho.resultado, trabalho.cliente
+        try:
+            partes = res.split("###SEPARADOR###")
+            texto_contrato = partes[0].strip()
+            texto_procuracao = partes[1].strip() if len(partes) > 1 else "Erro: A IA não separou os documentos corretamente. Tente gerar novamente."
+        except:
+            texto_contrato = res
+            texto_procuracao = "Erro no processamento do texto."
+        st.success("✅ Documentos Gerados! Baixe abaixo:")
+        st.markdown("---")
+        # Os PDFs só são renderizados no clique (a página roda de novo a cada interação); o timbrado fica em cache pelo hash
+        timbrado_ok = bool(uploaded_timbrado) and HAS_REPORTLAB and timbrado_valido(uploaded_timbrado)
+        col_down_con, col_down_proc = st.columns(2)
+        with col_down_con:
+            with st.container(border=True):
+                st.markdown("### 📄 1. Contrato")
+                with st.expander("👁️ Ver Texto"): st.write(texto_contrato)
+                st.download_button("📥 Baixar Contrato (.docx)", partial(gerar_word, texto_contrato), f"Contrato_{nome}.docx", use_container_width=True)
+                if uploaded_timbrado:
+                    if HAS_REPORTLAB:
+                        if timbrado_ok: st.download_button("📄 Baixar PDF Timbrado", partial(pdf_com_timbrado, texto_contrato, uploaded_timbrado),
+                                                           f"Contrato_{nome}.pdf", mime="application/pdf", use_container_width=True)
+                    else: st.warning("Instale 'reportlab' para PDF.")
+        with col_down_proc:
+            with st.container(border=True):
+                st.markdown("### ⚖️ 2. Procuração")
+                with st.expander("👁️ Ver Texto"): st.write(texto_procuracao)
+                st.download_button("📥 Baixar Procuração (.docx)", partial(gerar_word, texto_procuracao), f"Procuracao_{nome}.docx", use_container_width=True)
+                if uploaded_timbrado:
+                    if HAS_REPORTLAB:
+                        if timbrado_ok: st.download_button("📄 Baixar PDF Timbrado", partial(pdf_com_timbrado, texto_procuracao, uploaded_timbrado),
+                                                           f"Procuracao_{nome}.pdf", mime="application/pdf", use_container_width=True)
 
 # --- CÁLCULOS JURÍDICOS ---
 elif menu_opcao == "🧮 Cálculos Jurídicos":
@@ -640,46 +2452,133 @@ elif menu_opcao == "🧮 Cálculos Jurídicos":
             c1, c2, c3 = st.columns(3)
             adm = c1.date_input("Admissão", date(2022,1,1))
             dem = c2.date_input("Demissão", date.today())
-            motivo = c3.selectbox("Motivo", ["Demissão sem Justa Causa", "Pedido de Demissão", "Justa Causa", "Acordo (Culpa Recíproca)"])
+            motivo = c3.selectbox("Motivo", MOTIVOS_RESCISAO)
             c4, c5, c6 = st.columns(3)
             sal = c4.number_input("Salário Base (R$)", value=2000.0, step=100.0)
             fgts = c5.number_input("Saldo FGTS (Extrato da Caixa) *", value=0.0, help="Informe o saldo do banco para cálculo correto da multa de 40%.")
-            aviso = c6.selectbox("Aviso Prévio", ["Indenizado", "Trabalhado"])
+            aviso = c6.selectbox("Aviso Prévio", TIPOS_AVISO)
             c7, c8, c9 = st.columns(3)
-            insal = c7.selectbox("Insalubridade", ["Não", "Mínimo (10%)", "Médio (20%)", "Máximo (40%)"])
+            insal = c7.selectbox("Insalubridade", list(GRAUS_INSALUBRIDADE))
             peric = c8.checkbox("Periculosidade (30%)")
             ferias_venc = c9.checkbox("Possui Férias Vencidas (+1 ano)?")
 
         if st.button("CALCULAR RESCISÃO", use_container_width=True):
             if dem > adm:
                 try:
-                    v = calcular_rescisao_clt(adm, dem, sal, motivo, fgts, ferias_venc, aviso, insal, peric)
+                    memoria = memoria_rescisao(adm, dem, sal, motivo, fgts, ferias_venc, aviso, insal, peric)
                     st.markdown("### 🧾 Resultado Detalhado")
-                    st.table(pd.DataFrame(list(v.items()), columns=["Verba Rescisória", "Valor (R$)"]))
-                    total = sum(v.values())
-                    st.markdown(f"<h2 style='color:#00F3FF'>TOTAL LÍQUIDO ESTIMADO: R$ {total:,.2f}</h2>", unsafe_allow_html=True)
+                    st.table(pd.DataFrame(memoria.itens, columns=["Verba Rescisória", "Valor (R$)"]))
+                    st.markdown(f"<h2 style='color:#00F3FF'>TOTAL LÍQUIDO ESTIMADO: R$ {memoria.total:,.2f}</h2>", unsafe_allow_html=True)
+                    botoes_memoria(memoria, "rescisao")
                 except Exception as e: st.error(f"Erro: {e}")
             else: st.warning("Data de demissão deve ser posterior.")
 
+        # Rescisão em lote: dispensa coletiva / liquidação de ações de massa a partir de planilha
+        st.markdown("---")
+        st.subheader("📑 Rescisão em Lote (Planilha)")
+        st.caption(f"Colunas obrigatórias: Admissão, Demissão, Salário. Opcionais: {', '.join(c for c, p in COLUNAS_LOTE.items() if p is not None)}. "
+                   "Datas em DD/MM/AAAA ou AAAA-MM-DD; valores como 2500.00 ou 2.500,00.")
+        modelo_lote = pd.DataFrame([{"Nome": "Fulano de Tal", "Admissão": "01/03/2021", "Demissão": date.today().strftime("%d/%m/%Y"), "Salário": "2.500,00",
+                                     "Motivo": MOTIVOS_RESCISAO[0], "Saldo FGTS": "8.000,00", "Férias Vencidas": "Não", "Aviso": "Indenizado",
+                                     "Insalubridade": "Não", "Periculosidade": "Não"}])
+        c_up, c_mod = st.columns([3, 1])
+        planilha = c_up.file_uploader("Planilha de empregados (CSV ou XLSX)", type=["csv", "xlsx"], key="rescisao_lote_planilha")
+        c_mod.download_button("⬇️ Modelo CSV", modelo_lote.to_csv(index=False, sep=";").encode("utf-8-sig"), "modelo_rescisao_lote.csv", "text/csv")
+        if planilha is not None and st.button("CALCULAR LOTE", use_container_width=True, key="btn_lote"):
+            try:
+                entrada_lote = ler_planilha(planilha)
+                t0 = time.time()
+                st.session_state.rescisao_lote = calcular_rescisoes_lote(entrada_lote)
+                st.session_state.zip_rescisao_lote = None
+                st.session_state.rescisao_lote_tempo = time.time() - t0
+            except Exception as e: st.error(f"Erro ao ler/calcular a planilha: {e}")
+
+        resultado_lote = st.session_state.get("rescisao_lote")
+        if resultado_lote is not None:
+            validas = resultado_lote[resultado_lote["Erro"] == ""]
+            c_n, c_t, c_e = st.columns(3)
+            c_n.metric("Empregados calculados", f"{len(validas)}/{len(resultado_lote)}", f"{st.session_state.rescisao_lote_tempo:.2f}s")
+            c_t.metric("Total Geral", f"R$ {validas['Total'].sum():,.2f}")
+            c_e.metric("Linhas com erro", len(resultado_lote) - len(validas))
+            st.dataframe(resultado_lote, use_container_width=True, hide_index=True)
+            c_csv, c_xlsx = st.columns(2)
+            c_csv.download_button("⬇️ Resultado CSV", resultado_lote.to_csv(index=False, sep=";", decimal=",").encode("utf-8-sig"), "rescisoes_lote.csv", "text/csv", use_container_width=True)
+            c_xlsx.download_button("⬇️ Resultado XLSX", partial(planilha_xlsx, resultado_lote), "rescisoes_lote.xlsx", use_container_width=True)
+            botao_zip_memorias(lambda: memorias_rescisao_lote(resultado_lote), "memorias_rescisao.zip", "zip_rescisao_lote")
+            if len(validas):
+                linha_lote = st.selectbox("Detalhar empregado", validas.index, format_func=lambda i: f"{i + 1} - {validas.at[i, 'Nome'] or 'Sem nome'}", key="lote_detalhe")
+                st.table(pd.DataFrame(list(verbas_da_linha(validas.loc[linha_lote]).items()), columns=["Verba Rescisória", "Valor (R$)"]))
+
     elif area_calc == "Cível (Art. 292/Liquidação)":
         st.markdown("#### ⚖️ Cálculos Cíveis Completos")
         tab_divida, tab_banco, tab_imob, tab_causa, tab_hon = st.tabs(["Atualização Dívidas", "Bancário & Contratos", "Imobiliário & Aluguel", "Valor da Causa", "Honorários"])
         with tab_divida:
-            st.info("Correção Monetária + Juros de Mora + Danos")
-            c1, c2 = st.columns(2)
+            st.info("Correção Monetária + Juros de Mora + Multa, pelas séries oficiais de índices")
+            try: series = obter_series_indices()
+            except Exception as e:
+                series = {}
+                st.error(f"Erro ao ler as séries de índices: {e}")
+            with st.expander(f"📈 Séries de índices ({len(series)} carregada(s))", expanded=not series):
+                if series:
+                    st.dataframe(pd.DataFrame([{"Série": n, "De": str(x.primeiro_mes), "Até": str(x.ultimo_mes)} for n, x in series.items()]), hide_index=True)
+                else:
+                    st.warning(f"Nenhuma série em `{INDICES_DIR}/`. Rode `python ferramentas/baixar_indices.py` no servidor ou envie o CSV exportado do SGS/BCB.")
+                c_s, c_a = st.columns([1, 2])
+                arquivo_serie = c_s.selectbox("Série", list(SERIES_SGS), format_func=lambda a: f"{SERIES_SGS[a][0]} (SGS {SERIES_SGS[a][1]})", key="serie_envio")
+                csv_serie = c_a.file_uploader("CSV do SGS (data;valor)", type=["csv"], key="serie_csv")
+                if csv_serie is not None and st.button("Salvar série", key="btn_serie"):
+                    try:
+                        dados_serie = csv_serie.getvalue()
+                        ler_serie_sgs(BytesIO(dados_serie), SERIES_SGS[arquivo_serie][0])  # valida antes de gravar
+                        os.makedirs(INDICES_DIR, exist_ok=True)
+                        with open(os.path.join(INDICES_DIR, f"{arquivo_serie}.csv"), "wb") as f: f.write(dados_serie)
+                        st.success("Série salva.")
+                        st.rerun()
+                    except Exception as e: st.error(f"CSV inválido: {e}")
+
+            c1, c2, c3 = st.columns(3)
             val_origem = c1.number_input("Valor Original", value=1000.0, format="%.2f", key="civ_val")
-            data_inicio = c2.date_input("Data do Evento", date(2023, 1, 1), key="civ_data")
-            c3, c4, c5 = st.columns(3)
-            indice = c3.number_input("Índice Acumulado (Ex: 1.05)", value=1.0, step=0.01)
-            juros_tipo = c4.selectbox("Juros de Mora", ["1% a.m.", "0.5% a.m.", "Selic"])
-            multa_pct = c5.number_input("Multa (%)", value=0.0)
+            data_inicio = c2.date_input("Data do Evento / Vencimento", date(2023, 1, 1), key="civ_data")
+            data_atualizacao = c3.date_input("Atualizar até", date.today(), key="civ_ate")
+            c4, c5, c6, c7 = st.columns(4)
+            indices_correcao = [n for n in series if n != "Selic"] or ["-"]
+            indice = c4.selectbox("Índice de Correção", indices_correcao, key="civ_indice")
+            juros_tipo = c5.selectbox("Juros de Mora", list(JUROS_MORA), key="civ_juros")
+            data_juros = c6.date_input("Juros desde (ex.: citação)", data_inicio, key="civ_juros_desde")
+            multa_pct = c7.number_input("Multa (%)", value=0.0, key="civ_multa")
             if st.button("CALCULAR DÍVIDA", key="btn_civ"):
-                meses = (date.today() - data_inicio).days // 30
-                val_corr = val_origem * indice
-                val_juros = val_corr * (0.01 * meses) if juros_tipo == "1% a.m." else val_corr * 0.15
-                val_multa = val_corr * (multa_pct / 100)
-                total = val_corr + val_juros + val_multa
-                st.success(f"Total Atualizado: R$ {total:,.2f}")
+                if not series: st.error("Carregue as séries de índices para calcular.")
+                else:
+                    r = atualizar_debitos(pd.DataFrame([{"Valor": val_origem, "Data": data_inicio, "Início Juros": data_juros}]),
+                                          data_atualizacao, series, indice, juros_tipo, multa_pct).iloc[0]
+                    if r["Erro"]: st.error(r["Erro"])
+                    else:
+                        memoria = memoria_debito(r, data_atualizacao, indice, juros_tipo, multa_pct)
+                        st.table(pd.DataFrame([(d, f"R$ {v:,.2f}") for d, v in memoria.itens], columns=["Item", "Valor"]))
+                        st.success(f"Total Atualizado: R$ {r['Total']:,.2f}")
+                        botoes_memoria(memoria, "debito")
+
+            st.markdown("---")
+            st.markdown("##### 📑 Atualização em lote")
+            st.caption("Planilha (CSV/XLSX) com as colunas Valor e Data e, opcionais, Início Juros e Descrição. Usa o índice, os juros e a multa escolhidos acima.")
+            planilha_debitos = st.file_uploader("Planilha de débitos", type=["csv", "xlsx"], key="debitos_lote")
+            if planilha_debitos is not None and st.button("ATUALIZAR LOTE", key="btn_debitos_lote"):
+                try:
+                    if not series: raise ValueError("carregue as séries de índices")
+                    st.session_state.debitos_lote = atualizar_debitos(ler_planilha(planilha_debitos), data_atualizacao, series, indice, juros_tipo, multa_pct)
+                    st.session_state.debitos_lote_parametros = (data_atualizacao, indice, juros_tipo, multa_pct)
+                    st.session_state.zip_debitos_lote = None
+                except Exception as e: st.error(f"Erro ao atualizar a planilha: {e}")
+            debitos_lote = st.session_state.get("debitos_lote")
+            if debitos_lote is not None:
+                c_n, c_t = st.columns(2)
+                c_n.metric("Débitos atualizados", f"{(debitos_lote['Erro'] == '').sum()}/{len(debitos_lote)}")
+                c_t.metric("Total Atualizado", f"R$ {debitos_lote['Total'].sum():,.2f}")
+                st.dataframe(debitos_lote, use_container_width=True, hide_index=True)
+                st.download_button("⬇️ Resultado CSV", debitos_lote.to_csv(index=False, sep=";", decimal=",").encode("utf-8-sig"), "debitos_atualizados.csv", "text/csv")
+                parametros_lote = st.session_state.debitos_lote_parametros
+                botao_zip_memorias(lambda: (memoria_debito(linha, *parametros_lote) for _, linha in debitos_lote[debitos_lote["Erro"] == ""].iterrows()),
+                                   "memorias_debitos.zip", "zip_debitos_lote")
 
     elif area_calc == "Família":
         st.markdown("#### 👨‍👩‍👧‍👦 Pensão Alimentícia")
@@ -701,13 +2600,25 @@ elif menu_opcao == "🧮 Cálculos Jurídicos":
 
     elif area_calc == "Tributária":
         st.markdown("#### 🏛️ Cálculos Tributários")
-        val_prin = st.number_input("Valor Principal", value=5000.0)
-        selic = st.number_input("Selic Acumulada (%)", value=15.0)
-        multa = st.number_input("Multa de Mora (%)", value=20.0)
-        
+        st.caption("Débitos com a União (Lei 9.430/96, art. 61): multa de mora de 0,33% ao dia (limite de 20%) e juros pela Selic "
+                   "acumulada do mês seguinte ao vencimento até o mês anterior ao pagamento, mais 1% no mês do pagamento.")
+        c1, c2, c3 = st.columns(3)
+        val_prin = c1.number_input("Valor Principal", value=5000.0)
+        vencimento = c2.date_input("Vencimento", date(2024, 1, 31), key="trib_venc")
+        pagamento = c3.date_input("Pagamento", date.today(), key="trib_pag")
+        try: selic = obter_series_indices().get("Selic")
+        except Exception: selic = None
+
         if st.button("CALCULAR DÉBITO FISCAL"):
-            total = val_prin * (1 + selic/100) * (1 + multa/100)
-            st.success(f"Total Execução Fiscal: R$ {total:,.2f}")
+            if selic is None: st.error("Carregue a série Selic (Cálculos Cíveis > Séries de índices).")
+            else:
+                multa, juros, total = (float(v[0]) for v in debito_federal([val_prin], [vencimento], [pagamento], selic))
+                if math.isnan(total): st.error(f"A série Selic carregada vai até {selic.ultimo_mes}; atualize-a para este período.")
+                else:
+                    memoria = memoria_debito_federal(val_prin, vencimento, pagamento, multa, juros, total)
+                    st.table(pd.DataFrame([(d, f"R$ {v:,.2f}") for d, v in memoria.itens], columns=["Item", "Valor"]))
+                    st.success(f"Total Execução Fiscal: R$ {total:,.2f}")
+                    botoes_memoria(memoria, "fiscal")
 
     elif area_calc == "Criminal":
         st.markdown("#### ⚖️ Dosimetria Penal")
@@ -719,19 +2630,17 @@ elif menu_opcao == "🧮 Cálculos Jurídicos":
             circ = st.slider("Circunstâncias Judiciais Desfavoráveis", 0, 8, 1)
             
             if st.button("CALCULAR PENA BASE"):
-                fator = (max_p - min_p) / 8
-                pena_base = min_p + (fator * circ)
-                st.success(f"Pena Base: {pena_base:.2f} anos")
+                memoria = memoria_pena_base(min_p, max_p, circ)
+                st.success(f"Pena Base: {memoria.total:.2f} anos")
+                botoes_memoria(memoria, "pena_base")
         
         with tab_exec:
             pena_tot = st.number_input("Pena Total (Anos)", value=8.0)
-            tipo_crime = st.selectbox("Tipo", ["Comum (16%)", "Violento (25%)", "Hediondo (40%)"])
+            tipo_crime = st.selectbox("Tipo", list(PROGRESSAO_REGIME))
             if st.button("CALCULAR PROGRESSÃO"):
-                pct = 0.16
-                if "25%" in tipo_crime: pct = 0.25
-                elif "40%" in tipo_crime: pct = 0.40
-                tempo = pena_tot * pct
-                st.info(f"Tempo para progressão: {tempo:.2f} anos")
+                memoria = memoria_progressao(pena_tot, tipo_crime)
+                st.info(f"Tempo para progressão: {memoria.total:.2f} anos")
+                botoes_memoria(memoria, "progressao")
 
 # --- SIMULADOR DE AUDIÊNCIA ---
 elif menu_opcao == "🏛️ Simulador Audiência":
@@ -739,9 +2648,13 @@ elif menu_opcao == "🏛️ Simulador Audiência":
     with st.container(border=True):
         st.subheader("📂 1. Análise dos Autos")
         uploaded_files = st.file_uploader("Arraste as principais peças (PDF)", type="pdf", accept_multiple_files=True)
+        pasta_caso = st.text_input("Pasta do Caso (opcional)", placeholder="Ex: Proc. 1002345-88.2024.8.26.0100", key="pasta_audiencia")
         texto_autos = ""
+        textos_pdfs = []
         if uploaded_files:
-            for pdf in uploaded_files: texto_autos += extrair_texto_pdf(pdf) + "\n\n"
+            with st.spinner("Lendo os autos..."):
+                textos_pdfs = extrair_textos_com_progresso(uploaded_files)
+            texto_autos = "".join([t + "\n\n" for t in textos_pdfs])
             st.success(f"✅ {len(uploaded_files)} arquivos processados.")
 
     with st.container(border=True):
@@ -751,35 +2664,30 @@ elif menu_opcao == "🏛️ Simulador Audiência":
         polo = c2.selectbox("Polo", ["Autor", "Réu"])
         obj = st.text_area("Objetivo Principal", height=70)
 
+    regenerar = st.checkbox("🔄 Regenerar (ignorar respostas em cache)", key="regen_audiencia")
     if st.button("GERAR DOSSIÊ DE GUERRA", use_container_width=True):
         if obj:
-            with st.spinner("Gerando estratégia..."):
-                prompt = f"Gere dossiê de audiência {tipo_aud}. Polo: {polo}. Objetivo: {obj}. Baseado nos autos: {texto_autos[:5000]}."
-                res = tentar_gerar_conteudo(prompt)
-                st.markdown(res)
-                st.download_button("Baixar Dossiê", gerar_word(res), "Dossie.docx", use_container_width=True)
+            with st.spinner("Lendo os autos..."):
+                autos = montar_contexto_caso(identificar_caso(pasta_caso, uploaded_files), [f.name for f in uploaded_files or []], textos_pdfs, f"{tipo_aud} {polo} {obj}", ORCAMENTO_AUDIENCIA)
+                prompt = f"Gere dossiê de audiência {tipo_aud}. Polo: {polo}. Objetivo: {obj}. Baseado nos autos: {autos}."
+            enviar_geracao("trabalho_audiencia", prompt, f"Dossiê de audiência ({tipo_aud})", not regenerar)
+    trabalho = resultado_geracao("trabalho_audiencia")
+    if trabalho:
+        st.markdown(trabalho.resultado)
+        st.download_button("Baixar Dossiê", partial(gerar_word, trabalho.resultado), "Dossie.docx", use_container_width=True)
 
 # --- NOVA ABA: GESTÃO DE ESCRITÓRIO (VINCULAÇÃO E AUTOMATIZAÇÃO) ---
 elif menu_opcao == "💼 Gestão de Escritório":
     st.markdown("<h2 class='tech-header'>💼 GESTÃO JURÍDICA INTEGRADA</h2>", unsafe_allow_html=True)
     
-    # 1. VERIFICAÇÃO AUTOMÁTICA (SIMULAÇÃO DE "ROBÔ")
-    now = datetime.now()
-    if 'last_check' not in st.session_state:
-        st.session_state['last_check'] = now - timedelta(hours=2) # Força rodar na 1ª vez
-
-    diff = (now - st.session_state['last_check']).total_seconds() / 60 # Minutos
-    
-    if diff > 60:
-        with st.status("🔄 Sincronizando automaticamente com Tribunais...", expanded=True) as status:
-            time.sleep(1) # Simula conexão
-            if len(st.session_state.casos_db) > 0:
-                idx_rand = random.randint(0, len(st.session_state.casos_db)-1)
-                st.session_state.casos_db.at[idx_rand, "Última Mov."] = f"{now.strftime('%d/%m')} - Nova movimentação detectada"
-            st.session_state['last_check'] = now
-            salvar_dados(st.session_state.casos_db)
-            status.update(label="Sincronização Automática Concluída!", state="complete", expanded=False)
-            st.toast("Base de dados atualizada automaticamente.")
+    # 1. SINCRONIZAÇÃO COM TRIBUNAIS: roda em segundo plano (uma por servidor); a tela só lê os resultados
+    sincronizador = obter_sincronizador()
+    if st.session_state.get("sync_rodada") != sincronizador.rodadas:
+        if "sync_rodada" in st.session_state and sincronizador.novas_ultima_rodada:
+            st.toast(f"{sincronizador.novas_ultima_rodada} nova(s) movimentação(ões) recebida(s) dos tribunais.")
+        st.session_state.sync_rodada = sincronizador.rodadas
+        st.session_state.casos_db = carregar_dados()
+        st.session_state.editor_versao += 1
 
     # Abas Funcionais
     tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
@@ -794,26 +2702,26 @@ elif menu_opcao == "💼 Gestão de Escritório":
     # --- TAB 1: CADASTRO E VINCULAÇÃO ---
     with tab1:
         st.markdown("### 🗂️ Carteira de Processos")
-        st.caption(f"Última sincronização: {st.session_state['last_check'].strftime('%H:%M')}")
+        if sincronizador.em_execucao: st.caption("🔄 Sincronizando com os tribunais em segundo plano...")
+        elif sincronizador.ultima_sincronizacao: st.caption(f"Última sincronização: {sincronizador.ultima_sincronizacao.strftime('%H:%M')}")
+        if sincronizador.erros_ultima_rodada:
+            with st.expander(f"⚠️ {len(sincronizador.erros_ultima_rodada)} consulta(s) com erro na última sincronização"):
+                st.write("\n".join(sincronizador.erros_ultima_rodada[:20]))
         
-        # Editor de Dados (CRUD)
-        edited_df = st.data_editor(
+        # Editor de Dados (CRUD) - grava apenas o delta via on_change
+        st.data_editor(
             st.session_state.casos_db, 
             num_rows="dynamic", 
             use_container_width=True,
             column_config={
+                "id": None,
                 "Processo": st.column_config.TextColumn("Nº Processo (CNJ)", help="Digite o número para vincular ao robô", validate="^[0-9.-]+$"),
                 "Status": st.column_config.SelectboxColumn("Fase", options=["Ativo", "Suspenso", "Arquivado", "Execução", "Consultivo"]),
                 "Tribunal": st.column_config.SelectboxColumn("Tribunal", options=["TJSP", "TJRJ", "TRT-2", "TRF-3", "STJ", "-"])
             },
-            key="editor_casos"
+            key=f"editor_casos_{st.session_state.editor_versao}",
+            on_change=aplicar_edicoes_carteira
         )
-        
-        # Se houve alteração manual, salva no CSV
-        if not edited_df.equals(st.session_state.casos_db):
-            st.session_state.casos_db = edited_df
-            salvar_dados(edited_df)
-            st.rerun()
 
     # --- TAB 2: RADAR DE MOVIMENTAÇÕES ---
     with tab2:
@@ -821,48 +2729,177 @@ elif menu_opcao == "💼 Gestão de Escritório":
         st.caption("Acompanhamento em tempo real dos processos cadastrados.")
         
         if st.button("Forçar Verificação Manual Agora"):
-            st.session_state['last_check'] = now - timedelta(hours=2) # Reseta timer
-            st.rerun()
-
-        # Mostra processos com movimentação recente
-        for index, row in st.session_state.casos_db.iterrows():
-            # Safe get for columns to avoid KeyErrors on old CSVs
-            ult_mov = row.get("Última Mov.", "-")
-            tribunal = row.get("Tribunal", "-")
-            cliente = row.get("Cliente", "Desconhecido")
-            proc = row.get("Processo", "")
-
-            if "Nova movimentação" in str(ult_mov) or "Concluso" in str(ult_mov):
+            sincronizador.forcar()
+            st.toast("Verificação solicitada; os resultados aparecem aqui ao terminar.")
+
+        # Mostra processos com movimentação não vista (consulta indexada, paginada)
+        RADAR_POR_PAGINA = 20
+        repo = obter_repositorio()
+        total_nao_vistas = repo.listar_nao_vistas(1)[1]
+        if total_nao_vistas == 0:
+            st.success("Nenhuma movimentação nova.")
+        else:
+            n_paginas = (total_nao_vistas - 1) // RADAR_POR_PAGINA + 1
+            c_pag, c_tot = st.columns([1, 3])
+            pagina = c_pag.number_input("Página", min_value=1, max_value=n_paginas, value=1, step=1, key="radar_pagina")
+            c_tot.caption(f"{total_nao_vistas} movimentações não vistas | página {pagina} de {n_paginas}")
+            radar_df, _ = repo.listar_nao_vistas(RADAR_POR_PAGINA, (pagina - 1) * RADAR_POR_PAGINA)
+            for row in radar_df.to_dict("records"):
                 with st.container(border=True):
                     c_ico, c_det = st.columns([0.5, 4])
                     with c_ico: st.markdown("## 🔔")
                     with c_det:
-                        st.markdown(f"**{cliente}** ({proc})")
-                        st.caption(f"Status: {ult_mov} | Tribunal: {tribunal}")
+                        st.markdown(f"**{row['Cliente']}** ({row['Processo']})")
+                        st.caption(f"{row['Movimentação']} | Tribunal: {row['Tribunal']} | Recebida em: {row['Data']}")
+            if st.button("✔️ Marcar desta página como vistas"):
+                repo.marcar_vistas(radar_df["id"].tolist())
+                st.rerun()
 
     # --- TAB 3: INTIMAÇÕES ---
     with tab3:
         st.markdown("### ⚖️ Leitor de Diários Oficiais")
-        st.info("Simulação: Nenhuma intimação pendente de leitura no momento.")
+        with st.expander("📥 Varrer Diário Oficial", expanded=False):
+            c_arq, c_cfg = st.columns(2)
+            diario_upload = c_arq.file_uploader("Diário (PDF ou TXT)", type=["pdf", "txt"], key="dje_upload")
+            opcoes_servidor = diarios_servidor()
+            nome_servidor = c_arq.selectbox("...ou diário já no servidor (diários muito grandes)", [""] + opcoes_servidor, key="dje_servidor") if opcoes_servidor else ""
+            data_diario = c_cfg.date_input("Data de disponibilização", date.today(), key="dje_data")
+            oabs_txt = c_cfg.text_input("Inscrições OAB do escritório (separadas por vírgula)", value=", ".join(OAB_ESCRITORIO), placeholder="Ex: SP123456, RJ98765", key="dje_oabs")
+            if st.button("VARRER DIÁRIO", use_container_width=True, key="btn_dje"):
+                fonte_diario = diario_upload or caminho_diario_servidor(nome_servidor)
+                if fonte_diario is None:
+                    st.warning("Envie o arquivo do diário ou escolha um diário da pasta do servidor.")
+                else:
+                    nome_diario = diario_upload.name if diario_upload else os.path.basename(fonte_diario)
+                    progresso = st.empty()
+                    with st.spinner("Lendo o diário e cruzando com a carteira..."):
+                        t0 = time.time()
+                        novas = varrer_diario(fonte_diario, nome_diario, data_diario.strftime("%Y-%m-%d"), [o.strip() for o in oabs_txt.split(",") if o.strip()],
+                                              lambda pagina: progresso.caption(f"Página {pagina}..."))
+                    progresso.empty()
+                    st.success(f"✅ Diário varrido em {time.time() - t0:.1f}s: {novas} nova(s) intimação(ões).")
+
+        INTIMACOES_POR_PAGINA = 20
+        repo = obter_repositorio()
+        total_intimacoes = repo.listar_intimacoes(1)[1]
+        if total_intimacoes == 0:
+            st.info("Nenhuma intimação pendente de leitura no momento.")
+        else:
+            n_paginas = (total_intimacoes - 1) // INTIMACOES_POR_PAGINA + 1
+            c_pag, c_tot = st.columns([1, 3])
+            pagina = c_pag.number_input("Página", min_value=1, max_value=n_paginas, value=1, step=1, key="dje_pagina")
+            c_tot.caption(f"{total_intimacoes} intimações não lidas | página {pagina} de {n_paginas}")
+            intimacoes_df, _ = repo.listar_intimacoes(INTIMACOES_POR_PAGINA, (pagina - 1) * INTIMACOES_POR_PAGINA)
+            for row in intimacoes_df.to_dict("records"):
+                with st.container(border=True):
+                    st.markdown(f"**{row['Tipo']}: {row['Identificador']}** — {row['Cliente'] or 'Escritório'} {('(' + row['Processo'] + ')') if row['Processo'] else ''}")
+                    st.caption(f"{row['Diário']} | {row['Data']} | pág. {row['Página']}")
+                    st.write(f"…{row['Trecho']}…")
+            if st.button("✔️ Marcar desta página como lidas", key="dje_lidas"):
+                repo.marcar_intimacoes_lidas(intimacoes_df["id"].tolist())
+                st.rerun()
 
     # --- TAB 4: AGENDA ---
     with tab4:
         st.markdown("### 📅 Agenda de Prazos")
+        agenda = obter_agenda_prazos()
+        repo = obter_repositorio()
+        novos_prazos = agenda.derivar()
+        if novos_prazos: st.toast(f"{novos_prazos} novo(s) prazo(s) calculado(s) a partir de intimações e movimentações.")
+        tribunais_agenda = sorted({"TJSP", "TJRJ", "TRT-2", "TRF-3", "STJ"} | set(st.session_state.casos_db["Tribunal"].dropna()) - {"-", ""})
+        hoje_iso = date.today().isoformat()
+
         c_cal, c_list = st.columns([1, 2])
-        with c_cal: st.date_input("Calendário", date.today())
+        with c_cal:
+            ate_agenda = st.date_input("Mostrar prazos até", date.today() + timedelta(days=15), key="agenda_ate")
+            vencidos = repo.listar_prazos((date.today() - timedelta(days=1)).isoformat(), 1)[1]
+            c_v, c_h = st.columns(2)
+            c_v.metric("Vencidos", vencidos)
+            c_h.metric("Vencem hoje", repo.listar_prazos(hoje_iso, 1)[1] - vencidos)
+            with st.expander("🧮 Calcular prazo avulso"):
+                trib_avulso = st.selectbox("Tribunal", tribunais_agenda, key="avulso_tribunal")
+                data_avulso = st.date_input("Data da intimação / disponibilização", date.today(), key="avulso_data")
+                dias_avulso = st.number_input("Prazo (dias)", min_value=1, max_value=365, value=15, key="avulso_dias")
+                dje_avulso = st.checkbox("Disponibilizado no DJE (publicação no dia útil seguinte)", key="avulso_dje")
+                corridos_avulso = st.checkbox("Dias corridos (prazo material)", key="avulso_corridos")
+                inicio_avulso, venc_avulso = agenda.calcular(trib_avulso, [data_avulso.isoformat()], [int(dias_avulso)], dje_avulso, corridos_avulso)
+                if venc_avulso[0]: st.info(f"Contagem a partir de {inicio_avulso[0]} | **Vencimento: {venc_avulso[0]}**")
+                else: st.warning("Data fora do período coberto pelo calendário.")
         with c_list:
-            st.success("Tudo em dia! Nenhum prazo fatal para hoje.")
+            PRAZOS_POR_PAGINA = 30
+            total_prazos = repo.listar_prazos(ate_agenda.isoformat(), 1)[1]
+            if total_prazos == 0:
+                st.success("Tudo em dia! Nenhum prazo em aberto até a data escolhida.")
+            else:
+                n_paginas = (total_prazos - 1) // PRAZOS_POR_PAGINA + 1
+                c_pag, c_tot = st.columns([1, 3])
+                pagina = c_pag.number_input("Página", min_value=1, max_value=n_paginas, value=1, step=1, key="agenda_pagina")
+                c_tot.caption(f"{total_prazos} prazo(s) em aberto até {ate_agenda.strftime('%d/%m/%Y')} | página {pagina} de {n_paginas}")
+                prazos_df, _ = repo.listar_prazos(ate_agenda.isoformat(), PRAZOS_POR_PAGINA, (pagina - 1) * PRAZOS_POR_PAGINA)
+                prazos_df.insert(2, "Dias úteis restantes", pd.array(agenda.uteis_restantes(prazos_df["Tribunal"], prazos_df["Vencimento"]), dtype="Int64"))
+                prazos_df["Corridos"] = prazos_df["Corridos"].astype(bool)
+                prazos_df["Cumprido"] = False
+                editados = st.data_editor(prazos_df, hide_index=True, use_container_width=True, key=f"agenda_editor_{pagina}",
+                                          column_config={"id": None}, disabled=[c for c in prazos_df.columns if c != "Cumprido"])
+                if st.button("✔️ Marcar selecionados como cumpridos", key="agenda_cumpridos"):
+                    repo.marcar_prazos_cumpridos(editados.loc[editados["Cumprido"], "id"].tolist())
+                    st.rerun()
+
+        with st.expander("🗓️ Feriados e suspensões de expediente", expanded=False):
+            st.caption("Nacionais, Páscoa, recesso de 20/12 a 20/01 e os da Lei 5.010/66 (Justiça Federal/Trabalho) já são considerados. "
+                       "Cadastre aqui os locais e as suspensões de expediente; só os prazos afetados são recalculados.")
+            c_t, c_d, c_n = st.columns([1, 1, 2])
+            trib_feriado = c_t.selectbox("Tribunal", ["*"] + tribunais_agenda, format_func=lambda t: "Todos" if t == "*" else t, key="feriado_tribunal")
+            dia_feriado = c_d.date_input("Data", date.today(), key="feriado_data")
+            desc_feriado = c_n.text_input("Descrição", placeholder="Ex: Aniversário da cidade / suspensão por falha no PJe", key="feriado_desc")
+            c_add, c_del = st.columns(2)
+            if c_add.button("Cadastrar feriado", use_container_width=True, key="feriado_add"):
+                alterados = agenda.alterar_feriado(trib_feriado, dia_feriado, desc_feriado.strip() or "Sem expediente")
+                st.success(f"Feriado cadastrado. {alterados} prazo(s) recalculado(s).")
+            if c_del.button("Remover feriado", use_container_width=True, key="feriado_del"):
+                alterados = agenda.alterar_feriado(trib_feriado, dia_feriado)
+                st.success(f"Feriado removido. {alterados} prazo(s) recalculado(s).")
+            feriados_cadastrados = repo.feriados()
+            if feriados_cadastrados:
+                st.dataframe(pd.DataFrame(feriados_cadastrados, columns=["Tribunal", "Data", "Descrição"]), hide_index=True, use_container_width=True)
 
     # --- TAB 5: DOCUMENTOS ---
     with tab5:
         st.markdown("### 📂 Gestão Eletrônica de Documentos (GED)")
-        if len(st.session_state.meus_docs) > 0:
-            for i, doc in enumerate(st.session_state.meus_docs):
-                with st.expander(f"{doc['tipo']} - {doc['cliente']}"):
-                    st.write(doc['conteudo'][:200])
-                    st.download_button("Baixar", gerar_word(doc['conteudo']), f"Doc_{i}.docx")
+        ged = obter_arquivo_documentos()
+        c_busca, c_cli, c_tipo, c_per = st.columns([3, 2, 2, 2])
+        busca_ged = c_busca.text_input("🔎 Buscar no conteúdo", key="ged_busca")
+        cliente_ged = c_cli.selectbox("Cliente", ["Todos"] + ged.valores("cliente"), key="ged_cliente")
+        tipo_ged = c_tipo.selectbox("Tipo", ["Todos"] + ged.valores("tipo"), key="ged_tipo")
+        periodo_ged = c_per.date_input("Período", (), key="ged_periodo")
+        filtros_ged = {"cliente": None if cliente_ged == "Todos" else cliente_ged, "tipo": None if tipo_ged == "Todos" else tipo_ged,
+                       "de": periodo_ged[0] if len(periodo_ged) > 0 else None, "ate": periodo_ged[1] if len(periodo_ged) > 1 else None,
+                       "busca": busca_ged}
+        total_ged = ged.listar(**filtros_ged, limite=1)[1]
+        if total_ged == 0:
+            st.info("Nenhum documento arquivado com esses filtros.")
         else:
-            st.info("Nenhum documento gerado nesta sessão.")
+            n_paginas = (total_ged - 1) // GED_POR_PAGINA + 1
+            c_pag, c_tot, c_zip = st.columns([1, 2, 2])
+            pagina = c_pag.number_input("Página", min_value=1, max_value=n_paginas, value=1, step=1, key="ged_pagina")
+            c_tot.caption(f"{total_ged} documento(s) | página {pagina} de {n_paginas}")
+            c_zip.download_button(f"🗜️ Exportar {total_ged} em ZIP (DOCX)", partial(gerar_zip_documentos, ged.ids(**filtros_ged)),
+                                  "Documentos_LegalHub.zip", "application/zip", use_container_width=True, key="ged_zip")
+            docs_df, _ = ged.listar(**filtros_ged, limite=GED_POR_PAGINA, deslocamento=(pagina - 1) * GED_POR_PAGINA)
+            st.dataframe(docs_df.drop(columns=["id"]).assign(Resumo=docs_df["Resumo"].str.replace("\n", " ")), hide_index=True, use_container_width=True,
+                         column_config={"Tamanho": st.column_config.NumberColumn("Tamanho (bytes)")})
+            rotulos = {r["id"]: f"#{r['id']} | {r['Data'][:16]} | {r['Tipo']} - {r['Cliente']}" for r in docs_df.to_dict("records")}
+            aberto = st.selectbox("Abrir documento", [None] + list(rotulos), format_func=lambda i: "—" if i is None else rotulos[i], key="ged_aberto")
+            if aberto is not None:  # o corpo só é lido (e descomprimido) aqui
+                conteudo = ged.conteudo(aberto)
+                with st.container(border=True):
+                    st.markdown(conteudo)
+                c_baixar, c_excluir = st.columns(2)
+                c_baixar.download_button("📥 Baixar (.docx)", partial(gerar_word, conteudo), f"{nome_arquivo(rotulos[aberto].split('| ')[-1])}.docx",
+                                         use_container_width=True, key="ged_baixar")
+                if c_excluir.button("🗑️ Excluir documento", use_container_width=True, key="ged_excluir"):
+                    ged.excluir([aberto])
+                    st.rerun()
 
     # --- TAB 6: FINANCEIRO ---
     with tab6:
@@ -871,5 +2908,29 @@ elif menu_opcao == "💼 Gestão de Escritório":
         col_f1.metric("Receita Estimada", "R$ 65.000,00", "Processos Ativos")
         col_f2.metric("A Receber", "R$ 12.500,00", "Pendente")
 
+# --- ADMIN: DESEMPENHO POR ETAPA ---
+elif menu_opcao == "🛠️ Admin":
+    st.markdown("<h2 class='tech-header'>🛠️ ADMIN: DESEMPENHO POR ETAPA</h2>", unsafe_allow_html=True)
+    exportacoes = [f"JSONL em `{MEDICOES_JSONL}`" if MEDICOES_JSONL else None,
+                   f"Prometheus em `http://127.0.0.1:{MEDIDOR.porta_prometheus}/metrics`" if MEDIDOR.porta_prometheus else None]
+    st.caption("Medições deste processo do servidor (todas as sessões), desde a subida ou a última limpeza. Exportação: "
+               + (", ".join(e for e in exportacoes if e) or "desligada (MEDICOES_JSONL / MEDICOES_PROMETHEUS_PORTA)") + ".")
+    resumo = MEDIDOR.resumo()
+    if resumo:
+        st.dataframe(pd.DataFrame(resumo).rename(columns={"etapa": "Etapa", "rotulos": "Rótulos", "chamadas": "Chamadas", "p50_ms": "p50 (ms)",
+                                                          "p95_ms": "p95 (ms)", "p99_ms": "p99 (ms)", "max_ms": "Máx (ms)", "total_s": "Total (s)"}),
+                     hide_index=True, use_container_width=True,
+                     column_config={c: st.column_config.NumberColumn(format="%.1f") for c in ("p50 (ms)", "p95 (ms)", "p99 (ms)", "Máx (ms)", "Total (s)")})
+    else: st.info("Nenhuma medição ainda: use as telas de PDF, IA, documentos ou carteira.")
+    contadores = MEDIDOR.contadores()
+    if contadores:
+        st.markdown("##### Contadores")
+        st.dataframe(pd.DataFrame(contadores).rename(columns={"contador": "Contador", "rotulos": "Rótulos", "valor": "Valor"}), hide_index=True)
+    a1, a2 = st.columns(2)
+    a1.download_button("⬇️ Baixar no formato Prometheus", MEDIDOR.prometheus, "legalhub_metricas.prom", "text/plain", use_container_width=True)
+    if a2.button("🧹 Zerar medições", use_container_width=True):
+        MEDIDOR.zerar()
+        st.rerun()
+
 st.markdown("---")
 st.markdown("<center>🔒 LEGALHUB ELITE v17.1 | DARK NETWORK EDITION</center>", unsafe_allow_html=True)
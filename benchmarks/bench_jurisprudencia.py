@@ -0,0 +1,136 @@
+"""Benchmark da base local de jurisprudência (jurisprudencia.BaseJurisprudencia) sobre um dump sintético.
+
+    python benchmarks/bench_jurisprudencia.py --decisoes 1000000 --consultas 500
+
+Gera (uma vez) benchmarks/fixtures/ementas_<n>.jsonl.gz com ementas de STF/STJ/TST (vocabulário jurídico com termos
+de frequência zipfiana, como nos dumps reais), importa numa base nova em benchmarks/fixtures/, e mede o top-k de
+consultas no formato usado pelas petições (fatos longos, com e sem filtro de tribunal/área), com o cache frio e
+quente. Sai com erro se o p95 frio passar de --max-ms.
+"""
+import argparse
+import gzip
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from jurisprudencia import BaseJurisprudencia, registros  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+TRIBUNAIS = {"STF": ["Direito Constitucional", "Direito Tributário", "Direito Penal"], "STJ": ["Direito Civil", "Direito do Consumidor", "Direito Penal", "Direito Tributário"],
+             "TST": ["Direito do Trabalho"]}
+CLASSES = {"STF": ["RE", "ARE", "ADI", "HC"], "STJ": ["REsp", "AgInt no AREsp", "HC", "RMS"], "TST": ["RR", "AIRR", "Ag-RR"]}
+RAIZES = """dano moral material responsabilidade civil objetiva consumidor fornecedor servico produto defeito vicio inscricao indevida
+cadastro inadimplentes negativacao usucapiao posse propriedade imovel urbano rural locacao despejo alugueis fianca contrato
+rescisao indireta justa causa horas extras adicional insalubridade periculosidade equiparacao salarial vinculo emprego
+terceirizacao ilicita verbas rescisorias fgts multa aviso previo ferias estabilidade gestante acidente trabalho doenca
+ocupacional icms pis cofins base calculo exclusao prescricao decadencia tributo repeticao indebito execucao fiscal penhora
+bacenjud habeas corpus prisao preventiva trafico drogas dosimetria pena regime inicial fechado semiaberto aberto reincidencia
+furto roubo estelionato nulidade citacao cerceamento defesa honorarios sucumbenciais astreintes tutela urgencia liminar
+alimentos guarda divorcio partilha uniao estavel inventario heranca plano saude negativa cobertura tratamento medicamento
+banco juros abusivos capitalizacao revisional financiamento veiculo busca apreensao seguro indenizacao sinistro""".split()
+# Institutos/teses específicos (cauda do vocabulário jurídico): cada um aparece em poucas decisões, como "astreintes" ou
+# "desaposentação" nos dumps reais, ao contrário das raízes genéricas acima
+INSTITUTOS = [f"instituto{i}" for i in range(3_000)]
+PESOS_INSTITUTOS = list(itertools.accumulate(1 / (i + 1) ** 0.8 for i in range(len(INSTITUTOS))))
+CONECTIVOS = "de da do das dos em na no para com sem pela pelo a o e que".split()
+FORMULAS = ["Recurso conhecido e provido.", "Recurso não provido.", "Agravo interno desprovido.", "Ordem concedida.", "Precedentes.",
+            "Súmula 7/STJ.", "Jurisprudência consolidada.", "Reexame de fatos e provas.", "Acórdão mantido."]
+
+def gerar_fixture(caminho, n, rng):
+    # Vocabulário: raízes jurídicas comuns + cauda longa de termos raros (nomes, institutos, localidades)
+    cauda = [f"termo{i}" for i in range(50_000)]
+    acumulado = list(itertools.accumulate(1 / (i + 1) for i in range(len(cauda))))
+    with gzip.open(caminho, "wt", encoding="utf-8") as f:
+        for i in range(n):
+            tribunal = rng.choice(list(TRIBUNAIS))
+            assunto = rng.sample(RAIZES, 3) + sorteia_institutos(rng, 3)
+            palavras = []
+            for _ in range(rng.randint(40, 90)):
+                r = rng.random()
+                palavras.append(rng.choice(assunto) if r < 0.35 else rng.choice(CONECTIVOS) if r < 0.7 else
+                                rng.choice(RAIZES) if r < 0.9 else rng.choices(cauda, cum_weights=acumulado)[0])
+            ementa = " ".join(assunto[:3]).upper() + ". " + " ".join(palavras).capitalize() + ". " + rng.choice(FORMULAS)
+            f.write(json.dumps({"tribunal": tribunal, "classe": rng.choice(CLASSES[tribunal]), "numero": f"{rng.randint(1, 2_500_000)}/{i}",
+                                "relator": f"Min. Relator {rng.randint(1, 40)}", "data_julgamento": f"{rng.randint(2005, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                                "area": rng.choice(TRIBUNAIS[tribunal]), "ementa": ementa}, ensure_ascii=False) + "\n")
+
+def sorteia_institutos(rng, n):
+    escolhidos = set()
+    while len(escolhidos) < n: escolhidos.add(rng.choices(INSTITUTOS, cum_weights=PESOS_INSTITUTOS)[0])
+    return list(escolhidos)
+
+def consulta_peticao(rng):
+    """Fatos como chegam da tela de petições: texto longo sobre um assunto, com conectivos, outros termos e nomes.
+    Devolve (texto, termos do assunto)."""
+    assunto = rng.sample(RAIZES, 2) + sorteia_institutos(rng, 2)
+    palavras = []
+    for _ in range(rng.randint(80, 400)):
+        r = rng.random()
+        palavras.append(rng.choice(assunto) if r < 0.15 else rng.choice(RAIZES) if r < 0.3 else
+                        rng.choice(CONECTIVOS) if r < 0.8 else f"termo{rng.randint(0, 80_000)}")
+    return " ".join(palavras), set(assunto)
+
+def percentis(tempos):
+    tempos = sorted(tempos)
+    return {p: tempos[min(len(tempos) - 1, int(len(tempos) * p / 100))] * 1000 for p in (50, 95, 99)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--decisoes", type=int, default=200_000)
+    parser.add_argument("--consultas", type=int, default=300)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=50.0)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--reimportar", action="store_true", help="recria a base mesmo se já existir")
+    args = parser.parse_args()
+
+    rng = random.Random(args.semente)
+    os.makedirs(FIXTURES, exist_ok=True)
+    dump = os.path.join(FIXTURES, f"ementas_{args.decisoes}.jsonl.gz")
+    if not os.path.exists(dump):
+        t0 = time.time()
+        gerar_fixture(dump, args.decisoes, rng)
+        print(f"dump sintético gerado em {time.time() - t0:.1f}s ({os.path.getsize(dump) / 2**20:.0f} MB)")
+
+    caminho = os.path.join(FIXTURES, f"jurisprudencia_{args.decisoes}.sqlite")
+    if args.reimportar or not os.path.exists(caminho):
+        for sufixo in ("", "-wal", "-shm"):
+            if os.path.exists(caminho + sufixo): os.remove(caminho + sufixo)
+        base = BaseJurisprudencia(caminho)
+        t0 = time.time()
+        inseridas, ignoradas = base.importar(registros(dump))
+        base.otimizar()
+        duracao = time.time() - t0
+        print(f"importação: {inseridas} decisões ({ignoradas} ignoradas) em {duracao:.1f}s = {inseridas / duracao:,.0f}/s | base {os.path.getsize(caminho) / 2**20:.0f} MB")
+    else: base = BaseJurisprudencia(caminho)
+
+    cenarios = {"sem filtro": {}, "tribunal=STJ": {"tribunais": ["STJ"]}, "area=trabalhista": {"area": "trabalhista"},
+                "STF+STJ, civel": {"tribunais": ["STF", "STJ"], "area": "civel"}}
+    consultas = [consulta_peticao(rng) for _ in range(args.consultas)]
+    pior_p95 = 0.0
+    print(f"{'cenário':<20}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'quente p50':>12}{'vazias':>8}{'top-1 no assunto':>18}")
+    for nome, filtros in cenarios.items():
+        frios, quentes, vazias, no_assunto = [], [], 0, 0
+        for consulta, assunto in consultas:
+            t0 = time.perf_counter()
+            resultado = base.buscar(consulta, k=args.k, **filtros)
+            frios.append(time.perf_counter() - t0)
+            if not resultado: vazias += 1
+            elif len(assunto & set(resultado[0].ementa.lower().split())) >= 2: no_assunto += 1
+            t0 = time.perf_counter()
+            base.buscar(consulta, k=args.k, **filtros)
+            quentes.append(time.perf_counter() - t0)
+        p = percentis(frios)
+        pior_p95 = max(pior_p95, p[95])
+        print(f"{nome:<20}{p[50]:>9.1f}{p[95]:>9.1f}{p[99]:>9.1f}{statistics.median(quentes) * 1000:>12.2f}{vazias:>8}{no_assunto / len(consultas):>18.0%}")
+    if pior_p95 > args.max_ms:
+        print(f"FALHA: p95 {pior_p95:.1f} ms > {args.max_ms:.0f} ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
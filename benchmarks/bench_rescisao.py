@@ -0,0 +1,70 @@
+"""Benchmark e conferência da rescisão em lote (calculos.calcular_rescisoes_lote) contra o cálculo individual.
+
+    python benchmarks/bench_rescisao.py --linhas 20000
+
+Gera empregados aleatórios (todas as combinações de motivo, aviso, insalubridade e datas em vários anos), roda o lote
+vetorizado e o cálculo individual linha a linha, e confere que as verbas e o total são idênticos. Sai com erro se
+alguma linha divergir.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calculos import GRAUS_INSALUBRIDADE, MOTIVOS_RESCISAO, TIPOS_AVISO, calcular_rescisao_clt, calcular_rescisoes_lote, verbas_da_linha  # noqa: E402
+
+def empregados(n, rng):
+    admissao = [date(2005, 1, 1) + timedelta(days=int(d)) for d in rng.integers(0, 7000, n)]
+    demissao = [a + timedelta(days=int(d)) for a, d in zip(admissao, rng.integers(1, 4000, n))]
+    return pd.DataFrame({
+        "Nome": [f"Empregado {i}" for i in range(n)],
+        "Admissão": admissao, "Demissão": demissao,
+        "Salário": np.round(rng.uniform(1412, 25000, n), 2),
+        "Motivo": rng.choice(MOTIVOS_RESCISAO, n),
+        "Saldo FGTS": np.round(rng.uniform(0, 60000, n), 2),
+        "Férias Vencidas": rng.random(n) < 0.3,
+        "Aviso": rng.choice(TIPOS_AVISO, n),
+        "Insalubridade": rng.choice(list(GRAUS_INSALUBRIDADE), n),
+        "Periculosidade": rng.random(n) < 0.2,
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=20000)
+    parser.add_argument("--semente", type=int, default=7)
+    args = parser.parse_args()
+
+    df = empregados(args.linhas, np.random.default_rng(args.semente))
+    t0 = time.perf_counter()
+    lote = calcular_rescisoes_lote(df)
+    t_lote = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    individuais = []
+    for linha in df.to_dict("records"):
+        try: individuais.append(calcular_rescisao_clt(linha["Admissão"], linha["Demissão"], linha["Salário"], linha["Motivo"], linha["Saldo FGTS"],
+                                                      linha["Férias Vencidas"], linha["Aviso"], linha["Insalubridade"], linha["Periculosidade"]))
+        except ValueError: individuais.append(None)
+    t_individual = time.perf_counter() - t0
+
+    divergentes = 0
+    for (_, linha), esperado in zip(lote.iterrows(), individuais):
+        if esperado is None:
+            ok = bool(linha["Erro"])
+        else:
+            ok = not linha["Erro"] and verbas_da_linha(linha) == esperado and linha["Total"] == sum(esperado.values())
+        if not ok:
+            divergentes += 1
+            if divergentes <= 5: print("divergência:", linha[["Admissão", "Demissão", "Motivo", "Aviso"]].to_dict(), esperado, linha["Erro"])
+
+    print(f"{args.linhas} empregados | lote vetorizado: {t_lote:.3f}s | individual: {t_individual:.3f}s | {t_individual / t_lote:.0f}x")
+    print(f"linhas recusadas pelos dois: {sum(e is None for e in individuais)} | divergentes: {divergentes}")
+    sys.exit(1 if divergentes else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark de partida do app: importação do Streamlit, primeira renderização e troca de tela, sempre em processo novo.
+
+    python benchmarks/bench_startup.py --repeticoes 3
+    python benchmarks/bench_startup.py --telas Dashboard Calculos --max-ms 4000
+
+Cada repetição roda num processo limpo (imports frios), com o diretório de trabalho num temporário para não mexer no
+banco/cache do projeto: mede o `import streamlit`, a primeira execução do app.py (Dashboard) pelo AppTest, um rerun
+e a abertura de cada tela pedida, e anota quais módulos pesados já estavam carregados. Sai com erro se o Dashboard
+carregar um módulo que só as funções de IA/PDF/DOCX usam, ou se a primeira renderização passar de --max-ms.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(RAIZ, "app.py")
+MODULOS_PESADOS = ["google.generativeai", "pypdf", "docx", "reportlab", "pandas", "numpy"]
+PROIBIDOS_NO_DASHBOARD = ["google.generativeai", "pypdf", "docx", "reportlab"]
+TELAS = ["Investigador", "Petições Inteligentes", "Contratos", "Calculos", "Audiência", "Gestão Casos", "Admin"]
+
+def filho(telas):
+    """Roda dentro do processo medido; devolve os tempos (ms) e os módulos carregados em JSON na saída padrão."""
+    t0 = time.perf_counter()
+    import streamlit  # noqa: F401
+    from streamlit.testing.v1 import AppTest
+    resultado = {"import_streamlit": (time.perf_counter() - t0) * 1000}
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.secrets["GOOGLE_API_KEY"] = "benchmark"
+    t0 = time.perf_counter()
+    at.run()
+    resultado["primeira_renderizacao"] = (time.perf_counter() - t0) * 1000
+    resultado["modulos_dashboard"] = [m for m in MODULOS_PESADOS if m in sys.modules]
+    resultado["erros"] = [str(e.value) for e in at.exception]
+    t0 = time.perf_counter()
+    at.run()
+    resultado["rerun"] = (time.perf_counter() - t0) * 1000
+    for tela in telas:
+        t0 = time.perf_counter()
+        at.radio[0].set_value(tela).run()
+        resultado[f"tela:{tela}"] = (time.perf_counter() - t0) * 1000
+        resultado["erros"] += [str(e.value) for e in at.exception]
+    resultado["modulos_final"] = [m for m in MODULOS_PESADOS if m in sys.modules]
+    print(json.dumps(resultado))
+
+def medir(telas):
+    with tempfile.TemporaryDirectory() as pasta:
+        saida = subprocess.run([sys.executable, os.path.abspath(__file__), "--filho", *telas], cwd=pasta,
+                               capture_output=True, text=True, check=True)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--telas", nargs="*", default=TELAS)
+    parser.add_argument("--max-ms", type=float, default=None, help="limite da mediana da primeira renderização")
+    parser.add_argument("--filho", nargs="*", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.filho is not None: return filho(args.filho)
+
+    medicoes = [medir(args.telas) for _ in range(args.repeticoes)]
+    chaves = ["import_streamlit", "primeira_renderizacao", "rerun"] + [f"tela:{t}" for t in args.telas]
+    print(f"{'etapa':<32}{'mediana ms':>12}{'mín ms':>10}{'máx ms':>10}")
+    for chave in chaves:
+        valores = [m[chave] for m in medicoes]
+        print(f"{chave:<32}{statistics.median(valores):>12.0f}{min(valores):>10.0f}{max(valores):>10.0f}")
+    print("módulos pesados após o Dashboard:", ", ".join(medicoes[0]["modulos_dashboard"]) or "-")
+    print("módulos pesados após todas as telas:", ", ".join(medicoes[0]["modulos_final"]) or "-")
+
+    falhas = sorted({e for m in medicoes for e in m["erros"]})
+    indevidos = [m for m in PROIBIDOS_NO_DASHBOARD if m in medicoes[0]["modulos_dashboard"]]
+    if indevidos: falhas.append(f"Dashboard importou {', '.join(indevidos)}")
+    primeira = statistics.median(m["primeira_renderizacao"] for m in medicoes)
+    if args.max_ms is not None and primeira > args.max_ms: falhas.append(f"primeira renderização {primeira:.0f} ms > {args.max_ms:.0f} ms")
+    for falha in falhas: print("FALHA:", falha)
+    sys.exit(1 if falhas else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+"""Cálculos jurídicos: rescisão CLT (individual e em lote), atualização de débitos por séries oficiais de índices e
+dosimetria penal, vetorizados com numpy/pandas. Cada cálculo também sai como MemoriaCalculo (memorias.py).
+
+Módulo sem dependência do Streamlit, para ser usado pelo app.py e pelos benchmarks.
+"""
+import os
+import unicodedata
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from memorias import MemoriaCalculo
+
+SALARIO_MINIMO = 1509.00
+MOTIVOS_RESCISAO = ["Demissão sem Justa Causa", "Pedido de Demissão", "Justa Causa", "Acordo (Culpa Recíproca)"]
+TIPOS_AVISO = ["Indenizado", "Trabalhado"]
+GRAUS_INSALUBRIDADE = {"Não": 0.0, "Mínimo (10%)": 0.10, "Médio (20%)": 0.20, "Máximo (40%)": 0.40}
+
+def calcular_rescisao_clt(admissao, demissao, salario_base, motivo, saldo_fgts_banco, ferias_vencidas, aviso_tipo, grau_insalubridade, tem_periculosidade):
+    if isinstance(admissao, str): admissao = datetime.strptime(admissao, "%Y-%m-%d").date()
+    if isinstance(demissao, str): demissao = datetime.strptime(demissao, "%Y-%m-%d").date()
+
+    verbas = {}
+    salario_minimo = SALARIO_MINIMO
+    adic_insal = 0.0
+    if grau_insalubridade == "Mínimo (10%)": adic_insal = salario_minimo * 0.10
+    elif grau_insalubridade == "Médio (20%)": adic_insal = salario_minimo * 0.20
+    elif grau_insalubridade == "Máximo (40%)": adic_insal = salario_minimo * 0.40
+    adic_peric = salario_base * 0.30 if tem_periculosidade else 0.0
+    remuneracao = salario_base + adic_insal + adic_peric
+
+    if adic_insal > 0: verbas["(+) Adicional Insalubridade"] = adic_insal
+    if adic_peric > 0: verbas["(+) Adicional Periculosidade"] = adic_peric
+
+    tempo_casa = demissao - admissao
+    anos_completos = int(tempo_casa.days / 365.25)
+    dias_aviso = 30
+    if motivo == "Demissão sem Justa Causa":
+        dias_aviso = min(90, 30 + (3 * anos_completos))
+
+    data_projetada = demissao
+    if motivo == "Demissão sem Justa Causa" and aviso_tipo == "Indenizado":
+        data_projetada = demissao + timedelta(days=dias_aviso)
+        verbas[f"(+) Aviso Prévio Indenizado ({dias_aviso} dias)"] = (remuneracao / 30) * dias_aviso
+
+    dias_trabalhados = demissao.day
+    val_saldo_salario = (remuneracao / 30) * dias_trabalhados
+    verbas[f"(+) Saldo de Salário ({dias_trabalhados} dias)"] = val_saldo_salario
+
+    meses_13 = 0
+    curr = date(data_projetada.year, 1, 1)
+    while curr <= data_projetada:
+        if curr.month == data_projetada.month:
+            if data_projetada.day >= 15: months_to_add = 1
+            else: months_to_add = 0
+        else:
+            if curr >= admissao: months_to_add = 1
+            elif curr.month > admissao.month: months_to_add = 1
+            elif curr.month == admissao.month and admissao.day <= 15: months_to_add = 1
+            else: months_to_add = 0
+        if months_to_add: meses_13 += 1
+        if curr.month == 12: break
+        curr = curr.replace(month=curr.month+1)
+
+    if motivo != "Justa Causa": verbas[f"(+) 13º Salário Proporcional ({meses_13}/12)"] = (remuneracao / 12) * meses_13
+
+    if motivo != "Justa Causa":
+        if ferias_vencidas: verbas["(+) Férias Vencidas + 1/3"] = remuneracao * 1.3333
+        aniversario_ano = date(data_projetada.year, admissao.month, admissao.day)
+        if aniversario_ano > data_projetada: aniversario_ano = date(data_projetada.year - 1, admissao.month, admissao.day)
+        delta_ferias = (data_projetada.year - aniversario_ano.year) * 12 + (data_projetada.month - aniversario_ano.month)
+        if data_projetada.day >= 15: delta_ferias += 1
+        meses_ferias = min(12, delta_ferias)
+        val_ferias = (remuneracao / 12) * meses_ferias
+        verbas[f"(+) Férias Proporcionais ({meses_ferias}/12)"] = val_ferias
+        verbas["(+) 1/3 Sobre Férias Prop."] = val_ferias / 3
+
+    if motivo == "Demissão sem Justa Causa" or motivo == "Acordo (Culpa Recíproca)":
+        fgts_mes = val_saldo_salario * 0.08
+        fgts_13 = ((remuneracao / 12) * meses_13) * 0.08 if motivo != "Justa Causa" else 0
+        fgts_aviso = ((remuneracao / 30) * dias_aviso) * 0.08 if (motivo == "Demissão sem Justa Causa" and aviso_tipo == "Indenizado") else 0
+        base_total_fgts = saldo_fgts_banco + fgts_mes + fgts_13 + fgts_aviso
+        multa = 0.40 if motivo == "Demissão sem Justa Causa" else 0.20
+        verbas[f"(+) Multa FGTS {int(multa*100)}% (Base Est.: R$ {base_total_fgts:,.2f})"] = base_total_fgts * multa
+
+    return verbas
+
+# --- RESCISÃO EM LOTE ---
+# Colunas da planilha -> valor padrão (None = obrigatória); os padrões são os mesmos da tela individual
+COLUNAS_LOTE = {"Nome": "", "Admissão": None, "Demissão": None, "Salário": None, "Motivo": MOTIVOS_RESCISAO[0], "Saldo FGTS": 0.0,
+                "Férias Vencidas": False, "Aviso": TIPOS_AVISO[0], "Insalubridade": "Não", "Periculosidade": False}
+# Verbas na ordem do cálculo individual (a soma segue essa ordem para o total bater até o último centavo)
+VERBAS_LOTE = ["Adicional Insalubridade", "Adicional Periculosidade", "Aviso Prévio Indenizado", "Saldo de Salário", "13º Proporcional",
+               "Férias Vencidas + 1/3", "Férias Proporcionais", "1/3 Férias Prop.", "Multa FGTS"]
+_VERDADEIROS = {"1", "true", "sim", "s", "x", "yes", "verdadeiro"}
+_ALIASES_INSALUBRIDADE = {"minimo": "Mínimo (10%)", "10": "Mínimo (10%)", "medio": "Médio (20%)", "20": "Médio (20%)",
+                          "maximo": "Máximo (40%)", "40": "Máximo (40%)"}
+
+def _sem_acento(texto):
+    return unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii").strip().lower()
+
+def _coluna(df, nome):
+    padrao = COLUNAS_LOTE[nome]
+    if nome not in df.columns: return pd.Series([padrao] * len(df), index=df.index, dtype=object)
+    return df[nome].where(df[nome].notna(), padrao) if padrao is not None else df[nome]
+
+def _datas(serie):
+    """ISO (AAAA-MM-DD) ou brasileiro (DD/MM/AAAA) -> datetime64[D]; inválidas viram NaT."""
+    if pd.api.types.is_datetime64_any_dtype(serie): datas = serie
+    else:
+        datas = pd.to_datetime(serie, format="ISO8601", errors="coerce")
+        falhas = datas.isna() & serie.notna()
+        if falhas.any():
+            datas[falhas] = pd.to_datetime(serie[falhas].astype(str).str.strip().str[:10], format="%d/%m/%Y", errors="coerce")
+    return datas.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+
+def _numeros(serie):
+    """Aceita número ou texto no formato brasileiro ('2.500,00', 'R$ 1.200')."""
+    if pd.api.types.is_numeric_dtype(serie): return serie.astype(float).to_numpy()
+    texto = serie.astype(str).str.replace("R$", "", regex=False).str.strip()
+    brasileiro = texto.str.contains(",", regex=False)
+    texto = texto.where(~brasileiro, texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(texto, errors="coerce").to_numpy(dtype=float)
+
+def _booleanos(serie):
+    if pd.api.types.is_bool_dtype(serie): return serie.to_numpy()
+    return serie.map({v: v is True or _sem_acento(v) in _VERDADEIROS for v in serie.unique()}).to_numpy(dtype=bool)
+
+def _insalubridade(valor):
+    if valor in GRAUS_INSALUBRIDADE: return valor
+    texto = _sem_acento(valor).replace("%", "")
+    return next((grau for chave, grau in _ALIASES_INSALUBRIDADE.items() if chave in texto), "Não")
+
+def _partes(datas):
+    """(ano, mês, dia) de um array datetime64[D]."""
+    meses = datas.astype("datetime64[M]")
+    return datas.astype("datetime64[Y]").astype(np.int64) + 1970, meses.astype(np.int64) % 12 + 1, (datas - meses).astype(np.int64) + 1
+
+def calcular_rescisoes_lote(df):
+    """Versão vetorizada de calcular_rescisao_clt para uma planilha de empregados, com os mesmos valores linha a linha.
+
+    Colunas: Admissão, Demissão, Salário e, opcionais, as demais de COLUNAS_LOTE. Devolve as colunas de entrada
+    normalizadas, uma coluna por verba (NaN quando a verba não se aplica), os dias/meses usados, o total e 'Erro'."""
+    faltando = [nome for nome, padrao in COLUNAS_LOTE.items() if padrao is None and nome not in df.columns]
+    if faltando: raise ValueError(f"Planilha sem a(s) coluna(s) obrigatória(s): {', '.join(faltando)}")
+    entrada = pd.DataFrame({nome: _coluna(df, nome) for nome in COLUNAS_LOTE}, index=df.index)
+
+    admissao, demissao = _datas(entrada["Admissão"]), _datas(entrada["Demissão"])
+    salario, saldo_fgts = _numeros(entrada["Salário"]), _numeros(entrada["Saldo FGTS"])
+    motivo = entrada["Motivo"].astype(str).str.strip().to_numpy()
+    aviso = entrada["Aviso"].astype(str).str.strip().to_numpy()
+    insalubridade = entrada["Insalubridade"].map({v: _insalubridade(v) for v in entrada["Insalubridade"].unique()})
+    ferias_vencidas, periculosidade = _booleanos(entrada["Férias Vencidas"]), _booleanos(entrada["Periculosidade"])
+
+    sem_justa = motivo == "Demissão sem Justa Causa"
+    justa = motivo == "Justa Causa"
+    indenizado = sem_justa & (aviso == "Indenizado")
+    com_multa = sem_justa | (motivo == "Acordo (Culpa Recíproca)")
+
+    adic_insal = SALARIO_MINIMO * insalubridade.map(GRAUS_INSALUBRIDADE).to_numpy(dtype=float)
+    adic_peric = np.where(periculosidade, salario * 0.30, 0.0)
+    remuneracao = salario + adic_insal + adic_peric
+
+    anos_completos = np.trunc((demissao - admissao).astype(np.int64) / 365.25).astype(np.int64)
+    dias_aviso = np.where(sem_justa, np.minimum(90, 30 + 3 * anos_completos), 30)
+    projetada = demissao + np.where(indenizado, dias_aviso, 0).astype("timedelta64[D]")
+    ano_a, mes_a, dia_a = _partes(admissao)
+    ano_p, mes_p, dia_p = _partes(projetada)
+    dias_trabalhados = _partes(demissao)[2]
+
+    # 13º: meses do ano da data projetada anteriores a ela (todos, se admitido antes desse ano; senão os posteriores ao
+    # mês de admissão, mais esse mês se admitido até o dia 15) e o mês da projeção se ela cai a partir do dia 15
+    meses_13 = np.where(ano_a < ano_p, mes_p - 1, np.maximum(0, mes_p - 1 - mes_a) + ((mes_a <= mes_p - 1) & (dia_a <= 15))) + (dia_p >= 15)
+    # férias: meses desde o último aniversário de admissão (limite de 12)
+    aniversario_passou = (mes_a < mes_p) | ((mes_a == mes_p) & (dia_a <= dia_p))
+    meses_ferias = np.minimum(12, np.where(aniversario_passou, mes_p - mes_a, 12 + mes_p - mes_a) + (dia_p >= 15))
+
+    saldo_salario = (remuneracao / 30) * dias_trabalhados
+    decimo = (remuneracao / 12) * meses_13
+    val_ferias = (remuneracao / 12) * meses_ferias
+    base_fgts = saldo_fgts + saldo_salario * 0.08 + decimo * 0.08 + np.where(indenizado, ((remuneracao / 30) * dias_aviso) * 0.08, 0)
+    nan = np.nan
+    verbas = {
+        "Adicional Insalubridade": np.where(adic_insal > 0, adic_insal, nan),
+        "Adicional Periculosidade": np.where(adic_peric > 0, adic_peric, nan),
+        "Aviso Prévio Indenizado": np.where(indenizado, (remuneracao / 30) * dias_aviso, nan),
+        "Saldo de Salário": saldo_salario,
+        "13º Proporcional": np.where(justa, nan, decimo),
+        "Férias Vencidas + 1/3": np.where(~justa & ferias_vencidas, remuneracao * 1.3333, nan),
+        "Férias Proporcionais": np.where(justa, nan, val_ferias),
+        "1/3 Férias Prop.": np.where(justa, nan, val_ferias / 3),
+        "Multa FGTS": np.where(com_multa, base_fgts * np.where(sem_justa, 0.40, 0.20), nan),
+    }
+    total = np.zeros(len(entrada))
+    for nome in VERBAS_LOTE: total = total + np.nan_to_num(verbas[nome])
+
+    # Linhas que o cálculo individual recusaria: datas/salário inválidos, demissão não posterior e 29/02 sem aniversário no ano
+    erro = np.full(len(entrada), "", dtype=object)
+    fevereiro_29 = (mes_a == 2) & (dia_a == 29) & ~justa
+    bissexto = (ano_p % 4 == 0) & ((ano_p % 100 != 0) | (ano_p % 400 == 0))
+    erro[fevereiro_29 & (~bissexto | ~aniversario_passou)] = "Admissão em 29/02 sem aniversário no ano da rescisão"
+    erro[~(demissao > admissao)] = "Demissão deve ser posterior à admissão"
+    erro[np.isnan(salario)] = "Salário inválido"
+    erro[np.isnan(saldo_fgts)] = "Saldo FGTS inválido"
+    erro[np.isnat(admissao) | np.isnat(demissao)] = "Data inválida"
+    invalida = erro != ""
+
+    resultado = entrada.assign(**{"Admissão": admissao, "Demissão": demissao, "Salário": salario, "Saldo FGTS": saldo_fgts,
+                                  "Insalubridade": insalubridade.to_numpy(), "Férias Vencidas": ferias_vencidas, "Periculosidade": periculosidade})
+    resultado["Remuneração"] = remuneracao
+    resultado["Dias de Aviso"] = np.where(indenizado, dias_aviso, 0)
+    resultado["Dias Trabalhados"] = dias_trabalhados
+    resultado["Meses 13º"] = np.where(justa, 0, meses_13)
+    resultado["Meses Férias"] = np.where(justa, 0, meses_ferias)
+    resultado["Base FGTS"] = np.where(com_multa, base_fgts, nan)
+    for nome in VERBAS_LOTE: resultado[nome] = verbas[nome]
+    resultado["Total"] = total
+    numericas = ["Remuneração", "Base FGTS", "Total"] + VERBAS_LOTE
+    resultado.loc[invalida, numericas] = nan
+    resultado.loc[invalida, ["Dias de Aviso", "Dias Trabalhados", "Meses 13º", "Meses Férias"]] = 0
+    resultado["Erro"] = erro
+    return resultado
+
+def verbas_da_linha(linha):
+    """Uma linha do lote no formato do cálculo individual ({rótulo: valor}), para detalhar o empregado."""
+    rotulos = {"Adicional Insalubridade": "(+) Adicional Insalubridade", "Adicional Periculosidade": "(+) Adicional Periculosidade",
+               "Aviso Prévio Indenizado": f"(+) Aviso Prévio Indenizado ({linha['Dias de Aviso']} dias)",
+               "Saldo de Salário": f"(+) Saldo de Salário ({linha['Dias Trabalhados']} dias)",
+               "13º Proporcional": f"(+) 13º Salário Proporcional ({linha['Meses 13º']}/12)",
+               "Férias Vencidas + 1/3": "(+) Férias Vencidas + 1/3",
+               "Férias Proporcionais": f"(+) Férias Proporcionais ({linha['Meses Férias']}/12)",
+               "1/3 Férias Prop.": "(+) 1/3 Sobre Férias Prop.",
+               "Multa FGTS": f"(+) Multa FGTS {40 if linha['Motivo'] == 'Demissão sem Justa Causa' else 20}% (Base Est.: R$ {linha['Base FGTS']:,.2f})"}
+    return {rotulos[nome]: float(linha[nome]) for nome in VERBAS_LOTE if not pd.isna(linha[nome])}
+
+# --- CORREÇÃO MONETÁRIA E JUROS ---
+# Arquivo (sem extensão) -> nome da série e código no SGS do Banco Central (variação mensal em %)
+SERIES_SGS = {"ipca_e": ("IPCA-E", 10764), "inpc": ("INPC", 188), "ipca": ("IPCA", 433), "selic": ("Selic", 4390), "tr": ("TR", 7811)}
+JUROS_MORA = {"1% a.m. (simples, pro rata die)": 0.01, "0.5% a.m. (simples, pro rata die)": 0.005, "Selic a partir dos juros (substitui correção e juros)": None,
+              "Sem juros": 0.0}
+
+class SerieIndice:
+    """Série mensal contínua de variações (%) com o fator acumulado e a soma acumulada pré-calculados.
+
+    acumulado[k] é o produto das variações dos k primeiros meses: corrigir do mês i ao mês j é acumulado[j] / acumulado[i]
+    (uma divisão, para qualquer par de datas), e a soma simples de taxas (Selic da Receita) é soma[j] - soma[i]."""
+
+    def __init__(self, nome, meses, variacoes):
+        meses = np.asarray(meses, dtype="datetime64[M]")
+        ordem = np.argsort(meses)
+        meses, variacoes = meses[ordem], np.asarray(variacoes, dtype=float)[ordem]
+        if len(meses) == 0: raise ValueError(f"Série {nome} vazia")
+        buracos = np.flatnonzero(np.diff(meses).astype(np.int64) != 1)
+        if len(buracos): raise ValueError(f"Série {nome} com meses faltando ou repetidos depois de {meses[buracos[0]]}")
+        self.nome = nome
+        self.primeiro_mes, self.ultimo_mes = meses[0], meses[-1]
+        self.acumulado = np.concatenate([[1.0], np.cumprod(1 + variacoes / 100)])
+        self.soma = np.concatenate([[0.0], np.cumsum(variacoes)])
+
+    def _indices(self, meses):
+        """Índice no acumulado do início de cada mês (NaN-safe: fora da série vira -1)."""
+        k = (np.asarray(meses, dtype="datetime64[M]") - self.primeiro_mes).astype(np.int64)
+        return np.where((k >= 0) & (k < len(self.acumulado)), k, -1)
+
+    def fator(self, de, ate):
+        """Vetorizado: fator de correção pelas variações dos meses de `de` (inclusive) até `ate` (exclusive). NaN fora da série."""
+        i, j = self._indices(de), self._indices(ate)
+        return np.where((i >= 0) & (j >= 0), self.acumulado[j] / self.acumulado[np.maximum(i, 0)], np.nan)
+
+    def soma_taxas(self, de, ate):
+        """Vetorizado: soma simples das variações (%) dos meses de `de` (inclusive) até `ate` (exclusive). NaN fora da série."""
+        i, j = self._indices(de), self._indices(ate)
+        return np.where((i >= 0) & (j >= 0), self.soma[j] - self.soma[np.maximum(i, 0)], np.nan)
+
+def ler_serie_sgs(caminho_ou_arquivo, nome):
+    """CSV no formato do SGS/BCB ('data;valor', data DD/MM/AAAA, valor em % com vírgula)."""
+    tabela = pd.read_csv(caminho_ou_arquivo, sep=";", dtype=str)
+    tabela.columns = [c.strip().strip('"').lower() for c in tabela.columns]
+    meses = pd.to_datetime(tabela["data"].str.strip(), format="%d/%m/%Y").to_numpy(dtype="datetime64[M]")
+    return SerieIndice(nome, meses, _numeros(tabela["valor"]))
+
+def carregar_series(pasta):
+    """{nome: SerieIndice} de todos os CSVs da pasta com nome conhecido em SERIES_SGS (ex.: indices/ipca_e.csv)."""
+    series = {}
+    if not os.path.isdir(pasta): return series
+    for arquivo in sorted(os.listdir(pasta)):
+        base, extensao = os.path.splitext(arquivo)
+        if extensao.lower() == ".csv" and base.lower() in SERIES_SGS:
+            nome = SERIES_SGS[base.lower()][0]
+            series[nome] = ler_serie_sgs(os.path.join(pasta, arquivo), nome)
+    return series
+
+def meses_pro_rata(de, ate):
+    """Vetorizado: meses entre as datas contando os meses cheios e a fração de dias restante sobre 30 (pro rata die)."""
+    de, ate = np.asarray(de, dtype="datetime64[D]"), np.asarray(ate, dtype="datetime64[D]")
+    ano_d, mes_d, dia_d = _partes(de)
+    ano_a, mes_a, dia_a = _partes(ate)
+    cheios = (ano_a * 12 + mes_a) - (ano_d * 12 + mes_d) - (dia_a < dia_d)
+    # mesmo dia do mês `cheios` meses depois (limitado ao fim do mês, ex.: 31/01 + 1 mês = 28/02)
+    mes_ancora = de.astype("datetime64[M]") + cheios.astype("timedelta64[M]")
+    fim_mes = (mes_ancora + 1).astype("datetime64[D]") - 1
+    ancora = np.minimum(mes_ancora.astype("datetime64[D]") + (dia_d - 1).astype("timedelta64[D]"), fim_mes)
+    return cheios + (ate - ancora).astype(np.int64) / 30
+
+def atualizar_debitos(df, data_atualizacao, series, indice, juros, multa_pct=0.0):
+    """Atualiza vários débitos de uma vez: correção pelo `indice` (fator O(1) por débito) e juros de mora.
+
+    df: colunas 'Valor', 'Data' (vencimento/evento) e, opcional, 'Início Juros' (ex.: citação; padrão = 'Data').
+    juros: chave de JUROS_MORA. Com Selic, o `indice` corrige de 'Data' até 'Início Juros' e daí em diante a Selic
+    acumulada substitui correção e juros (EC 113/21, art. 3º).
+    Devolve df com 'Fator Correção', 'Valor Corrigido', 'Juros', 'Multa', 'Total' e 'Erro'."""
+    valores = _numeros(df["Valor"])
+    datas = _datas(df["Data"])
+    inicio_juros = _datas(df["Início Juros"]) if "Início Juros" in df.columns else datas
+    inicio_juros = np.where(np.isnat(inicio_juros), datas, inicio_juros)
+    fim = np.full(len(df), np.datetime64(data_atualizacao, "D"))
+    taxa = JUROS_MORA[juros]
+    if taxa is None:
+        corte = np.minimum(np.maximum(inicio_juros, datas), fim)
+        fator = series[indice].fator(datas, corte) if indice in series else np.ones(len(df))
+        taxa_juros = series["Selic"].fator(corte, fim) - 1 if "Selic" in series else np.full(len(df), np.nan)
+    else:
+        fator = series[indice].fator(datas, fim) if indice in series else np.ones(len(df))
+        taxa_juros = taxa * np.maximum(0, meses_pro_rata(inicio_juros, fim))
+    corrigido = valores * fator
+    juros_val = corrigido * taxa_juros
+    multa = corrigido * (multa_pct / 100)
+    erro = np.full(len(df), "", dtype=object)
+    erro[np.isnan(fator) | np.isnan(taxa_juros)] = "Período fora das séries carregadas"
+    erro[datas > fim] = "Data posterior à atualização"
+    erro[np.isnan(valores)] = "Valor inválido"
+    erro[np.isnat(datas)] = "Data inválida"
+    resultado = df.copy()
+    resultado["Valor"] = valores
+    resultado["Fator Correção"], resultado["Valor Corrigido"], resultado["Juros"], resultado["Multa"] = fator, corrigido, juros_val, multa
+    resultado["Total"] = corrigido + juros_val + multa
+    resultado.loc[erro != "", ["Fator Correção", "Valor Corrigido", "Juros", "Multa", "Total"]] = np.nan
+    resultado["Erro"] = erro
+    return resultado
+
+def debito_federal(principal, vencimento, pagamento, selic):
+    """Débito com a União (Lei 9.430/96, art. 61): multa de 0,33% ao dia de atraso limitada a 20% e juros pela soma da
+    Selic mensal do mês seguinte ao vencimento até o anterior ao pagamento, mais 1% no mês do pagamento.
+    Vetorizado; devolve (multa, juros, total)."""
+    principal = np.asarray(principal, dtype=float)
+    vencimento, pagamento = np.asarray(vencimento, dtype="datetime64[D]"), np.asarray(pagamento, dtype="datetime64[D]")
+    atraso = np.maximum(0, (pagamento - vencimento).astype(np.int64))
+    multa = principal * np.minimum(0.0033 * atraso, 0.20)
+    mes_venc, mes_pag = vencimento.astype("datetime64[M]"), pagamento.astype("datetime64[M]")
+    taxa = np.where(mes_pag > mes_venc, selic.soma_taxas(mes_venc + 1, mes_pag) + 1.0, 0.0)
+    juros = principal * taxa / 100
+    return multa, juros, principal + multa + juros
+
+# --- DOSIMETRIA PENAL ---
+PROGRESSAO_REGIME = {"Comum (16%)": 0.16, "Violento (25%)": 0.25, "Hediondo (40%)": 0.40}
+
+def pena_base(pena_minima, pena_maxima, circunstancias):
+    """CP art. 59: cada circunstância judicial desfavorável (de 8) acrescenta 1/8 do intervalo da pena."""
+    return pena_minima + ((pena_maxima - pena_minima) / 8) * circunstancias
+
+# --- MEMÓRIAS DE CÁLCULO ---
+def _data_br(valor):
+    return pd.Timestamp(valor).strftime("%d/%m/%Y")
+
+def _fundamentacao_rescisao(motivo, insalubridade, periculosidade, indenizado):
+    textos = []
+    if insalubridade not in (None, "Não"): textos.append("Adicional de insalubridade sobre o salário mínimo (CLT, art. 192).")
+    if periculosidade: textos.append("Adicional de periculosidade de 30% sobre o salário base (CLT, art. 193, §1º).")
+    if indenizado: textos.append("Aviso prévio proporcional: 30 dias + 3 por ano completo, até 90 (Lei 12.506/11); projeta o contrato (CLT, art. 487, §1º).")
+    textos.append("Saldo de salário: remuneração / 30 por dia trabalhado no mês da rescisão.")
+    if motivo != "Justa Causa":
+        textos.append("13º proporcional: 1/12 por mês com 15 dias ou mais de serviço no ano (Lei 4.090/62).")
+        textos.append("Férias proporcionais acrescidas de 1/3 (CLT, art. 146; CF, art. 7º, XVII).")
+    if motivo == "Demissão sem Justa Causa": textos.append("Multa de 40% sobre o FGTS (Lei 8.036/90, art. 18, §1º).")
+    elif motivo == "Acordo (Culpa Recíproca)": textos.append("Multa de 20% sobre o FGTS (Lei 8.036/90, art. 18, §2º).")
+    return textos
+
+def memoria_rescisao(admissao, demissao, salario_base, motivo, saldo_fgts_banco, ferias_vencidas, aviso_tipo, grau_insalubridade,
+                     tem_periculosidade, nome="", verbas=None):
+    """MemoriaCalculo da rescisão (reaproveita `verbas` já calculadas, ex.: uma linha do lote)."""
+    if verbas is None:
+        verbas = calcular_rescisao_clt(admissao, demissao, salario_base, motivo, saldo_fgts_banco, ferias_vencidas, aviso_tipo,
+                                       grau_insalubridade, tem_periculosidade)
+    entradas = ([("Empregado", nome)] if nome else []) + [
+        ("Admissão", _data_br(admissao)), ("Demissão", _data_br(demissao)), ("Salário base", f"R$ {salario_base:,.2f}"),
+        ("Motivo", motivo), ("Aviso prévio", aviso_tipo), ("Saldo FGTS informado", f"R$ {saldo_fgts_banco:,.2f}"),
+        ("Férias vencidas", "Sim" if ferias_vencidas else "Não"), ("Insalubridade", grau_insalubridade),
+        ("Periculosidade", "Sim" if tem_periculosidade else "Não")]
+    indenizado = motivo == "Demissão sem Justa Causa" and aviso_tipo == "Indenizado"
+    return MemoriaCalculo(f"Rescisão CLT{' - ' + nome if nome else ''}", entradas, list(verbas.items()), sum(verbas.values()),
+                          _fundamentacao_rescisao(motivo, grau_insalubridade, tem_periculosidade, indenizado))
+
+def memorias_rescisao_lote(resultado):
+    """Uma MemoriaCalculo por linha válida do resultado de calcular_rescisoes_lote."""
+    for _, linha in resultado[resultado["Erro"] == ""].iterrows():
+        yield memoria_rescisao(linha["Admissão"], linha["Demissão"], linha["Salário"], linha["Motivo"], linha["Saldo FGTS"],
+                               bool(linha["Férias Vencidas"]), linha["Aviso"], linha["Insalubridade"], bool(linha["Periculosidade"]),
+                               nome=str(linha["Nome"] or ""), verbas=verbas_da_linha(linha))
+
+def memoria_debito(linha, data_atualizacao, indice, juros, multa_pct=0.0):
+    """MemoriaCalculo de uma linha de atualizar_debitos."""
+    selic = JUROS_MORA[juros] is None
+    descricao = "" if pd.isna(linha.get("Descrição")) else str(linha.get("Descrição"))
+    entradas = ([("Descrição", descricao)] if descricao else []) + [
+        ("Valor original", f"R$ {linha['Valor']:,.2f}"), ("Data do evento / vencimento", _data_br(linha["Data"])),
+        ("Juros desde", _data_br(linha["Início Juros"]) if not pd.isna(linha.get("Início Juros")) else _data_br(linha["Data"])),
+        ("Atualizado até", _data_br(data_atualizacao)), ("Correção", f"{indice} até os juros; depois Selic (inclui juros)" if selic else indice),
+        ("Juros de mora", juros), ("Multa", f"{multa_pct:.2f}%")]
+    itens = [("Valor original", linha["Valor"])]
+    itens.append((f"Correção monetária ({indice}, fator {linha['Fator Correção']:.6f})", linha["Valor Corrigido"] - linha["Valor"]))
+    itens += [("Juros de mora (Selic)" if selic else "Juros de mora", linha["Juros"]), (f"Multa ({multa_pct:.2f}%)", linha["Multa"])]
+    fundamentacao = ([f"Correção pelo {indice} do mês do evento ao anterior ao início dos juros.",
+                      "A partir do início dos juros, Selic acumulada como índice único de correção e juros (EC 113/21, art. 3º)."] if selic else
+                     [f"Correção pelo {indice}: produto das variações mensais do mês do evento ao anterior à atualização.",
+                      "Juros simples de mora contados pro rata die (meses cheios + dias/30) desde a data indicada (CC, arts. 405 e 406)."])
+    return MemoriaCalculo(f"Atualização de Débito{' - ' + descricao if descricao else ''}", entradas, itens, linha["Total"], fundamentacao)
+
+def memoria_debito_federal(principal, vencimento, pagamento, multa, juros, total):
+    entradas = [("Principal", f"R$ {principal:,.2f}"), ("Vencimento", _data_br(vencimento)), ("Pagamento", _data_br(pagamento))]
+    itens = [("Principal", principal), ("Multa de mora (0,33% ao dia, limite 20%)", multa), ("Juros (Selic acumulada + 1% no mês do pagamento)", juros)]
+    return MemoriaCalculo("Débito Fiscal Federal", entradas, itens, total,
+                          ["Multa de mora: Lei 9.430/96, art. 61, caput e §2º.", "Juros de mora: Lei 9.430/96, art. 61, §3º, c/c art. 5º, §3º."])
+
+def memoria_pena_base(pena_minima, pena_maxima, circunstancias):
+    acrescimo = ((pena_maxima - pena_minima) / 8) * circunstancias
+    return MemoriaCalculo("Dosimetria - Pena Base", [("Pena mínima", f"{pena_minima:.2f} anos"), ("Pena máxima", f"{pena_maxima:.2f} anos"),
+                                                    ("Circunstâncias desfavoráveis", f"{circunstancias} de 8")],
+                          [("Pena mínima cominada", pena_minima), (f"Acréscimo: {circunstancias} × (máx. − mín.) / 8", acrescimo)],
+                          pena_base(pena_minima, pena_maxima, circunstancias),
+                          ["Primeira fase (CP, art. 68): pena base fixada pelas circunstâncias judiciais do art. 59 do CP."],
+                          unidade="anos", rotulo_total="PENA BASE")
+
+def memoria_progressao(pena_total, tipo_crime):
+    fracao = PROGRESSAO_REGIME[tipo_crime]
+    return MemoriaCalculo("Execução - Progressão de Regime", [("Pena total", f"{pena_total:.2f} anos"), ("Tipo", tipo_crime)],
+                          [("Pena total", pena_total), ("Fração exigida", f"{fracao:.0%}")], pena_total * fracao,
+                          ["Lei de Execução Penal, art. 112 (redação da Lei 13.964/19)."], unidade="anos", rotulo_total="TEMPO PARA PROGRESSÃO")
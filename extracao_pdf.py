@@ -0,0 +1,32 @@
+"""Extração de texto de PDF que roda nos processos do pool do app.py.
+
+Fica fora do app.py porque os processos do pool são criados por 'forkserver'/'spawn' e importam a função pelo módulo:
+o app.py roda como __main__ do Streamlit e não pode ser importado por eles. Módulo sem dependência do Streamlit.
+
+O PDF chega aos processos como caminho de arquivo (gravado uma vez pelo app), não como bytes a cada faixa de páginas,
+e cada processo guarda os últimos leitores abertos: as faixas seguintes do mesmo arquivo não refazem o parse.
+"""
+from collections import OrderedDict
+
+LEITORES_ABERTOS = 4  # PdfReader mantidos por processo do pool
+
+_leitores = OrderedDict()
+
+def _leitor(caminho, chave):
+    from pypdf import PdfReader
+    if chave in _leitores:
+        _leitores.move_to_end(chave)
+        return _leitores[chave]
+    leitor = _leitores[chave] = PdfReader(caminho)
+    while len(_leitores) > LEITORES_ABERTOS: _leitores.popitem(last=False)
+    return leitor
+
+def extrair_faixa_pdf(caminho, chave, inicio, fim):
+    """Extrai as páginas [inicio, fim) do PDF em `caminho` (`chave` = hash do conteúdo). Página com erro vem como None."""
+    try: paginas = _leitor(caminho, chave).pages
+    except Exception: return [None] * (fim - inicio)
+    textos = []
+    for i in range(inicio, fim):
+        try: textos.append(paginas[i].extract_text() or "")
+        except Exception: textos.append(None)
+    return textos
@@ -0,0 +1,47 @@
+"""Baixa as séries mensais de índices do SGS (Banco Central) para a pasta lida pelo app.
+
+    python ferramentas/baixar_indices.py                   # todas as séries de calculos.SERIES_SGS
+    python ferramentas/baixar_indices.py ipca_e selic --desde 01/01/2010 --pasta indices
+
+Cada série vira <pasta>/<arquivo>.csv no formato do próprio SGS ('data;valor'). O arquivo só é trocado depois de
+validado (meses contínuos), então uma falha no download não apaga a série anterior.
+"""
+import argparse
+import os
+import sys
+from io import BytesIO
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calculos import SERIES_SGS, ler_serie_sgs  # noqa: E402
+
+URL_SGS = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.{codigo}/dados"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("series", nargs="*", default=list(SERIES_SGS), choices=list(SERIES_SGS))
+    parser.add_argument("--pasta", default=os.environ.get("INDICES_DIR", "indices"))
+    parser.add_argument("--desde", default="01/01/2000", help="DD/MM/AAAA")
+    args = parser.parse_args()
+
+    os.makedirs(args.pasta, exist_ok=True)
+    falhas = 0
+    for arquivo in args.series:
+        nome, codigo = SERIES_SGS[arquivo]
+        try:
+            resposta = requests.get(URL_SGS.format(codigo=codigo), params={"formato": "csv", "dataInicial": args.desde}, timeout=60)
+            resposta.raise_for_status()
+            serie = ler_serie_sgs(BytesIO(resposta.content), nome)
+        except Exception as e:
+            falhas += 1
+            print(f"{nome} (SGS {codigo}): falhou - {e}")
+            continue
+        destino = os.path.join(args.pasta, f"{arquivo}.csv")
+        with open(destino + ".tmp", "wb") as f: f.write(resposta.content)
+        os.replace(destino + ".tmp", destino)
+        print(f"{nome} (SGS {codigo}): {serie.primeiro_mes} a {serie.ultimo_mes} -> {destino}")
+    sys.exit(1 if falhas else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Importa dumps de ementas (STF/STJ/TST em JSONL ou CSV, opcionalmente .gz) para a base local de jurisprudência.
+
+    python ferramentas/importar_jurisprudencia.py stj_2024.jsonl.gz --tribunal STJ
+    python ferramentas/importar_jurisprudencia.py tst/*.csv --tribunal TST --area trabalhista --base jurisprudencia.sqlite
+
+Os campos são reconhecidos pelos nomes usuais dos dumps (ementa/texto_ementa, tribunal/sigla_tribunal, ...);
+--tribunal e --area só preenchem o que o arquivo não trouxer. Decisões já importadas são ignoradas, então dá para
+rodar de novo sobre o mesmo dump. No fim o índice é otimizado (segmentos fundidos) para as consultas.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from jurisprudencia import AREAS, BaseJurisprudencia, registros  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("arquivos", nargs="+")
+    parser.add_argument("--tribunal", help="tribunal das decisões sem o campo (STF, STJ, TST...)")
+    parser.add_argument("--area", choices=list(AREAS), help="área das decisões sem o campo")
+    parser.add_argument("--base", default=os.environ.get("JURISPRUDENCIA_DB", "jurisprudencia.sqlite"))
+    args = parser.parse_args()
+
+    base = BaseJurisprudencia(args.base)
+    t0 = time.time()
+    total = 0
+    for arquivo in args.arquivos:
+        try:
+            inseridas, ignoradas = base.importar(registros(arquivo), args.tribunal, args.area,
+                                                 ao_progredir=lambda n, i: print(f"\r{arquivo}: {n} importadas, {i} ignoradas", end="", flush=True))
+        except Exception as e:
+            print(f"\n{arquivo}: falhou - {e}")
+            continue
+        total += inseridas
+        print(f"\r{arquivo}: {inseridas} importadas, {ignoradas} ignoradas")
+    print("otimizando o índice...")
+    base.otimizar()
+    print(f"{total} decisões novas em {time.time() - t0:.0f}s; a base tem {base.total()}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Servidor HTTP falso de andamentos processuais, para testar a sincronização sem acessar tribunais.
+
+    python ferramentas/tribunal_fake.py --porta 8765 --intervalo 60
+    TRIBUNAIS_URL=http://localhost:8765 streamlit run app.py
+
+Cada processo nasce com 3 movimentações e ganha uma nova a cada `--intervalo` segundos.
+Rota: GET /processos/<numero>/movimentacoes?tribunal=XX[&desde=AAAA-MM-DD HH:MM:SS]
+      -> [{"data": "...", "descricao": "..."}] (com `desde`, só os eventos posteriores)
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+INICIO = time.time()
+HISTORICO_INICIAL = 3
+INTERVALO = 60.0
+ATRASO = 0.0
+
+def movimentacoes(numero, tribunal, desde=None):
+    decorridos = int((time.time() - INICIO) // INTERVALO)
+    eventos = []
+    for k in range(HISTORICO_INICIAL + decorridos):
+        quando = datetime.fromtimestamp(INICIO + (k - HISTORICO_INICIAL + 1) * INTERVALO)
+        eventos.append({"data": quando.strftime("%Y-%m-%d %H:%M:%S"),
+                        "descricao": f"{quando.strftime('%d/%m')} - Movimentação #{k + 1} ({tribunal or '-'}) no processo {numero}"})
+    return [e for e in eventos if not desde or e["data"] > desde]
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        partes = url.path.strip("/").split("/")
+        if len(partes) != 3 or partes[0] != "processos" or partes[2] != "movimentacoes":
+            self.send_error(404)
+            return
+        if ATRASO: time.sleep(ATRASO)
+        query = parse_qs(url.query)
+        eventos = movimentacoes(partes[1], query.get("tribunal", [""])[0], query.get("desde", [None])[0])
+        corpo = json.dumps(eventos, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args): pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--intervalo", type=float, default=60.0, help="segundos entre movimentações novas")
+    parser.add_argument("--atraso", type=float, default=0.0, help="latência artificial por requisição (s)")
+    args = parser.parse_args()
+    INTERVALO, ATRASO = args.intervalo, args.atraso
+    print(f"Tribunal falso em http://localhost:{args.porta}")
+    ThreadingHTTPServer(("", args.porta), Handler).serve_forever()
@@ -0,0 +1,274 @@
+"""Jurisprudência local: ementas de STF/STJ/TST (dumps JSONL/CSV) num índice invertido FTS5 em disco, com ranking bm25,
+filtro por tribunal e área e cache de resultados.
+
+Módulo sem dependência do Streamlit. O texto das ementas fica comprimido (zlib) numa tabela comum e o índice FTS5 é
+'sem conteúdo' (só postings), então nada é gravado duas vezes. A consulta não usa o texto inteiro: dos termos pedidos
+ficam os mais discriminantes (frequência de documento mantida na importação), dentro de um orçamento de postings e de
+linhas pontuadas, o que mantém o top-k em dezenas de milissegundos mesmo com milhões de decisões.
+"""
+import csv
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+import zlib
+from collections import Counter, OrderedDict, namedtuple
+
+Decisao = namedtuple("Decisao", "id tribunal area classe numero relator data ementa score")
+
+# Nome do campo no dump -> campo da base (o primeiro que existir no registro vale)
+CAMPOS = {"tribunal": ("tribunal", "sigla_tribunal", "orgao"), "area": ("area", "ramo", "ramo_direito", "materia"),
+          "classe": ("classe", "classe_processual", "sigla_classe", "tipo"), "numero": ("numero", "processo", "numero_processo", "registro"),
+          "relator": ("relator", "relatora", "ministro_relator", "ministro"), "data": ("data_julgamento", "julgamento", "data", "data_publicacao"),
+          "ementa": ("ementa", "texto_ementa", "texto", "conteudo")}
+# Ramo (área da tela) -> termos que o identificam na coluna 'area' do dump
+AREAS = {"civel": ("civel", "civil", "consumidor", "familia", "processual"), "trabalhista": ("trabalhista", "trabalho"),
+         "criminal": ("criminal", "penal"), "tributario": ("tributario", "fiscal"), "previdenciario": ("previdenciario",)}
+STOPWORDS = set("""a o as os um uma uns umas de da do das dos em na no nas nos por pela pelo pelas pelos para com sem e ou que
+se ao aos as sua seu suas seus lhe como mais mas nao ja este esta isso isto esse essa ele ela eles elas art lei sobre entre
+quando ser sao foi pois tal""".split())
+
+MAX_TERMOS_CONSULTA = 8         # termos mais discriminantes que entram no MATCH
+MAX_POSTINGS = 200_000          # soma das frequências dos termos da consulta: o bm25 do FTS5 percorre a lista inteira de
+                                # cada termo para o idf (~4 ms por 100 mil), então é isso, e não o tamanho da base, que pesa
+MAX_LINHAS_OU = 10_000          # no OU de reserva o bm25 pontua toda linha casada (~2,5 µs cada): só entram termos até aqui
+FRACAO_TERMO_COMUM = 0.2        # termo presente em mais de 20% das decisões não discrimina
+MAX_CHARS_CONSULTA = 20_000     # textos longos (fatos + anexos) só contribuem com o começo
+TAMANHO_LOTE = 5_000
+
+def normalizar(texto):
+    """Minúsculas e sem acentos, como o tokenizador unicode61 (remove_diacritics 2) do índice."""
+    texto = unicodedata.normalize("NFKD", str(texto).lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def termos(texto):
+    return [t for t in re.findall(r"\w+", normalizar(texto)) if len(t) > 2 and t not in STOPWORDS and not t.isdigit()]
+
+def ramo(area):
+    """'Direito do Trabalho', 'Trabalhista' -> 'trabalhista' (chave de AREAS); área fora de AREAS fica normalizada."""
+    palavras = set(re.findall(r"\w+", normalizar(area or "")))
+    for chave, aceitos in AREAS.items():
+        if palavras.intersection(aceitos): return chave
+    return " ".join(sorted(palavras))
+
+def registros(arquivo, nome=None):
+    """Registros (dict) de um dump JSONL ou CSV, opcionalmente .gz, lidos em fluxo. `arquivo`: caminho ou binário aberto."""
+    nome = (nome or (arquivo if isinstance(arquivo, str) else getattr(arquivo, "name", ""))).lower()
+    bruto = open(arquivo, "rb") if isinstance(arquivo, str) else arquivo
+    if nome.endswith(".gz"):
+        bruto, nome = gzip.GzipFile(fileobj=bruto), nome[:-3]
+    texto = io.TextIOWrapper(bruto, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        if nome.endswith((".jsonl", ".json", ".ndjson")):
+            for linha in texto:
+                linha = linha.strip()
+                if linha: yield json.loads(linha)
+        else:
+            csv.field_size_limit(1 << 26)
+            inicio = []
+            while sum(map(len, inicio)) < 65536:
+                linha = texto.readline()
+                if not linha: break
+                inicio.append(linha)
+            try: dialeto = csv.Sniffer().sniff("".join(inicio), delimiters=",;\t|")
+            except csv.Error: dialeto = csv.excel
+            yield from csv.DictReader(itertools.chain(inicio, texto), dialect=dialeto)
+    finally:
+        texto.detach()
+        if isinstance(arquivo, str): bruto.close()
+
+def _campo(registro, campo):
+    minusculo = {str(k).strip().lower(): v for k, v in registro.items()}
+    for nome in CAMPOS[campo]:
+        valor = minusculo.get(nome)
+        if valor not in (None, ""): return str(valor).strip()
+    return ""
+
+class BaseJurisprudencia:
+    """Decisões (ementa comprimida + metadados), índice FTS5 sem conteúdo e frequência de documento por termo.
+
+    Tribunal e ramo não entram no índice: como cada um cobre uma fração grande da base, filtrar no MATCH percorreria
+    listas enormes. O filtro é feito na própria decisão (chave primária) só para as linhas que o MATCH já casou."""
+
+    def __init__(self, caminho, itens_cache=512):
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False, timeout=30)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS decisoes (id INTEGER PRIMARY KEY, tribunal TEXT, area TEXT, classe TEXT, numero TEXT,
+                relator TEXT, data TEXT, ramo TEXT, ementa BLOB, hash TEXT UNIQUE);
+            CREATE VIRTUAL TABLE IF NOT EXISTS decisoes_fts USING fts5(ementa, content='', tokenize='unicode61 remove_diacritics 2');
+            CREATE TABLE IF NOT EXISTS frequencias (termo TEXT PRIMARY KEY, docs INTEGER) WITHOUT ROWID;
+        """)
+        self._total = self._conn.execute("SELECT COUNT(*) FROM decisoes").fetchone()[0]
+        self._versao = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self._cache = OrderedDict()
+        self.itens_cache = itens_cache
+        self.acertos = self.faltas = 0
+
+    def _sincronizar(self):
+        """Outra conexão (ex.: ferramentas/importar_jurisprudencia.py) gravou na base: recontar e descartar o cache."""
+        with self._lock:
+            versao = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if versao == self._versao: return
+            self._versao = versao
+            self._total = self._conn.execute("SELECT COUNT(*) FROM decisoes").fetchone()[0]
+            self._cache.clear()
+
+    def total(self):
+        self._sincronizar()
+        return self._total
+
+    def tribunais(self):
+        with self._lock: return [r[0] for r in self._conn.execute("SELECT DISTINCT tribunal FROM decisoes ORDER BY tribunal")]
+
+    def importar(self, registros, tribunal=None, area=None, lote=TAMANHO_LOTE, ao_progredir=None):
+        """Grava as decisões em lotes (uma transação por lote). `tribunal`/`area` preenchem o que faltar no dump.
+        Ementas repetidas (mesmo tribunal, número e texto) são ignoradas. Devolve (inseridas, ignoradas)."""
+        inseridas = ignoradas = 0
+        buffer = []
+        for registro in registros:
+            ementa = _campo(registro, "ementa")
+            if not ementa:
+                ignoradas += 1
+                continue
+            linha = {c: _campo(registro, c) for c in CAMPOS if c != "ementa"}
+            linha["tribunal"] = (linha["tribunal"] or tribunal or "").upper()
+            linha["area"] = linha["area"] or area or ""
+            linha["ementa"] = ementa
+            buffer.append(linha)
+            if len(buffer) >= lote:
+                novas = self._gravar(buffer)
+                inseridas, ignoradas = inseridas + novas, ignoradas + len(buffer) - novas
+                buffer = []
+                if ao_progredir: ao_progredir(inseridas, ignoradas)
+        if buffer:
+            novas = self._gravar(buffer)
+            inseridas, ignoradas = inseridas + novas, ignoradas + len(buffer) - novas
+            if ao_progredir: ao_progredir(inseridas, ignoradas)
+        return inseridas, ignoradas
+
+    def _gravar(self, linhas):
+        por_hash = {}
+        for l in linhas: por_hash.setdefault(hashlib.sha256(f"{l['tribunal']}|{l['numero']}|{l['ementa']}".encode("utf-8")).hexdigest(), l)
+        # Compressão e termos fora da trava de escrita; dentro dela só sobram a checagem de repetidas e os INSERTs.
+        preparadas = {chave: ((l["tribunal"], l["area"], l["classe"], l["numero"], l["relator"], l["data"], ramo(l["area"]),
+                               zlib.compress(l["ementa"].encode("utf-8"), 6)), l["ementa"], set(termos(l["ementa"])))
+                      for chave, l in por_hash.items()}
+        with self._lock, self._conn:
+            # Trava de escrita antes de olhar hashes e MAX(id): outro processo importando na mesma base (o app e
+            # ferramentas/importar_jurisprudencia.py) espera o commit em vez de gravar os mesmos ids ou as mesmas ementas.
+            self._conn.execute("BEGIN IMMEDIATE")
+            marcas = ",".join("?" * len(preparadas))
+            for (existente,) in self._conn.execute(f"SELECT hash FROM decisoes WHERE hash IN ({marcas})", list(preparadas)): del preparadas[existente]
+            if not preparadas: return 0
+            proximo = (self._conn.execute("SELECT MAX(id) FROM decisoes").fetchone()[0] or 0) + 1
+            decisoes, indice, frequencia = [], [], Counter()
+            for i, (chave, (campos, ementa, termos_ementa)) in enumerate(preparadas.items(), proximo):
+                decisoes.append((i, *campos, chave))
+                indice.append((i, ementa))
+                frequencia.update(termos_ementa)
+            self._conn.executemany("INSERT INTO decisoes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", decisoes)
+            self._conn.executemany("INSERT INTO decisoes_fts (rowid, ementa) VALUES (?, ?)", indice)
+            self._conn.executemany("INSERT INTO frequencias VALUES (?, ?) ON CONFLICT(termo) DO UPDATE SET docs = docs + excluded.docs",
+                                   frequencia.items())
+            self._total += len(decisoes)
+            self._cache.clear()
+        return len(decisoes)
+
+    def otimizar(self):
+        """Funde os segmentos do índice (rodar depois de uma importação grande)."""
+        with self._lock, self._conn: self._conn.execute("INSERT INTO decisoes_fts (decisoes_fts) VALUES ('optimize')")
+
+    def termos_consulta(self, texto):
+        """[(termo, decisões com o termo)] mais discriminantes do texto (repetição no texto x idf na base), do mais ao
+        menos relevante, sem os comuns demais e com a soma das frequências dentro de MAX_POSTINGS."""
+        self._sincronizar()
+        repeticoes = Counter(termos(texto[:MAX_CHARS_CONSULTA]))
+        if not repeticoes or not self._total: return []
+        unicos = list(repeticoes)
+        with self._lock:
+            docs = {}
+            for i in range(0, len(unicos), 900):
+                parte = unicos[i:i + 900]
+                docs.update(self._conn.execute(f"SELECT termo, docs FROM frequencias WHERE termo IN ({','.join('?' * len(parte))})", parte).fetchall())
+        limite = max(1, int(self._total * FRACAO_TERMO_COMUM))
+        pesos = {t: repeticoes[t] * math.log(self._total / n) for t, n in docs.items() if n <= limite}
+        escolhidos, postings = [], 0
+        for termo in sorted(pesos, key=pesos.get, reverse=True):
+            if postings + docs[termo] > MAX_POSTINGS: continue
+            escolhidos.append((termo, docs[termo]))
+            postings += docs[termo]
+            if len(escolhidos) == MAX_TERMOS_CONSULTA: break
+        return escolhidos
+
+    def _ranking(self, expressao, filtros, k):
+        """[(id, bm25)] do MATCH; `filtros` = [(condição SQL sobre decisoes d, parâmetros)]."""
+        if not filtros:
+            sql, parametros = "SELECT rowid, bm25(decisoes_fts) AS s FROM decisoes_fts WHERE decisoes_fts MATCH ? ORDER BY s LIMIT ?", [expressao, k]
+        else:
+            sql = ("SELECT f.rowid, bm25(decisoes_fts) AS s FROM decisoes_fts f JOIN decisoes d ON d.id = f.rowid WHERE decisoes_fts MATCH ? AND "
+                   + " AND ".join(c for c, _ in filtros) + " ORDER BY s LIMIT ?")
+            parametros = [expressao] + [p for _, ps in filtros for p in ps] + [k]
+        with self._lock: return self._conn.execute(sql, parametros).fetchall()
+
+    def buscar(self, consulta, tribunais=None, area=None, k=5):
+        """Top-k decisões (bm25 só sobre a ementa) para o texto da consulta, filtradas por tribunal e área.
+
+        Primeiro exige os dois termos mais fortes e usa os demais só para pontuar; se não der k decisões, completa com
+        as decisões que tenham ao menos um dos termos fortes que couberem em MAX_LINHAS_OU (sempre pontuadas por todos)."""
+        escolhidos = self.termos_consulta(consulta)
+        if not escolhidos: return []
+        area = ramo(area) if area else ""
+        # Termos na ordem do peso: os dois primeiros são os exigidos no MATCH
+        chave = (tuple(t for t, _ in escolhidos), tuple(sorted(t.upper() for t in tribunais or ())), area, k)
+        with self._lock:
+            if chave in self._cache:
+                self._cache.move_to_end(chave)
+                self.acertos += 1
+                return self._cache[chave]
+        self.faltas += 1
+        filtros = []
+        if tribunais: filtros.append((f"d.tribunal IN ({','.join('?' * len(tribunais))})", [t.upper() for t in tribunais]))
+        if area: filtros.append(("d.ramo = ?", [area]))
+        todos = " OR ".join(f'"{t}"' for t, _ in escolhidos)
+        ranking = []
+        if len(escolhidos) > 1:
+            ranking = self._ranking(f'"{escolhidos[0][0]}" AND "{escolhidos[1][0]}" AND ({todos})', filtros, k)
+        if len(ranking) < k:
+            baratos, linhas = [], 0
+            for termo, docs in escolhidos:
+                if linhas + docs <= MAX_LINHAS_OU: baratos.append(f'"{termo}"'); linhas += docs
+            vistos = {r[0] for r in ranking}
+            if baratos: ranking += [r for r in self._ranking(f"({' OR '.join(baratos)}) AND ({todos})", filtros, k + len(vistos))
+                                    if r[0] not in vistos][:k - len(ranking)]
+        with self._lock:
+            linhas = {r[0]: r[1:] for r in self._conn.execute(
+                f"SELECT id, tribunal, area, classe, numero, relator, data, ementa FROM decisoes WHERE id IN ({','.join('?' * len(ranking))})",
+                [r[0] for r in ranking])} if ranking else {}
+        resultado = [Decisao(i, *linhas[i][:6], zlib.decompress(linhas[i][6]).decode("utf-8"), -s) for i, s in ranking if i in linhas]
+        with self._lock:
+            self._cache[chave] = resultado
+            while len(self._cache) > self.itens_cache: self._cache.popitem(last=False)
+        return resultado
+
+    def estatisticas(self):
+        self._sincronizar()
+        consultas = self.acertos + self.faltas
+        return {"decisoes": self._total, "acertos": self.acertos, "faltas": self.faltas, "taxa": self.acertos / consultas if consultas else 0.0}
+
+def citacao(decisao):
+    """'STJ, REsp 123/SP, Rel. Fulano, j. 2020-01-01' com o que o dump trouxer."""
+    partes = [decisao.tribunal, " ".join(p for p in (decisao.classe, decisao.numero) if p)]
+    if decisao.relator: partes.append(f"Rel. {decisao.relator}")
+    if decisao.data: partes.append(f"j. {decisao.data}")
+    return ", ".join(p for p in partes if p)
@@ -0,0 +1,157 @@
+"""Leitor de Diários Oficiais (DJE): varredura em fluxo com casamento de vários padrões (Aho-Corasick).
+
+Módulo sem dependência do Streamlit, para ser usado pelo app.py e pelos benchmarks.
+O diário é lido página a página (PDF) ou em blocos (texto), sem carregar o arquivo inteiro,
+e todos os identificadores da carteira (CNJ, OAB, nomes) são procurados numa única passada.
+"""
+import codecs
+import re
+import unicodedata
+from collections import deque, namedtuple
+
+Ocorrencia = namedtuple("Ocorrencia", "pagina tipo identificador processo_id trecho")
+
+_SEPARADOR_NUMERICO = re.compile(r"(?<=\d)[.\-/](?=\d)")
+_NAO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+TAMANHO_MINIMO_NOME = 8   # nomes curtos geram falso positivo demais
+CONTEXTO_TRECHO = 160     # caracteres de contexto guardados em volta da ocorrência
+
+def normalizar(texto):
+    """Minúsculas, sem acentos, separadores entre dígitos removidos (CNJ/OAB) e o resto vira espaço simples."""
+    texto = unicodedata.normalize("NFKD", texto.lower()).encode("ascii", "ignore").decode("ascii")
+    return _NAO_ALFANUMERICO.sub(" ", _SEPARADOR_NUMERICO.sub("", texto))
+
+def padroes_cnj(numero):
+    digitos = re.sub(r"\D", "", numero or "")
+    return [digitos] if len(digitos) == 20 else []
+
+def padroes_oab(inscricao):
+    """'SP123456', 'OAB/SP 123.456' ou '123456/SP' -> variantes usuais de citação no diário."""
+    texto = re.sub(r"(?<=[a-z])(?=\d)|(?<=\d)(?=[a-z])", " ", normalizar(inscricao).replace("oab", " "))
+    uf = re.search(r"\b([a-z]{2})\b", texto)
+    numero = re.search(r"\d{3,7}", texto.replace(" ", ""))
+    if not uf or not numero: return []
+    uf, numero = uf.group(1), numero.group(0)
+    return [f"oab {uf} {numero}", f"oab {uf} n {numero}", f"oab {uf} no {numero}", f"{numero} {uf}"]
+
+def padroes_nome(nome):
+    nome = normalizar(nome).strip()
+    return [nome] if len(nome) >= TAMANHO_MINIMO_NOME and " " in nome else []
+
+class AhoCorasick:
+    """Autômato de Aho-Corasick sobre caracteres: acha todos os padrões em O(texto + ocorrências)."""
+
+    def __init__(self, padroes):
+        """padroes: {texto_normalizado: carga}. A carga volta em cada ocorrência."""
+        self.transicoes = [{}]
+        self.falha = [0]
+        self.saidas = [[]]
+        for padrao, carga in padroes.items():
+            estado = 0
+            for c in padrao:
+                proximo = self.transicoes[estado].get(c)
+                if proximo is None:
+                    proximo = len(self.transicoes)
+                    self.transicoes.append({})
+                    self.falha.append(0)
+                    self.saidas.append([])
+                    self.transicoes[estado][c] = proximo
+                estado = proximo
+            self.saidas[estado].append((len(padrao), carga))
+        self.maior_padrao = max((len(p) for p in padroes), default=0)
+
+        fila = deque(self.transicoes[0].values())
+        while fila:
+            atual = fila.popleft()
+            for c, filho in self.transicoes[atual].items():
+                fila.append(filho)
+                f = self.falha[atual]
+                while f and c not in self.transicoes[f]: f = self.falha[f]
+                self.falha[filho] = self.transicoes[f].get(c, 0)
+                if self.saidas[self.falha[filho]]: self.saidas[filho] = self.saidas[filho] + self.saidas[self.falha[filho]]
+
+    def buscar(self, texto):
+        """Gera (indice_final, tamanho, carga) para cada ocorrência."""
+        transicoes, falha, saidas = self.transicoes, self.falha, self.saidas
+        estado = 0
+        for i, c in enumerate(texto):
+            while estado and c not in transicoes[estado]: estado = falha[estado]
+            estado = transicoes[estado].get(c, 0)
+            if saidas[estado]:
+                for tamanho, carga in saidas[estado]: yield i, tamanho, carga
+
+class LeitorDJE:
+    """Varre um diário contra os alvos da carteira.
+
+    alvos: iterável de (tipo, identificador, padroes, processo_id), ex.: ("CNJ", "1002345-88...", [...], 7)."""
+
+    def __init__(self, alvos):
+        padroes = {}  # um mesmo padrão (cliente ou OAB) pode valer para vários processos da carteira
+        for tipo, identificador, variantes, processo_id in alvos:
+            for padrao in variantes:
+                cargas = padroes.setdefault(padrao, [])
+                if (tipo, identificador, processo_id) not in cargas: cargas.append((tipo, identificador, processo_id))
+        self.automato = AhoCorasick(padroes)
+        self.total_padroes = len(padroes)
+
+    def varrer(self, blocos):
+        """blocos: iterável de (pagina, texto). Gera Ocorrencia sem repetir (página, tipo, identificador, processo).
+
+        Entre blocos fica guardada uma 'cauda' do texto anterior: ocorrências que atravessam a divisa são
+        achadas, e a que termina no último caractere só é aceita no bloco seguinte, quando a borda é conhecida."""
+        cauda, pagina_cauda = "", None
+        vistos = set()
+        guarda = self.automato.maior_padrao + 1
+        for pagina, bruto in _com_fim(blocos):
+            if bruto is None: normal = " "
+            else:
+                # Páginas e blocos são separados por espaço: a palavra que fecha uma página não gruda na que abre a seguinte
+                normal = normalizar(bruto).lstrip(" ")
+                if cauda and not cauda.endswith(" "): normal = " " + normal
+            texto = cauda + normal
+            inicio_aceito = len(cauda) - 1
+            for fim, tamanho, cargas in self.automato.buscar(texto):
+                if fim < inicio_aceito or fim > len(texto) - 2: continue
+                ini = fim - tamanho + 1
+                if (ini > 0 and texto[ini - 1] != " ") or texto[fim + 1] != " ": continue  # só palavra inteira
+                pagina_ocorrencia = pagina_cauda if fim < len(cauda) else pagina
+                trecho = None
+                for tipo, identificador, processo_id in cargas:
+                    chave = (pagina_ocorrencia, tipo, identificador, processo_id)
+                    if chave in vistos: continue
+                    vistos.add(chave)
+                    if trecho is None: trecho = texto[max(0, ini - CONTEXTO_TRECHO):fim + 1 + CONTEXTO_TRECHO].strip()
+                    yield Ocorrencia(pagina_ocorrencia, tipo, identificador, processo_id, trecho)
+            if bruto is None: break
+            cauda, pagina_cauda = texto[-max(guarda, CONTEXTO_TRECHO):], pagina
+
+def _com_fim(blocos):
+    for pagina, texto in blocos: yield pagina, texto
+    yield None, None  # bloco final vazio: libera a ocorrência que terminou no último caractere
+
+def blocos_pdf(arquivo):
+    """Uma página por vez (o pypdf só decodifica o conteúdo da página quando pedido)."""
+    from pypdf import PdfReader
+    for i, pagina in enumerate(PdfReader(arquivo).pages, 1):
+        try: yield i, pagina.extract_text() or ""
+        except Exception: yield i, ""
+
+def blocos_texto(arquivo, tamanho_bloco=1 << 20, encoding="utf-8"):
+    """Dump de texto em blocos de ~1 MB, cortados em fim de linha; '\\f' (form feed) avança a página."""
+    proprio = isinstance(arquivo, str)
+    fluxo = open(arquivo, "rb") if proprio else arquivo
+    decodificador = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pagina, resto = 1, ""
+    try:
+        while True:
+            dados = fluxo.read(tamanho_bloco)
+            texto = resto + decodificador.decode(dados, final=not dados)
+            if dados:
+                corte = texto.rfind("\n") + 1
+                texto, resto = (texto[:corte], texto[corte:]) if corte else ("", texto)
+            for i, parte in enumerate(texto.split("\f")):
+                if i: pagina += 1
+                if parte: yield pagina, parte
+            if not dados: break
+    finally:
+        if proprio: fluxo.close()
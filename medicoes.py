@@ -0,0 +1,180 @@
+"""Medição de latência por etapa: cronômetros (context manager e decorator), histogramas em memória e exportação.
+
+Cada medição entra num histograma por (etapa, rótulos) com contagem, soma, máximo, buckets cumulativos no formato do
+Prometheus e uma janela das últimas JANELA_AMOSTRAS durações, de onde saem p50/p95/p99. O custo por medição é um
+perf_counter e um append sob lock (~5 µs). Exportação opcional: uma linha JSONL por medição e/ou o texto do
+Prometheus servido em http://<host>:<porta>/metrics por uma thread daemon. Módulo sem dependência do Streamlit.
+"""
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+JANELA_AMOSTRAS = 2048
+BUCKETS_SEG = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def percentil(ordenados, p):
+    if not ordenados: return 0.0
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+class Histograma:
+    __slots__ = ("contagem", "soma", "maximo", "buckets", "amostras")
+
+    def __init__(self):
+        self.contagem = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+        self.buckets = [0] * len(BUCKETS_SEG)
+        self.amostras = deque(maxlen=JANELA_AMOSTRAS)
+
+    def registrar(self, segundos):
+        self.contagem += 1
+        self.soma += segundos
+        if segundos > self.maximo: self.maximo = segundos
+        for i, limite in enumerate(BUCKETS_SEG):
+            if segundos <= limite:
+                self.buckets[i] += 1
+                break
+        self.amostras.append(segundos)
+
+class Medidor:
+    """Histogramas por (etapa, rótulos) e contadores, compartilhados pelo processo (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {}
+        self._contadores = {}
+        self._jsonl = None
+        self.porta_prometheus = None
+
+    @staticmethod
+    def _chave(nome, rotulos):
+        return nome, tuple(sorted((k, str(v)) for k, v in rotulos.items()))
+
+    def registrar(self, nome, segundos, **rotulos):
+        chave = self._chave(nome, rotulos)
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None: histograma = self._histogramas[chave] = Histograma()
+            histograma.registrar(segundos)
+            if self._jsonl:
+                self._jsonl.write(json.dumps({"ts": round(time.time(), 3), "etapa": nome, "segundos": round(segundos, 6), **rotulos},
+                                             ensure_ascii=False) + "\n")
+
+    def contar(self, nome, n=1, **rotulos):
+        chave = self._chave(nome, rotulos)
+        with self._lock: self._contadores[chave] = self._contadores.get(chave, 0) + n
+
+    @contextmanager
+    def medir(self, nome, **rotulos):
+        """with medidor.medir("pdf.extrair"): ... (registra também se o bloco levantar exceção, com erro=1)."""
+        inicio = time.perf_counter()
+        try: yield
+        except BaseException:
+            self.registrar(nome, time.perf_counter() - inicio, **rotulos, erro=1)
+            raise
+        self.registrar(nome, time.perf_counter() - inicio, **rotulos)
+
+    def cronometrado(self, nome=None, **rotulos):
+        """Decorator. Em geradores mede do primeiro pedido ao fim da iteração (ex.: respostas em stream)."""
+        def decorar(funcao):
+            etapa = nome or funcao.__qualname__
+            if inspect.isgeneratorfunction(funcao):
+                @functools.wraps(funcao)
+                def gerador(*args, **kwargs):
+                    with self.medir(etapa, **rotulos): yield from funcao(*args, **kwargs)
+                return gerador
+
+            @functools.wraps(funcao)
+            def envolvida(*args, **kwargs):
+                with self.medir(etapa, **rotulos): return funcao(*args, **kwargs)
+            return envolvida
+        return decorar
+
+    def resumo(self):
+        """[{etapa, rotulos, chamadas, p50/p95/p99/max em ms, total em s}] da etapa mais cara (tempo total) para a mais barata."""
+        with self._lock: copia = [(chave, h.contagem, h.soma, h.maximo, sorted(h.amostras)) for chave, h in self._histogramas.items()]
+        linhas = []
+        for (nome, rotulos), contagem, soma, maximo, ordenados in copia:
+            linhas.append({"etapa": nome, "rotulos": ", ".join(f"{k}={v}" for k, v in rotulos), "chamadas": contagem,
+                           "p50_ms": percentil(ordenados, 50) * 1000, "p95_ms": percentil(ordenados, 95) * 1000,
+                           "p99_ms": percentil(ordenados, 99) * 1000, "max_ms": maximo * 1000, "total_s": soma})
+        return sorted(linhas, key=lambda l: l["total_s"], reverse=True)
+
+    def contadores(self):
+        with self._lock: return [{"contador": nome, "rotulos": ", ".join(f"{k}={v}" for k, v in rotulos), "valor": valor}
+                                 for (nome, rotulos), valor in sorted(self._contadores.items())]
+
+    def zerar(self):
+        with self._lock:
+            self._histogramas.clear()
+            self._contadores.clear()
+
+    def prometheus(self, prefixo="legalhub"):
+        """Texto no formato de exposição do Prometheus (histogramas em segundos e contadores)."""
+        def nome_metrica(nome): return prefixo + "_" + "".join(c if c.isalnum() else "_" for c in nome)
+        def rotulos_texto(rotulos, extra=()):
+            pares = [*rotulos, *extra]
+            return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in pares) + "}" if pares else ""
+        with self._lock:
+            histogramas = [(chave, h.contagem, h.soma, list(h.buckets)) for chave, h in self._histogramas.items()]
+            contadores = list(self._contadores.items())
+        linhas, vistos = [], set()
+        for (nome, rotulos), contagem, soma, buckets in sorted(histogramas):
+            metrica = nome_metrica(nome) + "_segundos"
+            if metrica not in vistos:
+                linhas.append(f"# TYPE {metrica} histogram")
+                vistos.add(metrica)
+            acumulado = 0
+            for limite, n in zip(BUCKETS_SEG, buckets):
+                acumulado += n
+                linhas.append(f"{metrica}_bucket{rotulos_texto(rotulos, [('le', limite)])} {acumulado}")
+            linhas.append(f"{metrica}_bucket{rotulos_texto(rotulos, [('le', '+Inf')])} {contagem}")
+            linhas.append(f"{metrica}_sum{rotulos_texto(rotulos)} {soma:.6f}")
+            linhas.append(f"{metrica}_count{rotulos_texto(rotulos)} {contagem}")
+        for (nome, rotulos), valor in sorted(contadores):
+            metrica = nome_metrica(nome) + "_total"
+            if metrica not in vistos:
+                linhas.append(f"# TYPE {metrica} counter")
+                vistos.add(metrica)
+            linhas.append(f"{metrica}{rotulos_texto(rotulos)} {valor}")
+        return "\n".join(linhas) + "\n"
+
+    def exportar_jsonl(self, caminho):
+        """Passa a gravar cada medição em `caminho` (append, uma linha JSON por medição)."""
+        with self._lock:
+            if self._jsonl: self._jsonl.close()
+            self._jsonl = open(caminho, "a", encoding="utf-8", buffering=1) if caminho else None
+
+    def servir_prometheus(self, porta, host="127.0.0.1"):
+        """Sobe o endpoint /metrics numa thread daemon (uma vez por processo)."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        medidor = self
+
+        class Pedido(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                corpo = medidor.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args): pass
+
+        servidor = ThreadingHTTPServer((host, porta), Pedido)
+        threading.Thread(target=servidor.serve_forever, name="medicoes-prometheus", daemon=True).start()
+        self.porta_prometheus = servidor.server_address[1]
+        return servidor
+
+# Instância do processo: os decorators do app são aplicados na importação, antes de qualquer st.cache_resource
+MEDIDOR = Medidor()
+medir = MEDIDOR.medir
+cronometrado = MEDIDOR.cronometrado
+contar = MEDIDOR.contar
@@ -0,0 +1,376 @@
+"""Memória de cálculo e documentos gerados: renderização em DOCX/PDF com modelos montados uma vez.
+
+O DOCX sai de um pacote-modelo do python-docx (estilos, página A4) lido uma única vez: cada documento só monta o XML
+do corpo e regrava o zip, sem recriar o Document. Vale para as memórias de cálculo e para os textos do LLM (Markdown).
+O PDF usa reportlab com geometria e fontes pré-calculadas; o papel timbrado é lido uma vez por arquivo (SHA-256) e entra
+em cada página como um Form XObject compartilhado. Módulo sem dependência do Streamlit.
+"""
+import hashlib
+import importlib.util
+import re
+import threading
+import unicodedata
+import zipfile
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+from datetime import datetime
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+HAS_REPORTLAB = importlib.util.find_spec("reportlab") is not None  # importado só ao montar o primeiro modelo PDF
+
+# entradas: [(rótulo, texto)]; itens: [(descrição, valor numérico ou texto)]; fundamentacao: [texto]
+MemoriaCalculo = namedtuple("MemoriaCalculo", "titulo entradas itens total fundamentacao unidade rotulo_total",
+                            defaults=((), "R$", "TOTAL"))
+
+def formatar_valor(valor, unidade="R$"):
+    if valor is None or isinstance(valor, str): return valor or ""
+    if unidade == "R$": return f"R$ {valor:,.2f}"
+    return f"{valor:,.2f} {unidade}"
+
+def nome_arquivo(texto):
+    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^A-Za-z0-9]+", "_", texto).strip("_")[:60] or "memoria"
+
+_CONTROLE_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+def _texto_xml(texto):
+    return escape(_CONTROLE_XML.sub("", str(texto)))
+
+def _montar_zip(partes, base=b""):
+    """Pacote zip (DOCX) com os membros [(nome, bytes)] acrescentados a `base` (zip já montado, que não é recomprimido)."""
+    buffer = BytesIO(base)
+    with zipfile.ZipFile(buffer, "a", zipfile.ZIP_DEFLATED, compresslevel=6) as pacote:
+        for nome, dados in partes: pacote.writestr(nome, dados)
+    return buffer.getvalue()
+
+class ModeloDocx:
+    """Pacote DOCX-modelo lido e comprimido uma vez; cada documento é só o XML do corpo (montado com os blocos abaixo)
+    acrescentado ao zip das partes fixas."""
+
+    def __init__(self):
+        from docx import Document
+        from docx.shared import Mm
+        doc = Document()
+        secao = doc.sections[0]
+        secao.page_width, secao.page_height = Mm(210), Mm(297)
+        secao.left_margin = secao.right_margin = Mm(25)
+        buffer = BytesIO()
+        doc.save(buffer)
+        with zipfile.ZipFile(buffer) as pacote:
+            self.base = _montar_zip([(nome, pacote.read(nome)) for nome in pacote.namelist() if nome != "word/document.xml"])
+            documento = pacote.read("word/document.xml").decode("utf-8")
+        inicio_corpo = documento.index("<w:body>") + len("<w:body>")
+        self.cabeca, self.rodape = documento[:inicio_corpo], documento[documento.index("<w:sectPr", inicio_corpo):]
+
+    @staticmethod
+    def trecho(texto, negrito=False, italico=False):
+        estilo = ("<w:b/>" if negrito else "") + ("<w:i/>" if italico else "")
+        return f'<w:r>{"<w:rPr>" + estilo + "</w:rPr>" if estilo else ""}<w:t xml:space="preserve">{_texto_xml(texto)}</w:t></w:r>'
+
+    @classmethod
+    def paragrafo(cls, trechos, estilo=None, alinhamento=None):
+        """trechos: texto ou [(texto, negrito[, itálico])]."""
+        if isinstance(trechos, str): trechos = [(trechos, False)]
+        props = (f'<w:pStyle w:val="{estilo}"/>' if estilo else "") + (f'<w:jc w:val="{alinhamento}"/>' if alinhamento else "")
+        return f"<w:p>{'<w:pPr>' + props + '</w:pPr>' if props else ''}{''.join(cls.trecho(*t) for t in trechos)}</w:p>"
+
+    @classmethod
+    def titulo(cls, texto, nivel=1):
+        return cls.paragrafo(texto, f"Heading{nivel}")
+
+    @classmethod
+    def tabela(cls, linhas, larguras=(6200, 2800), negrito_ultima=False, negrito_primeira=False, valores=True):
+        """linhas: [(col1, col2, ...)]; com `valores`, a última coluna é alinhada à direita."""
+        grade = "".join(f'<w:gridCol w:w="{l}"/>' for l in larguras)
+        xml = [f'<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:w="0" w:type="auto"/></w:tblPr><w:tblGrid>{grade}</w:tblGrid>']
+        for i, linha in enumerate(linhas):
+            negrito = (negrito_ultima and i == len(linhas) - 1) or (negrito_primeira and i == 0)
+            celulas = "".join(f'<w:tc><w:tcPr><w:tcW w:w="{l}" w:type="dxa"/></w:tcPr>'
+                              f'{cls.paragrafo([(texto, negrito)], alinhamento="right" if valores and j == len(linha) - 1 and j else None)}</w:tc>'
+                              for j, (texto, l) in enumerate(zip(linha, larguras)))
+            xml.append(f"<w:tr>{celulas}</w:tr>")
+        return "".join(xml) + "</w:tbl>"
+
+    def render(self, blocos):
+        corpo = (self.cabeca + "".join(blocos) + self.rodape).encode("utf-8")
+        return _montar_zip([("word/document.xml", corpo)], self.base)
+
+class ModeloPdf:
+    """Página A4 com cabeçalho/rodapé fixos; geometria e colunas calculadas uma vez, cada PDF só desenha o conteúdo."""
+    MARGEM = 50
+    FONTE, FONTE_NEGRITO = "Helvetica", "Helvetica-Bold"
+
+    def __init__(self):
+        from reportlab.lib.pagesizes import A4
+        self.largura, self.altura = A4
+        self.x_valor = self.largura - self.MARGEM
+        self.largura_texto = self.largura - 2 * self.MARGEM
+        self.largura_descricao = self.largura_texto - 130
+
+    def _nova_pagina(self, c, titulo, pagina):
+        if pagina > 1: c.showPage()
+        c.setFont(self.FONTE_NEGRITO, 13)
+        c.drawString(self.MARGEM, self.altura - self.MARGEM, titulo)
+        c.setFont(self.FONTE, 8)
+        c.drawRightString(self.x_valor, 30, f"Página {pagina}")
+        c.line(self.MARGEM, self.altura - self.MARGEM - 8, self.x_valor, self.altura - self.MARGEM - 8)
+        return self.altura - self.MARGEM - 30
+
+    def render(self, memoria, gerado_em=None):
+        from reportlab.lib.utils import simpleSplit
+        from reportlab.pdfgen import canvas
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=(self.largura, self.altura))
+        c.setTitle(memoria.titulo)
+        titulo = f"MEMÓRIA DE CÁLCULO - {memoria.titulo}"
+        pagina = 1
+        y = self._nova_pagina(c, titulo, pagina)
+
+        def linha(esquerda, direita="", negrito=False, recuo=0):
+            nonlocal y, pagina
+            fonte = self.FONTE_NEGRITO if negrito else self.FONTE
+            partes = simpleSplit(str(esquerda), fonte, 10, (self.largura_descricao if direita else self.largura_texto) - recuo) or [""]
+            if y - 13 * len(partes) < self.MARGEM:
+                pagina += 1
+                y = self._nova_pagina(c, titulo, pagina)
+            c.setFont(fonte, 10)
+            for k, parte in enumerate(partes):
+                c.drawString(self.MARGEM + recuo, y, parte)
+                if k == 0 and direita: c.drawRightString(self.x_valor, y, direita)
+                y -= 13
+
+        c.setFont(self.FONTE, 8)
+        c.drawString(self.MARGEM, y + 12, f"Gerado em {(gerado_em or datetime.now()).strftime('%d/%m/%Y %H:%M')}")
+        linha("Dados informados", negrito=True)
+        for rotulo, valor in memoria.entradas: linha(rotulo, str(valor), recuo=10)
+        y -= 8
+        linha("Demonstrativo", negrito=True)
+        for descricao, valor in memoria.itens: linha(descricao, formatar_valor(valor, memoria.unidade), recuo=10)
+        if memoria.total is not None:
+            c.line(self.MARGEM, y + 9, self.x_valor, y + 9)
+            linha(memoria.rotulo_total, formatar_valor(memoria.total, memoria.unidade), negrito=True, recuo=10)
+        if memoria.fundamentacao:
+            y -= 8
+            linha("Fundamentação", negrito=True)
+            for texto in memoria.fundamentacao: linha(f"• {texto}", recuo=10)
+        c.save()
+        return buffer.getvalue()
+
+_modelos = {}
+_trava_modelos = threading.Lock()
+
+def _modelo(tipo):
+    """Modelos montados uma vez por processo e reaproveitados por todas as memórias."""
+    with _trava_modelos:
+        if tipo not in _modelos: _modelos[tipo] = ModeloDocx() if tipo == "docx" else ModeloPdf()
+        return _modelos[tipo]
+
+def blocos_memoria(memoria, gerado_em=None):
+    """Corpo DOCX da memória de cálculo."""
+    m = ModeloDocx
+    blocos = [m.titulo(f"MEMÓRIA DE CÁLCULO - {memoria.titulo}"),
+              m.paragrafo(f"Gerado em {(gerado_em or datetime.now()).strftime('%d/%m/%Y %H:%M')}"),
+              m.titulo("Dados informados", 2), m.tabela([(rotulo, str(valor)) for rotulo, valor in memoria.entradas]),
+              m.titulo("Demonstrativo", 2)]
+    linhas = [(descricao, formatar_valor(valor, memoria.unidade)) for descricao, valor in memoria.itens]
+    if memoria.total is not None: linhas.append((memoria.rotulo_total, formatar_valor(memoria.total, memoria.unidade)))
+    blocos.append(m.tabela(linhas, negrito_ultima=memoria.total is not None))
+    if memoria.fundamentacao:
+        blocos.append(m.titulo("Fundamentação", 2))
+        blocos += [m.paragrafo(texto, "ListBullet") for texto in memoria.fundamentacao]
+    return blocos
+
+def memoria_docx(memoria):
+    return _modelo("docx").render(blocos_memoria(memoria))
+
+def memoria_pdf(memoria):
+    if not HAS_REPORTLAB: raise RuntimeError("reportlab não instalado")
+    return _modelo("pdf").render(memoria)
+
+def exportar_memorias_zip(memorias, destino, formatos=("docx",)):
+    """Grava em `destino` (arquivo aberto ou BytesIO) um zip com uma memória por cálculo, documento a documento,
+    sem juntar tudo em memória antes. Os DOCX entram sem recompressão (já são zip)."""
+    with zipfile.ZipFile(destino, "w") as pacote:
+        for i, memoria in enumerate(memorias, 1):
+            base = f"{i:04d}_{nome_arquivo(memoria.titulo)}"
+            if "docx" in formatos: pacote.writestr(base + ".docx", memoria_docx(memoria), compress_type=zipfile.ZIP_STORED)
+            if "pdf" in formatos and HAS_REPORTLAB: pacote.writestr(base + ".pdf", memoria_pdf(memoria), compress_type=zipfile.ZIP_DEFLATED)
+    return destino
+
+# --- DOCUMENTOS DO LLM (MARKDOWN -> DOCX) ---
+_MD_TITULO = re.compile(r"^\s{0,3}(#{1,6})\s+(.*?)[\s#]*$")
+_MD_LISTA = re.compile(r"^\s*[-*+•]\s+(.*)$")
+_MD_CITACAO = re.compile(r"^\s*>\s?(.*)$")
+_MD_REGRA = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+_MD_ENFASE = re.compile(r"(\*\*|__)(.+?)\1|(?<![*\w])\*(?![\s*])(.+?)(?<![\s*])\*(?![*\w])")
+LARGURA_UTIL_DOCX = 9000  # twips entre as margens de 25 mm do modelo
+
+def trechos_markdown(linha):
+    """[(texto, negrito, itálico)] de uma linha com **negrito**/__negrito__ e *itálico*."""
+    trechos, pos = [], 0
+    for m in _MD_ENFASE.finditer(linha):
+        if m.start() > pos: trechos.append((linha[pos:m.start()], False, False))
+        trechos.append((m.group(2), True, False) if m.group(2) is not None else (m.group(3), False, True))
+        pos = m.end()
+    if pos < len(linha): trechos.append((linha[pos:], False, False))
+    return trechos
+
+def _sem_enfase(texto):
+    return "".join(t for t, _, _ in trechos_markdown(texto))
+
+def _tabela_markdown(linhas):
+    colunas = max(len(l) for l in linhas)
+    linhas = [l + [""] * (colunas - len(l)) for l in linhas]
+    return ModeloDocx.tabela(linhas, (LARGURA_UTIL_DOCX // colunas,) * colunas, negrito_primeira=True, valores=False)
+
+def blocos_markdown(texto):
+    """Corpo DOCX do texto em Markdown do LLM: títulos (#), listas, citações (>), tabelas (|) e ênfase.
+    Linhas em branco e réguas (---) só separam blocos; listas numeradas mantêm o número do texto."""
+    m = ModeloDocx
+    blocos, tabela = [], []
+    for linha in texto.splitlines() + [""]:
+        if linha.lstrip().startswith("|"):
+            celulas = [c.strip() for c in linha.strip().strip("|").split("|")]
+            if not all(set(c) <= set(":- ") for c in celulas): tabela.append([_sem_enfase(c) for c in celulas])
+            continue
+        if tabela:
+            blocos.append(_tabela_markdown(tabela))
+            tabela = []
+        if not linha.strip() or _MD_REGRA.match(linha): continue
+        titulo = _MD_TITULO.match(linha)
+        if titulo:
+            blocos.append(m.titulo(_sem_enfase(titulo.group(2)), min(len(titulo.group(1)), 3)))
+            continue
+        item, citacao = _MD_LISTA.match(linha), _MD_CITACAO.match(linha)
+        if item: blocos.append(m.paragrafo(trechos_markdown(item.group(1)), "ListBullet"))
+        elif citacao: blocos.append(m.paragrafo(trechos_markdown(citacao.group(1)), "Quote"))
+        else: blocos.append(m.paragrafo(trechos_markdown(linha.strip()), alinhamento="both"))
+    return blocos
+
+@lru_cache(maxsize=64)
+def documento_docx(texto):
+    """DOCX de um texto do LLM. O mesmo texto (reruns, vários botões para o mesmo documento) não é renderizado de novo."""
+    return _modelo("docx").render(blocos_markdown(texto))
+
+def exportar_documentos_zip(documentos, destino):
+    """documentos: iterável de (nome do arquivo, texto). Grava em `destino` um DOCX por documento, um de cada vez."""
+    with zipfile.ZipFile(destino, "w") as pacote:
+        for nome, texto in documentos: pacote.writestr(nome, _modelo("docx").render(blocos_markdown(texto)), compress_type=zipfile.ZIP_STORED)
+    return destino
+
+# --- PAPEL TIMBRADO (PDF) ---
+TIMBRADOS_EM_MEMORIA = 8  # modelos de timbrado guardados (LRU por SHA-256 do arquivo)
+
+class ModeloTimbrado:
+    """Primeira página de um PDF timbrado, lida uma vez. O conteúdo dela vira um Form XObject gravado uma única vez em
+    cada PDF de saída e desenhado por referência ('/Timbrado Do') em todas as páginas; se o timbrado não permitir
+    (conteúdo ilegível, filtros exóticos), cai no merge_page página a página."""
+    MARGEM_ESQUERDA, MARGEM_TOPO, MARGEM_BASE = 50, 130, 100
+    FONTE, FONTE_NEGRITO, CORPO, ENTRELINHA, ENTRE_PARAGRAFOS = "Helvetica", "Helvetica-Bold", 10, 12, 5
+
+    def __init__(self, dados):
+        from pypdf import PdfReader
+        from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject
+        self.pagina = PdfReader(BytesIO(dados)).pages[0]
+        caixa = self.pagina.mediabox
+        self.largura, self.altura = float(caixa.width), float(caixa.height)
+        self.form = None
+        try:
+            conteudo = self.pagina.get_contents()
+            form = DecodedStreamObject()
+            form.set_data(conteudo.get_data() if conteudo is not None else b"")
+            form.update({NameObject("/Type"): NameObject("/XObject"), NameObject("/Subtype"): NameObject("/Form"),
+                         NameObject("/BBox"): ArrayObject(FloatObject(v) for v in (caixa.left, caixa.bottom, caixa.right, caixa.top)),
+                         NameObject("/Matrix"): ArrayObject(FloatObject(v) for v in (1, 0, 0, 1, -float(caixa.left), -float(caixa.bottom))),
+                         NameObject("/Resources"): self.pagina.get("/Resources", DictionaryObject()).get_object()})
+            self.form = form.flate_encode()
+        except Exception:
+            self.form = None
+
+    def _texto(self, c, texto, y, pagina):
+        """Desenha um documento a partir da página atual do canvas; devolve (y, páginas usadas)."""
+        from reportlab.lib.utils import simpleSplit
+        largura_texto = self.largura - 2 * self.MARGEM_ESQUERDA
+        for linha in texto.split("\n"):
+            titulo = _MD_TITULO.match(linha)
+            fonte = self.FONTE_NEGRITO if titulo else self.FONTE
+            for parte in simpleSplit(_sem_enfase(titulo.group(2) if titulo else linha), fonte, self.CORPO, largura_texto):
+                if y < self.MARGEM_BASE:
+                    c.showPage()
+                    pagina += 1
+                    y = self.altura - self.MARGEM_TOPO
+                c.setFont(fonte, self.CORPO)
+                c.drawString(self.MARGEM_ESQUERDA, y, parte)
+                y -= self.ENTRELINHA
+            y -= self.ENTRE_PARAGRAFOS
+        return y, pagina
+
+    def _paginas_texto(self, textos):
+        """Todos os documentos num único canvas (uma passada do reportlab e um parse do resultado); devolve as
+        páginas e o intervalo de cada documento."""
+        from pypdf import PdfReader
+        from reportlab.pdfgen import canvas
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=(self.largura, self.altura))
+        intervalos, pagina = [], 0
+        for texto in textos:
+            inicio = pagina
+            _, pagina = self._texto(c, texto, self.altura - self.MARGEM_TOPO, pagina)
+            c.showPage()
+            pagina += 1
+            intervalos.append((inicio, pagina))
+        c.save()
+        return PdfReader(buffer).pages, intervalos
+
+    def _com_fundo(self, writer, paginas):
+        from pypdf import PageObject
+        from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+        if self.form is None:
+            for pagina in paginas:
+                fundo = PageObject.create_blank_page(width=self.largura, height=self.altura)
+                fundo.merge_page(self.pagina)
+                fundo.merge_page(pagina)
+                writer.add_page(fundo)
+            return
+        ref = writer._add_object(self.form.clone(writer))
+        for pagina in paginas:
+            nova = writer.add_page(pagina)
+            recursos = nova.setdefault(NameObject("/Resources"), DictionaryObject()).get_object()
+            recursos.setdefault(NameObject("/XObject"), DictionaryObject()).get_object()[NameObject("/Timbrado")] = ref
+            conteudo = DecodedStreamObject()
+            conteudo.set_data(b"q /Timbrado Do Q\n" + nova.get_contents().get_data())
+            nova[NameObject("/Contents")] = writer._add_object(conteudo.flate_encode())
+
+    def render(self, textos, juntar=False):
+        """Um PDF por texto (ou um só, com `juntar`, para o kit inteiro), todos da mesma passada."""
+        from pypdf import PdfWriter
+        paginas, intervalos = self._paginas_texto(textos)
+        grupos = [[p for i, f in intervalos for p in paginas[i:f]]] if juntar else [paginas[i:f] for i, f in intervalos]
+        saidas = []
+        for grupo in grupos:
+            writer = PdfWriter()
+            self._com_fundo(writer, grupo)
+            buffer = BytesIO()
+            writer.write(buffer)
+            saidas.append(buffer.getvalue())
+        return saidas
+
+_timbrados = OrderedDict()
+
+def modelo_timbrado(dados):
+    """ModeloTimbrado do arquivo, reaproveitado enquanto o mesmo PDF (mesmo SHA-256) for usado."""
+    chave = hashlib.sha256(dados).hexdigest()
+    with _trava_modelos:
+        if chave in _timbrados:
+            _timbrados.move_to_end(chave)
+            return _timbrados[chave]
+    modelo = ModeloTimbrado(dados)
+    with _trava_modelos:
+        _timbrados[chave] = modelo
+        while len(_timbrados) > TIMBRADOS_EM_MEMORIA: _timbrados.popitem(last=False)
+    return modelo
+
+def pdfs_com_timbrado(textos, dados_timbrado, juntar=False):
+    if not HAS_REPORTLAB: raise RuntimeError("reportlab não instalado")
+    return modelo_timbrado(dados_timbrado).render(textos, juntar)
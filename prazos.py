@@ -0,0 +1,152 @@
+"""Motor de prazos processuais: calendário forense pré-calculado em arrays (numpy) e regras de contagem do CPC/CLT.
+
+Módulo sem dependência do Streamlit. Cada tribunal tem um CalendarioForense com o array de dias úteis do período e a
+soma acumulada deles: vencer um prazo de n dias úteis vira uma consulta por índice, feita de uma vez para milhares de prazos.
+"""
+import re
+from datetime import date, timedelta
+
+import numpy as np
+
+from leitor_dje import normalizar
+
+FERIADOS_FIXOS = [((1, 1), "Confraternização Universal"), ((4, 21), "Tiradentes"), ((5, 1), "Dia do Trabalho"),
+                  ((9, 7), "Independência do Brasil"), ((10, 12), "Nossa Senhora Aparecida"), ((11, 2), "Finados"),
+                  ((11, 15), "Proclamação da República"), ((12, 25), "Natal")]
+# Dias sem expediente forense que dependem da Páscoa (deslocamento a partir do domingo de Páscoa)
+FERIADOS_MOVEIS = [(-48, "Carnaval (segunda-feira)"), (-47, "Carnaval (terça-feira)"), (-2, "Sexta-feira Santa"), (60, "Corpus Christi")]
+# Justiça Federal, do Trabalho e tribunais superiores (Lei 5.010/66, art. 62)
+FERIADOS_LEI_5010 = [((8, 11), "Dia do Advogado"), ((11, 1), "Todos os Santos"), ((12, 8), "Nossa Senhora da Conceição")]
+FERIADOS_LEI_5010_MOVEIS = [(-4, "Quarta-feira Santa"), (-3, "Quinta-feira Santa")]
+TRIBUNAIS_LEI_5010 = ("TRF", "TRT", "TST", "STJ", "STF")
+# Feriados estaduais conhecidos; o resto (municipais, pontos facultativos, suspensões) vai na tabela de feriados do banco
+FERIADOS_ESTADUAIS = {"TJSP": [((7, 9), "Revolução Constitucionalista")], "TJRJ": [((4, 23), "Dia de São Jorge")]}
+
+def pascoa(ano):
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher)."""
+    a, b, c = ano % 19, ano // 100, ano % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes = (h + l - 7 * m + 114) // 31
+    return date(ano, mes, (h + l - 7 * m + 114) % 31 + 1)
+
+def feriados_forenses(tribunal, primeiro_ano, ultimo_ano):
+    """[(data, descrição)] nacionais + os do tribunal (Lei 5.010/66 e estaduais) no intervalo de anos."""
+    tribunal = (tribunal or "").upper()
+    fixos, moveis = list(FERIADOS_FIXOS), list(FERIADOS_MOVEIS)
+    if tribunal.startswith(TRIBUNAIS_LEI_5010):
+        fixos += FERIADOS_LEI_5010
+        moveis += FERIADOS_LEI_5010_MOVEIS
+    fixos += FERIADOS_ESTADUAIS.get(tribunal, [])
+    feriados = []
+    for ano in range(primeiro_ano, ultimo_ano + 1):
+        feriados += [(date(ano, mes, dia), nome) for (mes, dia), nome in fixos]
+        if ano >= 2024: feriados.append((date(ano, 11, 20), "Consciência Negra"))  # Lei 14.759/23
+        domingo = pascoa(ano)
+        feriados += [(domingo + timedelta(days=desloc), nome) for desloc, nome in moveis]
+    return feriados
+
+class CalendarioForense:
+    """Dias de [primeiro_ano, ultimo_ano] em arrays: util[i] diz se o dia i conta prazo, acumulado[i] quantos dias
+    úteis há até ele (inclusive) e dias_uteis[k] é o k-ésimo dia útil do período.
+
+    Não contam: sábados, domingos, feriados e, com `recesso`, de 20/12 a 20/01 (CPC art. 220; CLT art. 775-A)."""
+
+    def __init__(self, feriados, primeiro_ano, ultimo_ano, recesso=True):
+        self.inicio = np.datetime64(f"{primeiro_ano}-01-01", "D")
+        self.dias = np.arange(self.inicio, np.datetime64(f"{ultimo_ano + 1}-01-01", "D"))
+        mes = self.dias.astype("datetime64[M]")
+        dia = (self.dias - mes).astype(np.int64) + 1
+        mes = mes.astype(np.int64) % 12 + 1
+        self._recesso = ((mes == 12) & (dia >= 20)) | ((mes == 1) & (dia <= 20)) if recesso else np.zeros(len(self.dias), bool)
+        self.util = self._uteis(feriados)
+        self.acumulado = np.cumsum(self.util)
+        self.dias_uteis = self.dias[self.util]
+
+    def _uteis(self, feriados):
+        calendario = np.busdaycalendar(holidays=np.array(sorted(feriados), dtype="datetime64[D]"))
+        return np.is_busday(self.dias, busdaycal=calendario) & ~self._recesso
+
+    def atualizar_feriados(self, feriados):
+        """Troca a lista de feriados recalculando os arrays só a partir do primeiro dia alterado. Devolve os dias que mudaram."""
+        novo = self._uteis(feriados)
+        mudou = np.flatnonzero(novo != self.util)
+        if len(mudou):
+            i = mudou[0]
+            self.util = novo
+            self.acumulado[i:] = np.cumsum(novo[i:]) + (self.acumulado[i - 1] if i else 0)
+            self.dias_uteis = self.dias[novo]
+        return self.dias[mudou]
+
+    def _indices(self, datas):
+        idx = (np.asarray(datas, dtype="datetime64[D]") - self.inicio).astype(np.int64)
+        fora = (idx < 0) | (idx >= len(self.dias))
+        return np.clip(idx, 0, len(self.dias) - 1), fora
+
+    def vencimentos(self, datas, dias, publicacao_dje=False, corridos=False):
+        """Vetorizado: (início da contagem, vencimento) de cada prazo, como datetime64[D] (NaT fora do calendário).
+
+        A ciência é o próprio dia do ato (ou o próximo dia útil); na disponibilização do DJE, a publicação é o primeiro
+        dia útil seguinte (Lei 11.419/06, art. 4º, §3º). A contagem começa no dia útil após a ciência (CPC art. 224).
+        Prazos em dias corridos vencem `dias` depois da ciência, prorrogados para o próximo dia útil."""
+        idx, fora = self._indices(datas)
+        dias = np.broadcast_to(np.asarray(dias, dtype=np.int64), idx.shape)
+        dje = np.broadcast_to(np.asarray(publicacao_dje, dtype=bool), idx.shape)
+        corridos = np.broadcast_to(np.asarray(corridos, dtype=bool), idx.shape)
+        n = len(self.dias_uteis)
+        ciencia = self.acumulado[idx] - np.where(dje, 0, self.util[idx])  # índice da ciência em dias_uteis
+        fim = ciencia + dias
+        if corridos.any():
+            data_fim = self.dias_uteis[np.clip(ciencia, 0, n - 1)] + dias
+            j, fora_fim = self._indices(data_fim)
+            fim = np.where(corridos, self.acumulado[j] - self.util[j], fim)
+            fora |= corridos & fora_fim
+        fora |= (ciencia + 1 >= n) | (fim >= n)
+        inicio = self.dias_uteis[np.clip(ciencia + 1, 0, n - 1)]
+        vencimento = self.dias_uteis[np.clip(fim, 0, n - 1)]
+        return np.where(fora, np.datetime64("NaT"), inicio), np.where(fora, np.datetime64("NaT"), vencimento)
+
+    def uteis_entre(self, de, ate):
+        """Dias úteis em (de, ate] — negativo se `ate` é anterior. Vetorizado em `ate`; NaN fora do calendário."""
+        i, fora_de = self._indices(de)
+        j, fora_ate = self._indices(ate)
+        return np.where(fora_de | fora_ate, np.nan, self.acumulado[j] - self.acumulado[i])
+
+REGRAS_PRAZO = [
+    # (termos no texto normalizado, ato, dias no CPC, dias na CLT); a primeira regra que casa vale, None = sem prazo
+    (("embargos de declaracao", "embargos declaratorios"), "Embargos de declaração", 5, 5),
+    (("embargos a execucao", "embargos do devedor"), "Embargos à execução", 15, 5),
+    (("cumprimento de sentenca", "pagamento voluntario", "efetue o pagamento"), "Pagamento voluntário", 15, None),
+    (("contrarrazoes",), "Contrarrazões", 15, 8),
+    (("acordao",), "Recurso especial / de revista", 15, 8),
+    (("sentenca",), "Apelação / recurso ordinário", 15, 8),
+    (("decisao interlocutoria", "tutela de urgencia", "tutela antecipada"), "Agravo de instrumento", 15, None),
+    (("cite se", "citacao", "citado"), "Contestação", 15, None),
+    (("replica", "impugnacao a contestacao", "sobre a contestacao"), "Réplica", 15, 5),
+    (("intime se", "intimacao", "intimada", "intimado", "manifest", "vista as partes"), "Manifestação", 5, 5),
+]
+ATO_PADRAO = ("Manifestação", 5)  # CPC art. 218, §3º: sem prazo fixado, 5 dias
+_PRAZO_EXPRESSO = re.compile(r"prazo (?:comum |legal |improrrogavel |sucessivo )?de (\d{1,3})(?: [a-z]+){0,2} dias( corridos)?")
+
+def trabalhista(tribunal):
+    return (tribunal or "").upper().startswith(("TRT", "TST"))
+
+def classificar(texto, tribunal, padrao=False):
+    """(ato, dias, corridos) do prazo que o texto abre, ou None. Um 'prazo de N dias' expresso no texto prevalece.
+
+    padrao=True (publicação no DJE, que já é uma intimação) cai no prazo geral quando nenhuma regra casa."""
+    normal = normalizar(texto or "")
+    clt = trabalhista(tribunal)
+    ato = dias = None
+    for termos, nome, dias_cpc, dias_clt in REGRAS_PRAZO:
+        if any(t in normal for t in termos):
+            ato, dias = nome, (dias_clt if clt else dias_cpc)
+            break
+    expresso = _PRAZO_EXPRESSO.search(normal)
+    if expresso: return ato or "Prazo fixado pelo juízo", int(expresso.group(1)), bool(expresso.group(2))
+    if dias is None and padrao: ato, dias = ATO_PADRAO
+    return (ato, dias, False) if dias is not None else None
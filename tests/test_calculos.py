@@ -0,0 +1,62 @@
+"""Paridade da rescisão em lote (calculos.calcular_rescisoes_lote) com o cálculo individual em casos fixos de borda.
+
+    python -m pytest tests
+"""
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calculos import calcular_rescisao_clt, calcular_rescisoes_lote, verbas_da_linha  # noqa: E402
+
+def empregado(admissao, demissao, motivo="Demissão sem Justa Causa", aviso="Indenizado", salario=3000.0, saldo_fgts=10000.0,
+              ferias_vencidas=False, insalubridade="Não", periculosidade=False):
+    return {"Nome": "", "Admissão": admissao, "Demissão": demissao, "Salário": salario, "Motivo": motivo, "Saldo FGTS": saldo_fgts,
+            "Férias Vencidas": ferias_vencidas, "Aviso": aviso, "Insalubridade": insalubridade, "Periculosidade": periculosidade}
+
+def individual(e):
+    return calcular_rescisao_clt(e["Admissão"], e["Demissão"], e["Salário"], e["Motivo"], e["Saldo FGTS"], e["Férias Vencidas"],
+                                 e["Aviso"], e["Insalubridade"], e["Periculosidade"])
+
+CALCULADOS = {
+    "29/02 com aniversário no ano bissexto": empregado(date(2020, 2, 29), date(2024, 3, 10), aviso="Trabalhado"),
+    "29/02 com justa causa": empregado(date(2020, 2, 29), date(2023, 5, 10), motivo="Justa Causa"),
+    "aviso projetado para o ano seguinte": empregado(date(2015, 6, 10), date(2023, 12, 20), ferias_vencidas=True),
+    "aviso de 90 dias": empregado(date(1998, 1, 5), date(2023, 11, 30), insalubridade="Máximo (40%)"),
+    "admissão e demissão no mesmo mês": empregado(date(2024, 3, 2), date(2024, 3, 28)),
+    "mesmo mês, admissão depois do dia 15": empregado(date(2024, 3, 16), date(2024, 3, 31), aviso="Trabalhado"),
+    "justa causa": empregado(date(2019, 8, 1), date(2024, 4, 12), motivo="Justa Causa", ferias_vencidas=True, periculosidade=True),
+    "pedido de demissão com aviso trabalhado": empregado(date(2021, 3, 1), date(2024, 7, 15), motivo="Pedido de Demissão", aviso="Trabalhado"),
+    "pedido de demissão sem cumprir aviso": empregado(date(2021, 3, 1), date(2024, 7, 15), motivo="Pedido de Demissão", aviso="Indenizado"),
+    "acordo (culpa recíproca)": empregado(date(2017, 10, 20), date(2024, 2, 14), motivo="Acordo (Culpa Recíproca)", insalubridade="Médio (20%)"),
+}
+
+RECUSADOS = {
+    "29/02 sem aniversário (ano não bissexto)": empregado(date(2020, 2, 29), date(2023, 5, 10)),
+    "29/02 antes do aniversário no ano bissexto": empregado(date(2020, 2, 29), date(2024, 1, 20), motivo="Pedido de Demissão"),
+}
+
+@pytest.mark.parametrize("caso", CALCULADOS.values(), ids=CALCULADOS.keys())
+def test_lote_igual_ao_individual(caso):
+    esperado = individual(caso)
+    linha = calcular_rescisoes_lote(pd.DataFrame([caso])).iloc[0]
+    assert linha["Erro"] == ""
+    assert verbas_da_linha(linha) == esperado
+    assert linha["Total"] == sum(esperado.values())
+
+@pytest.mark.parametrize("caso", RECUSADOS.values(), ids=RECUSADOS.keys())
+def test_linha_recusada_pelos_dois(caso):
+    with pytest.raises(ValueError): individual(caso)
+    linha = calcular_rescisoes_lote(pd.DataFrame([caso])).iloc[0]
+    assert linha["Erro"]
+    assert pd.isna(linha["Total"])
+
+def test_lote_misturado_preserva_a_ordem():
+    casos = list(CALCULADOS.values()) + list(RECUSADOS.values())
+    resultado = calcular_rescisoes_lote(pd.DataFrame(casos))
+    for (_, linha), caso in zip(resultado.iterrows(), casos):
+        if caso in RECUSADOS.values(): assert linha["Erro"]
+        else: assert verbas_da_linha(linha) == individual(caso)
@@ -0,0 +1,45 @@
+"""Atualização de débitos (calculos.atualizar_debitos) com séries sintéticas: correção até os juros e Selic depois.
+
+    python -m pytest tests
+"""
+import os
+import sys
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calculos import SerieIndice, atualizar_debitos  # noqa: E402
+
+MESES = np.arange("2023-01", "2025-01", dtype="datetime64[M]")
+SERIES = {"IPCA-E": SerieIndice("IPCA-E", MESES, np.full(len(MESES), 1.0)),
+          "Selic": SerieIndice("Selic", MESES, np.full(len(MESES), 2.0))}
+SELIC = "Selic a partir dos juros (substitui correção e juros)"
+
+def atualizar(data, inicio_juros, ate=date(2024, 1, 10), juros=SELIC):
+    df = pd.DataFrame([{"Valor": 1000.0, "Data": data, "Início Juros": inicio_juros}])
+    return atualizar_debitos(df, ate, SERIES, "IPCA-E", juros).iloc[0]
+
+def test_selic_corrige_pelo_indice_ate_o_inicio_dos_juros():
+    r = atualizar(date(2023, 1, 15), date(2023, 7, 10))  # IPCA-E de jan a jun, Selic de jul a dez
+    assert r["Erro"] == ""
+    assert r["Fator Correção"] == pytest.approx(1.01 ** 6)
+    assert r["Valor Corrigido"] == pytest.approx(1000 * 1.01 ** 6)
+    assert r["Total"] == pytest.approx(1000 * 1.01 ** 6 * 1.02 ** 6)
+
+def test_selic_desde_o_evento_dispensa_correcao():
+    r = atualizar(date(2023, 1, 15), date(2023, 1, 15))
+    assert r["Fator Correção"] == pytest.approx(1.0)
+    assert r["Total"] == pytest.approx(1000 * 1.02 ** 12)
+
+def test_juros_depois_da_atualizacao_so_corrigem():
+    r = atualizar(date(2023, 1, 15), date(2024, 6, 1))
+    assert r["Fator Correção"] == pytest.approx(1.01 ** 12)
+    assert r["Juros"] == pytest.approx(0.0)
+
+def test_juros_simples_mantem_correcao_ate_a_atualizacao():
+    r = atualizar(date(2023, 1, 15), date(2023, 7, 15), ate=date(2024, 1, 15), juros="1% a.m. (simples, pro rata die)")
+    assert r["Fator Correção"] == pytest.approx(1.01 ** 12)
+    assert r["Juros"] == pytest.approx(1000 * 1.01 ** 12 * 0.06)
@@ -0,0 +1,42 @@
+"""Leitor de diários (leitor_dje.LeitorDJE): ocorrências na divisa entre páginas e blocos de texto.
+
+    python -m pytest tests
+"""
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from leitor_dje import LeitorDJE, blocos_texto, padroes_cnj, padroes_nome, padroes_oab  # noqa: E402
+
+CNJ = "1002345-88.2024.8.26.0100"
+
+def leitor():
+    return LeitorDJE([("OAB", "SP123456", padroes_oab("SP123456"), None), ("CNJ", CNJ, padroes_cnj(CNJ), 7),
+                      ("CLIENTE", "Maria Silva Santos", padroes_nome("Maria Silva Santos"), 7)])
+
+def achados(blocos):
+    return [(o.pagina, o.tipo) for o in leitor().varrer(blocos)]
+
+def test_oab_no_fim_da_pagina():
+    assert achados([(1, "Advogado: OAB/SP 123.456"), (2, "Intimação das partes")]) == [(1, "OAB")]
+
+def test_cnj_no_fim_da_pagina():
+    assert achados([(1, f"Processo {CNJ}"), (2, "Vistos.")]) == [(1, "CNJ")]
+
+def test_nome_no_fim_da_ultima_pagina():
+    assert achados([(1, "Vistos."), (2, "Intimada MARIA SILVA SANTOS")]) == [(2, "CLIENTE")]
+
+def test_nome_quebrado_entre_paginas():
+    assert achados([(1, "Intimada MARIA SILVA"), (2, "SANTOS para ciência")]) == [(2, "CLIENTE")]  # página onde termina
+
+def test_palavras_coladas_na_divisa_nao_viram_numero():
+    assert achados([(1, "Processo 1002345-88.2024.8.26"), (2, "0100 Vistos.")]) == []
+
+def test_form_feed_no_dump_de_texto():
+    dump = io.BytesIO(f"Edital\nProcesso {CNJ}\fVistos.\nAdvogado OAB/SP 123.456\fIntimem-se.".encode("utf-8"))
+    assert achados(blocos_texto(dump)) == [(1, "CNJ"), (2, "OAB")]
+
+def test_form_feed_no_limite_do_bloco_de_leitura():
+    dump = io.BytesIO(f"Processo {CNJ}\n\fVistos.\n".encode("utf-8"))
+    assert achados(blocos_texto(dump, tamanho_bloco=8)) == [(1, "CNJ")]
@@ -0,0 +1,23 @@
+"""Calendário forense (prazos.CalendarioForense): contagem de dias úteis e datas fora do período carregado.
+
+    python -m pytest tests
+"""
+import os
+import sys
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from prazos import CalendarioForense, feriados_forenses  # noqa: E402
+
+CALENDARIO = CalendarioForense([d for d, _ in feriados_forenses("TJSP", 2024, 2025)], 2024, 2025)
+
+def test_uteis_entre_conta_so_dias_uteis():
+    # 03/06/2024 (segunda) a 10/06/2024 (segunda): 5 dias úteis em (de, ate]
+    assert CALENDARIO.uteis_entre(np.datetime64("2024-06-03"), np.array(["2024-06-10"], dtype="datetime64[D]"))[0] == 5
+
+def test_uteis_entre_fora_do_calendario_e_nan():
+    restantes = CALENDARIO.uteis_entre(np.datetime64("2024-06-03"), np.array(["2026-03-02", "2023-12-01", "2024-06-04"], dtype="datetime64[D]"))
+    assert np.isnan(restantes[0]) and np.isnan(restantes[1]) and restantes[2] == 1
+    assert np.isnan(CALENDARIO.uteis_entre(np.datetime64(date(2026, 1, 5)), np.array(["2024-06-04"], dtype="datetime64[D]"))).all()